@@ -0,0 +1,79 @@
+"""Compares the memory held by a large parsed program as __dict__ nodes, __slots__ nodes and a FlatAST.
+
+Usage (from the repository root):
+    python proto/benchmarks/bench_ast_memory.py [repetitions]
+"""
+import sys
+import time
+import tracemalloc
+import common
+from nodes import ASTNode
+from flat_ast import FlatAST
+
+# One chunk of generated code; {i} keeps the names of every repetition distinct.
+CHUNK = """
+define a{i} int {i} * 2 + 1
+define s{i} string "item " + {i}
+function int f{i}(int x, int y) {{
+    if (x > y) {{ return x - y }} else {{ return y - x + {i} }}
+}}
+define n{i} int 0
+while (n{i} < 3) {{
+    out exec f{i}(n{i}, a{i})
+    n{i}++
+}}
+"""
+
+# Nodes laid out like before __slots__: one instance __dict__ per node.
+DICT_CLASSES = {}
+
+def dict_node(node_type):
+    dict_class = DICT_CLASSES.get(node_type)
+    if dict_class is None:
+        dict_class = DICT_CLASSES[node_type] = type(node_type.__name__, (), {})
+    return dict_class()
+
+def slots_node(node_type):
+    return node_type.__new__(node_type)
+
+def copy_tree(node, make_node):
+    """Copy the nodes of `node` with `make_node`, sharing names, numbers and other leaf values."""
+    if isinstance(node, list):
+        return [copy_tree(item, make_node) for item in node]
+    if not isinstance(node, ASTNode):
+        return node
+    copy = make_node(node.__class__)
+    for field in node._fields:
+        setattr(copy, field, copy_tree(getattr(node, field, None), make_node))
+    return copy
+
+def traced(func):
+    """Run `func` under tracemalloc and return (result, bytes still allocated, seconds)."""
+    tracemalloc.start()
+    try:
+        start = time.perf_counter()
+        result = func()
+        elapsed = time.perf_counter() - start
+        current, _ = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return result, current, elapsed
+
+def main():
+    repetitions = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    source = "".join(CHUNK.format(i=i) for i in range(repetitions))
+
+    tree, _, parse_time = traced(lambda: common.parse(source))
+    # Each layout is built from the parsed tree, so only the bytes the layout itself adds are
+    # traced and leaf values shared with the tree are not counted.
+    _, dict_bytes, _ = traced(lambda: copy_tree(tree, dict_node))
+    _, slots_bytes, _ = traced(lambda: copy_tree(tree, slots_node))
+    flat, flat_bytes, flatten_time = traced(lambda: FlatAST.from_tree(tree))
+
+    print(f"{len(source) / 1024:.0f} KiB of source, {len(flat)} nodes (parsed in {parse_time:.2f}s, flattened in {flatten_time:.2f}s)")
+    print(f"{'layout':<16}{'KiB':>10}{'bytes/node':>12}")
+    for layout, size in (("__dict__ nodes", dict_bytes), ("__slots__ nodes", slots_bytes), ("FlatAST", flat_bytes)):
+        print(f"{layout:<16}{size / 1024:>10.0f}{size / len(flat):>12.1f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,141 @@
+"""Measures the cost of Gill function calls in each execution engine on call-heavy programs.
+
+The last column is the tree-walker's cost per call when `return` raises a ReturnException instead,
+and calls in tail position are not eliminated.
+
+Usage (from the repository root):
+    python proto/benchmarks/bench_calls.py [fib argument]
+"""
+import sys
+import common
+from environment import Env
+from engines import ENGINES, create_engine
+from exceptions import ReturnException
+from interpreter import Interpreter
+from resolver import Resolver
+
+# Recomputes the same ten results over and over; "pure helper" declares the function pure so they are cached.
+HELPER = """
+function{pure} int triangle(int v) {{{{
+    define total int 0
+    define i int 0
+    while (i < v) {{{{
+        assign total total + i
+        i++
+    }}}}
+    return total
+}}}}
+define x int 0
+while (x < {calls} / 10) {{{{
+    exec triangle(x % 10 + 10)
+    x++
+}}}}
+"""
+
+PROGRAMS = {
+    "recursive fib": """
+function int fib(int n) {{
+    if (n < 2) {{
+        return n
+    }}
+    return exec fib(n - 1) + exec fib(n - 2)
+}}
+exec fib({n})
+""",
+    "four arguments": """
+function int sum4(int a, int b, int c, int d) {{
+    return a + b + c + d
+}}
+define x int 0
+while (x < {calls}) {{
+    exec sum4(x, 1, 2, 3)
+    x++
+}}
+""",
+    "default arguments": """
+function int scale(int v, int factor default 2, int offset default 1) {{
+    return v * factor + offset
+}}
+define x int 0
+while (x < {calls}) {{
+    exec scale(x)
+    x++
+}}
+""",
+    "tail recursion": """
+function int sum_to(int n, int acc) {{
+    if (n == 0) {{
+        return acc
+    }}
+    return exec sum_to(n - 1, acc + n)
+}}
+define x int 0
+while (x < {calls} / 100) {{
+    exec sum_to(99, 0)
+    x++
+}}
+""",
+    "early return": """
+function int find(int target) {{
+    define i int 0
+    while (i < 10) {{
+        if (i == target) {{
+            return i
+        }}
+        i++
+    }}
+    return 0
+}}
+define x int 0
+while (x < {calls}) {{
+    exec find(2)
+    x++
+}}
+""",
+    "helper": HELPER.format(pure="", calls="{calls}"),
+    "pure helper": HELPER.format(pure=" pure", calls="{calls}"),
+}
+
+class NoTailCallResolver(Resolver):
+    def resolve_ReturnNode(self, node):
+        self.visit(node.expression)
+
+class ExceptionReturnInterpreter(Interpreter):
+    """Tree-walker that unwinds `return` with a ReturnException, as it did before completion signals.
+
+    It does not eliminate tail calls either, so it runs programs parsed for it alone.
+    """
+    def __init__(self, global_env):
+        super().__init__(global_env)
+        self.resolver = NoTailCallResolver()
+
+    def visit_ReturnNode(self, node):
+        raise ReturnException(self.visit(node.expression))
+
+    def visit_FunctionCallNode(self, node):
+        try:
+            return super().visit_FunctionCallNode(node)
+        except ReturnException as e:
+            return e.value
+
+def calls_of_fib(n):
+    return 1 if n < 2 else 1 + calls_of_fib(n - 1) + calls_of_fib(n - 2)
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+    calls = calls_of_fib(n)
+    print(f"{calls} calls per program")
+    print(f"{'program':<20}" + "".join(f"{name:>12}" for name in ENGINES) + f"{'tree us/call':>14}{'raising':>10}")
+    for program, template in PROGRAMS.items():
+        ast = common.parse(template.format(n=n, calls=calls))
+        row = f"{program:<20}"
+        timings = {}
+        for name in ENGINES:
+            timings[name] = common.best_of(lambda: create_engine(name, Env()).run(ast), repeat=3)
+            row += f"{timings[name]:>11.4f}s"
+        raising_ast = common.parse(template.format(n=n, calls=calls))
+        raising = common.best_of(lambda: ExceptionReturnInterpreter(Env()).run(raising_ast), repeat=3)
+        print(row + f"{timings['tree'] / calls * 1e6:>14.2f}{raising / calls * 1e6:>10.2f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+"""Measures the per-node cost of Interpreter.visit dispatch on tight-loop programs.
+
+Usage (from the repository root):
+    python proto/benchmarks/bench_dispatch.py [iterations]
+"""
+import sys
+import common
+from environment import Env
+from interpreter import Interpreter
+
+PROGRAMS = {
+    "counter loop": """
+define x int 0
+while (x < {n}) {{
+    x++
+}}
+""",
+    "arithmetic loop": """
+define x int 0
+define total int 0
+while (x < {n}) {{
+    define total int total + x * 2 - 1
+    x++
+}}
+""",
+    "switch loop": """
+define x int 0
+while (x < {n}) {{
+    switch (x) {{
+        case (1) {{ 1 }}
+        case (2) {{ 2 }}
+        default {{ 3 }}
+    }}
+    x++
+}}
+""",
+}
+
+class CountingInterpreter(Interpreter):
+    """Interpreter that counts how many nodes a program visits."""
+    def __init__(self, global_env):
+        super().__init__(global_env)
+        self.visits = 0
+
+    def visit(self, node):
+        self.visits += 1
+        return super().visit(node)
+
+def count_visits(ast):
+    counter = CountingInterpreter(Env())
+    counter.run(ast)
+    return counter.visits
+
+def main():
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    print(f"{'program':<18}{'nodes':>10}{'total (s)':>12}{'ns/node':>10}")
+    for name, template in PROGRAMS.items():
+        ast = common.parse(template.format(n=iterations))
+        nodes = count_visits(ast)
+        elapsed = common.best_of(lambda: Interpreter(Env()).run(ast))
+        print(f"{name:<18}{nodes:>10}{elapsed:>12.4f}{elapsed / nodes * 1e9:>10.1f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+"""Compares the execution engines registered in engines.py on loop-heavy programs.
+
+Usage (from the repository root):
+    python proto/benchmarks/bench_engines.py [iterations]
+"""
+import sys
+import common
+from environment import Env
+from engines import ENGINES, create_engine
+
+PROGRAMS = {
+    "counter loop": """
+define x int 0
+while (x < {n}) {{
+    x++
+}}
+""",
+    "arithmetic loop": """
+define x int 0
+define total int 0
+while (x < {n}) {{
+    define total int total + x * 2 - 1
+    x++
+}}
+""",
+    "counted for loop": """
+define total int 0
+define limit int {n}
+for (define i int 0, i < limit, i++) {{
+    assign total total + i
+}}
+""",
+    # Same loop, but assigning the bound keeps it off the counted (range) path.
+    "general for loop": """
+define total int 0
+define limit int {n}
+for (define i int 0, i < limit, i++) {{
+    assign total total + i
+    assign limit limit
+}}
+""",
+    "typed defines": """
+define x int 0
+while (x < {n}) {{
+    define y int x * 2
+    define f float y / 3
+    define s string "v" + y
+    define ok bool y > 10
+    x++
+}}
+""",
+    "function calls": """
+function int square(int v) {{
+    return v * v
+}}
+define x int 0
+while (x < {n}) {{
+    exec square(x)
+    x++
+}}
+""",
+}
+
+def main():
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    print(f"{'program':<18}" + "".join(f"{name:>12}" for name in ENGINES))
+    for program, template in PROGRAMS.items():
+        ast = common.parse(template.format(n=iterations))
+        row = f"{program:<18}"
+        for name in ENGINES:
+            elapsed = common.best_of(lambda: create_engine(name, Env()).run(ast))
+            row += f"{elapsed:>11.4f}s"
+        print(row)
+
+if __name__ == "__main__":
+    main()
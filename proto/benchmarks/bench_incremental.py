@@ -0,0 +1,50 @@
+"""Compares re-lexing and re-parsing a whole generated program with IncrementalParser.edit() for
+small edits in the middle of it, as an editor would send them on every keystroke.
+
+Usage (from the repository root):
+    python proto/benchmarks/bench_incremental.py [statements]
+"""
+import sys
+import time
+import common
+from incremental import IncrementalParser
+
+# One chunk of generated code; {i} keeps the names of every repetition distinct.
+CHUNK = """
+define total{i} int {i} * 2 + 1
+function int clamp{i}(int value, int limit) {{
+    if (value >= limit) {{ return limit }} else {{ return value }}
+}}
+out exec clamp{i}(total{i}, 10)
+"""
+
+def main():
+    statements = int(sys.argv[1]) if len(sys.argv) > 1 else 30000
+    source = "".join(CHUNK.format(i=i) for i in range(statements // 3))
+    full = common.best_of(lambda: common.parse(source), repeat=3)
+
+    incremental = IncrementalParser(source)
+    middle = source.index(f"clamp{statements // 6}(int")
+    body = source.index("return limit", middle)
+    # (label, offset, removed, inserted), applied in order; every edit leaves a valid program.
+    edits = [
+        ("type a character", body + len("return limit"), 0, "2"),
+        ("delete it", body + len("return limit"), 1, ""),
+        ("replace a number", source.index("* 2", middle) + 2, 1, "3"),
+        # An unclosed quote is skipped, but closing one turns everything up to it into a string.
+        ("open a string", source.index("define", middle), 0, '"'),
+        ("remove it", source.index("define", middle), 1, ""),
+        ("insert a statement", middle - len("function int "), 0, 'out "here"\n'),
+    ]
+    print(f"{statements} statements, {len(source) / 1024:.0f} KB of source, {len(incremental.tokens)} tokens")
+    print(f"full tokenize + parse: {full * 1000:.1f} ms")
+    print()
+    print(f"{'edit':<22}{'time (ms)':>10}{'speedup':>9}{'relexed':>9}{'reparsed':>10}")
+    for label, offset, removed, inserted in edits:
+        start = time.perf_counter()
+        incremental.edit(offset, removed, inserted)
+        elapsed = time.perf_counter() - start
+        print(f"{label:<22}{elapsed * 1000:>10.2f}{full / elapsed:>8.0f}x{incremental.relexed:>9}{incremental.reparsed:>10}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+"""Measures lexer throughput in MB/s on a generated multi-megabyte program, and the peak memory of
+lexing and parsing it from a string and from a file with Lexer.stream.
+
+Streaming saves the memory of the source text and the token list. Parsing the whole program still
+builds its whole tree, which takes more memory than both, so "stream + parse" is only a little below
+"read + tokenize + parse"; "stream + statements" drops each statement once it is parsed, as --pipeline
+does once it has run it. Use a few megabytes of source (the default is 4), so the peaks are not
+dominated by the interpreter's own allocations.
+
+Usage (from the repository root):
+    python proto/benchmarks/bench_lexer.py [megabytes]
+"""
+import collections
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+import common
+from lexer import Lexer
+from parser import Parser
+
+# One chunk of generated code; {i} keeps the names of every repetition distinct.
+CHUNK = """
+// Chunk {i}: a comment line
+define total{i} int {i} * 2 + 1;
+define label{i} string "item " + {i}
+/* a block comment
+   spanning two lines */
+function int clamp{i}(int value, int limit) {{
+    if (value >= limit) {{ return limit }} else {{ return value }}
+}}
+for (define n{i} int 0, n{i} < 3, n{i}++) {{
+    out exec clamp{i}((int)2.5 + n{i}, total{i})
+}}
+if (total{i} != 0 && true) {{ out label{i} }}
+"""
+
+def traced_peak(func):
+    """Run `func` under tracemalloc and return (peak bytes, seconds)."""
+    tracemalloc.start()
+    try:
+        start = time.perf_counter()
+        func()
+        elapsed = time.perf_counter() - start
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return peak, elapsed
+
+def read_and_tokenize(path):
+    with open(path, "r") as file:
+        return Lexer().tokenize(file.read())
+
+def stream(path):
+    with open(path, "r") as file:
+        collections.deque(Lexer().stream(file), maxlen=0)
+
+def read_and_parse(path):
+    with open(path, "r") as file:
+        return Parser(Lexer().tokenize(file.read())).parse()
+
+def stream_and_parse(path):
+    with open(path, "r") as file:
+        return Parser(Lexer().stream(file)).parse()
+
+def stream_statements(path):
+    with open(path, "r") as file:
+        collections.deque(Parser(Lexer().stream(file)).statements(), maxlen=0)
+
+def main():
+    megabytes = float(sys.argv[1]) if len(sys.argv) > 1 else 4
+    target = int(megabytes * 1024 * 1024)
+    chunks = []
+    size = 0
+    while size < target:
+        chunks.append(CHUNK.format(i=len(chunks)))
+        size += len(chunks[-1])
+    source = "".join(chunks)
+
+    lexer = Lexer()
+    tokens = len(lexer.tokenize(source))
+    elapsed = common.best_of(lambda: lexer.tokenize(source), repeat=3)
+    size_mb = len(source.encode("utf-8")) / (1024 * 1024)
+    print(f"{size_mb:.1f} MB of source, {tokens} tokens")
+    print(f"{elapsed:.3f}s, {size_mb / elapsed:.2f} MB/s, {tokens / elapsed / 1e6:.2f}M tokens/s")
+    print()
+
+    with tempfile.NamedTemporaryFile("w", suffix=".gill", delete=False) as file:
+        file.write(source)
+    del source
+    try:
+        print(f"{'from file':<26}{'peak (MB)':>10}{'x source':>10}{'time (s)':>10}")
+        for label, func in (("read + tokenize", read_and_tokenize), ("stream", stream),
+                            ("read + tokenize + parse", read_and_parse), ("stream + parse", stream_and_parse),
+                            ("stream + statements", stream_statements)):
+            peak, elapsed = traced_peak(lambda: func(file.name))
+            print(f"{label:<26}{peak / (1024 * 1024):>10.1f}{peak / (1024 * 1024) / size_mb:>10.1f}{elapsed:>10.2f}")
+    finally:
+        os.unlink(file.name)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+"""Measures the memory used to store variables, per variable and for whole programs on each engine.
+
+Usage (from the repository root):
+    python proto/benchmarks/bench_memory.py [variables]
+"""
+import sys
+import time
+import tracemalloc
+import common
+from environment import Env
+from engines import ENGINES, create_engine
+from rts import Cell, intern_type, typed_array
+
+PROGRAMS = {
+    # Thousands of live globals, to measure what each variable costs once defined.
+    "live variables": lambda n: "\n".join(f"define v{i} int {i}" for i in range(n)),
+    # Short-lived call environments, one per call.
+    "function calls": lambda n: f"""
+function int add(int a, int b, int c) {{
+    define total int a + b + c
+    return total
+}}
+define x int 0
+while (x < {n}) {{
+    exec add(x, 1, 2)
+    x++
+}}
+""",
+    # Arrays of computed numbers, stored unboxed in TypedArray buffers. (The elements of an array of
+    # literals are the AST's own constants, so a list of them costs little more than the pointers.)
+    "int array": lambda n: f"define k int 1000003\ndefine data[{n}] int [{', '.join(f'k * {i}' for i in range(n))}]",
+    "float array": lambda n: f"define k float 0.5\ndefine data[{n}] float [{', '.join(f'k + {i}.0' for i in range(n))}]",
+}
+
+def traced(func):
+    """Run `func` under tracemalloc and return (result, bytes still allocated, peak bytes, seconds)."""
+    tracemalloc.start()
+    try:
+        start = time.perf_counter()
+        result = func()
+        elapsed = time.perf_counter() - start
+        current, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return result, current, peak, elapsed
+
+def run_program(name, ast):
+    # The engine is returned so its global environment is still alive when memory is read.
+    engine = create_engine(name, Env())
+    engine.run(ast)
+    return engine
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+
+    # The same values stored as the old {"type": ..., "value": ...} entries and as Cells.
+    int_id = intern_type("int")
+    _, dict_bytes, _, _ = traced(lambda: [{"type": "int", "value": 0} for _ in range(count)])
+    _, cell_bytes, _, _ = traced(lambda: [Cell(int_id, 0) for _ in range(count)])
+    print(f"bytes per variable: dict entry {dict_bytes / count:.1f}, Cell {cell_bytes / count:.1f}")
+
+    # The same array elements as a list of boxed ints and unboxed in a TypedArray.
+    _, list_bytes, _, _ = traced(lambda: [i * 1000003 for i in range(count)])
+    _, typed_bytes, _, _ = traced(lambda: typed_array([i * 1000003 for i in range(count)], "int"))
+    print(f"bytes per int array element: list {list_bytes / count:.1f}, TypedArray {typed_bytes / count:.1f}")
+    print()
+
+    print(f"{'program':<18}{'engine':>10}{'retained (KiB)':>16}{'peak (KiB)':>12}{'time (s)':>10}")
+    for program, template in PROGRAMS.items():
+        ast = common.parse(template(count))
+        for name in ENGINES:
+            _, retained, peak, elapsed = traced(lambda: run_program(name, ast))
+            print(f"{program:<18}{name:>10}{retained / 1024:>16.1f}{peak / 1024:>12.1f}{elapsed:>10.4f}")
+
+if __name__ == "__main__":
+    main()
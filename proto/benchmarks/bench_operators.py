@@ -0,0 +1,82 @@
+"""Measures binary operators in each execution engine on operator-heavy loops.
+
+The last column is the tree-walker without quickening, where every BinOpNode goes through the
+generic operator (including its string checks for `+`) on each execution.
+
+Usage (from the repository root):
+    python proto/benchmarks/bench_operators.py [iterations]
+"""
+import sys
+import common
+from environment import Env
+from engines import ENGINES, create_engine
+from interpreter import Interpreter
+
+PROGRAMS = {
+    "int arithmetic": """
+define total int 0
+define x int 0
+while (x < {n}) {{
+    assign total (total + x * 3 - x % 7) % 1000003
+    x++
+}}
+""",
+    "float arithmetic": """
+define y float 1.0
+define v float 0.0
+define x int 0
+while (x < {n}) {{
+    assign v v * 0.5 + y * 1.5 - 0.25
+    assign y y * 0.999 + 0.001
+    x++
+}}
+""",
+    "mixed int/float": """
+define v float 0.0
+define x int 0
+while (x < {n}) {{
+    assign v v + x / 3 + x * 0.5
+    x++
+}}
+""",
+    "comparisons": """
+define hits int 0
+define x int 0
+while (x < {n}) {{
+    if (x % 3 == 0 && x > 100 || x <= 10) {{
+        hits++
+    }}
+    x++
+}}
+""",
+    "string concat": """
+define s string ""
+define x int 0
+while (x < {n}) {{
+    if (x % 100 == 0) {{
+        assign s ""
+    }}
+    assign s s + "ab"
+    x++
+}}
+""",
+}
+
+class GenericInterpreter(Interpreter):
+    """Tree-walker that always evaluates binary operators generically, as it did before quickening."""
+    def visit_BinOpNode(self, node):
+        return self.eval_binop(self.visit(node.left), node.op, self.visit(node.right))
+
+def main():
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    print(f"{'program':<18}" + "".join(f"{name:>12}" for name in ENGINES) + f"{'generic':>12}")
+    for program, template in PROGRAMS.items():
+        ast = common.parse(template.format(n=iterations))
+        row = f"{program:<18}"
+        for name in ENGINES:
+            row += f"{common.best_of(lambda: create_engine(name, Env()).run(ast), repeat=3):>11.4f}s"
+        generic = common.best_of(lambda: GenericInterpreter(Env()).run(ast), repeat=3)
+        print(row + f"{generic:>11.4f}s")
+
+if __name__ == "__main__":
+    main()
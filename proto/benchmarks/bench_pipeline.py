@@ -0,0 +1,57 @@
+"""Compares main.py's default run with --pipeline on a long generated straight-line script: time to
+the first line of output, total time and peak RSS of the interpreter process.
+
+Peak RSS includes the interpreter itself (about 20 MiB), so a script needs tens of thousands of
+statements (the default is 100000) before the memory its tree and tokens take shows.
+
+Usage (from the repository root):
+    python proto/benchmarks/bench_pipeline.py [statements] [engine]
+"""
+import os
+import subprocess
+import sys
+import tempfile
+import time
+import common
+
+MAIN = os.path.join(common.SRC_DIR, "main.py")
+
+# One chunk of a batch script; every chunk updates the same few variables.
+CHUNK = """
+assign total total + {i} * 2
+assign label "step " + {i}
+out total
+"""
+
+def run(path, engine, *flags):
+    """Run main.py on `path`; return (seconds to first output line, total seconds, peak RSS in KiB)."""
+    start = time.perf_counter()
+    process = subprocess.Popen([sys.executable, MAIN, path, "--engine", engine, *flags], stdout=subprocess.PIPE, text=True)
+    process.stdout.readline()
+    first_output = time.perf_counter() - start
+    for _ in process.stdout:
+        pass
+    # wait4 reports the resources of this child alone.
+    _, status, usage = os.wait4(process.pid, 0)
+    process.returncode = os.waitstatus_to_exitcode(status)
+    return first_output, time.perf_counter() - start, usage.ru_maxrss
+
+def main():
+    statements = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    engine = sys.argv[2] if len(sys.argv) > 2 else "tree"
+    with tempfile.NamedTemporaryFile("w", suffix=".gill", delete=False) as file:
+        file.write('define total int 0\ndefine label string ""\n')
+        for i in range(statements // 3):
+            file.write(CHUNK.format(i=i))
+    try:
+        size_mb = os.path.getsize(file.name) / (1024 * 1024)
+        print(f"{statements} statements, {size_mb:.1f} MB of source, engine {engine}")
+        print(f"{'mode':<12}{'first output (s)':>18}{'total (s)':>11}{'peak RSS (MiB)':>16}")
+        for mode, flags in (("default", ("--no-cache",)), ("--pipeline", ("--pipeline",))):
+            first_output, total, rss = run(file.name, engine, *flags)
+            print(f"{mode:<12}{first_output:>18.2f}{total:>11.2f}{rss / 1024:>16.1f}")
+    finally:
+        os.unlink(file.name)
+
+if __name__ == "__main__":
+    main()
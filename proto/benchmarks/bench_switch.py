@@ -0,0 +1,36 @@
+"""Measures switch dispatch in each execution engine on a generated state machine.
+
+Every case assigns the next state, stepping through all of them in a scrambled order. In "literal
+cases" the case values are number literals, which the engines dispatch through a jump table; in
+"computed cases" they are expressions like (0 + 5), which have to be compared one after another.
+
+Usage (from the repository root):
+    python proto/benchmarks/bench_switch.py [cases] [steps]
+"""
+import sys
+import common
+from environment import Env
+from engines import ENGINES, create_engine
+
+def state_machine(cases: int, steps: int, computed: bool) -> str:
+    lines = ["define state int 0", "define steps int 0", f"while (steps < {steps}) {{", "    switch (state) {"]
+    for state in range(cases):
+        value = f"0 + {state}" if computed else f"{state}"
+        lines.append(f"        case ({value}) {{ assign state {(state + 37) % cases} }}")
+    lines += ["    }", "    steps++", "}"]
+    return "\n".join(lines)
+
+def main():
+    cases = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    steps = int(sys.argv[2]) if len(sys.argv) > 2 else 5000
+    print(f"{cases} cases, {steps} steps")
+    print(f"{'program':<18}" + "".join(f"{name:>12}" for name in ENGINES))
+    for program, computed in (("literal cases", False), ("computed cases", True)):
+        ast = common.parse(state_machine(cases, steps, computed))
+        row = f"{program:<18}"
+        for name in ENGINES:
+            row += f"{common.best_of(lambda: create_engine(name, Env()).run(ast), repeat=3):>11.4f}s"
+        print(row)
+
+if __name__ == "__main__":
+    main()
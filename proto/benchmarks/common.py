@@ -0,0 +1,25 @@
+import os
+import sys
+import time
+
+# Benchmarks live outside of proto/src, so make the interpreter modules importable the same way
+# main.py sees them. Run the benchmarks from the repository root (like main.py) so module paths resolve.
+SRC_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "src"))
+if SRC_DIR not in sys.path:
+    sys.path.insert(0, SRC_DIR)
+
+from lexer import Lexer
+from parser import Parser
+
+def parse(source: str):
+    """Lex and parse `source` into a BlockNode."""
+    return Parser(Lexer().tokenize(source)).parse()
+
+def best_of(func, repeat=5):
+    """Run `func` `repeat` times and return the fastest wall-clock time in seconds."""
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best
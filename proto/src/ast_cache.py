@@ -0,0 +1,69 @@
+import hashlib
+import marshal
+import os
+from typing import Callable, Optional
+from flat_ast import FlatAST, layout_signature
+from parser import TREE_VERSION
+from nodes import BlockNode
+
+CACHE_SUFFIX = ".gillc"
+CACHE_FORMAT = 1 # Bump when the file layout below changes.
+
+def cache_path(source_path: str) -> str:
+    """The .gillc file that caches `source_path` (example.gill -> example.gillc)."""
+    return os.path.splitext(source_path)[0] + CACHE_SUFFIX
+
+class ASTCache:
+    """Caches parsed programs next to their source file as .gillc files.
+
+    A cache file holds the key it was written for, the parsed tree as a marshalled FlatAST and a
+    checksum of that tree. The key combines the SHA-256 of the source text, the interpreter version
+    (rts.GILL_VERSION), the version of the trees the parser builds (parser.TREE_VERSION) and the node
+    layout (flat_ast.layout_signature), so editing the script, upgrading Gill or changing the lexer,
+    parser or nodes.py all invalidate it. A file that can't be read, doesn't match or is corrupt is
+    treated as a miss and rewritten; failing to write one (e.g. a read-only directory) only costs
+    the next run a parse.
+    """
+
+    def __init__(self, version: str):
+        self.version = version
+
+    def key(self, source: str) -> str:
+        digest = hashlib.sha256(source.encode("utf-8")).hexdigest()
+        return f"{CACHE_FORMAT}:{self.version}:{TREE_VERSION}:{layout_signature()}:{digest}"
+
+    def parse(self, source_path: str, source: str, parse: Callable[[str], BlockNode]) -> BlockNode:
+        """Return the cached tree for `source`, or `parse` it and cache the result."""
+        key = self.key(source)
+        program = self.load(source_path, key)
+        if program is None:
+            program = parse(source)
+            self.store(source_path, key, program)
+        return program
+
+    def load(self, source_path: str, key: str) -> Optional[BlockNode]:
+        try:
+            with open(cache_path(source_path), "rb") as file:
+                cached_key, checksum, data = marshal.load(file)
+            if cached_key != key or hashlib.sha256(data).digest() != checksum:
+                return None
+            return FlatAST.loads(data).to_tree()
+        except (OSError, EOFError, ValueError, TypeError, IndexError, AttributeError):
+            return None
+
+    def store(self, source_path: str, key: str, program: BlockNode):
+        path = cache_path(source_path)
+        try:
+            tree = FlatAST.from_tree(program).dumps()
+            data = marshal.dumps((key, hashlib.sha256(tree).digest(), tree))
+            # Write to a temporary file and rename it over the cache so readers never see a partial file.
+            temp_path = f"{path}.{os.getpid()}.tmp"
+            try:
+                with open(temp_path, "wb") as file:
+                    file.write(data)
+                os.replace(temp_path, path)
+            except BaseException:
+                os.unlink(temp_path)
+                raise
+        except (OSError, ValueError):
+            pass
@@ -0,0 +1,547 @@
+from nodes import *
+from rts import *
+from environment import Env
+from interpreter import Interpreter
+from typing import Any, Callable, Dict
+from exceptions import ReturnException
+
+# A compiled node is a closure that takes the environment to run in and returns the node's value.
+Compiled = Callable[[Env], Any]
+
+class ClosureCompiler(Interpreter):
+    """Execution engine that compiles every node once into a specialized Python closure.
+
+    Node types, operators and cast targets are inspected only while compiling, so running a
+    program is a chain of plain closure calls. Nodes without a compile_<NodeName> method are
+    wrapped in a closure that falls back to the tree-walking Interpreter, so the two engines
+    always agree on semantics.
+    """
+
+    # Same shape as Interpreter.handlers, mapping node classes to compile_<NodeName> methods.
+    compilers: Dict[type, Callable] = {}
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        cls.compilers = {}
+
+    def __init__(self, global_env: Env):
+        super().__init__(global_env)
+        self.function_bodies: Dict[FunctionDefinitionNode, Compiled] = {} # Compiled bodies of user functions.
+        self.compiled_defaults: Dict[ASTNode, Compiled] = {} # Compiled default values of parameters, evaluated only when left out.
+
+    def run(self, program):
+        self.resolve(program)
+        try:
+            return self.compile(program)(self.global_env)
+        except ReturnException as e:
+            return e.value # A top-level return ends the program, as in the tree-walker.
+
+    def compile(self, node) -> Compiled:
+        """Compile `node` into a closure taking the environment to evaluate in."""
+        compiler = self.compilers.get(node.__class__)
+        if compiler is None:
+            compiler = self.resolve_compiler(node.__class__)
+        return compiler(self, node)
+
+    @classmethod
+    def resolve_compiler(cls, node_type: type) -> Callable:
+        """Find the compiler for `node_type` by walking its MRO and cache it in the compiler table."""
+        compiler = cls.compile_fallback
+        for klass in node_type.__mro__:
+            method = getattr(cls, f"compile_{klass.__name__}", None)
+            if method is not None:
+                compiler = method
+                break
+        cls.compilers[node_type] = compiler
+        return compiler
+
+    def compile_fallback(self, node) -> Compiled:
+        # Interpret the node with the tree-walker, running it against the closure's environment.
+        def run(env):
+            prev_env = self.global_env
+            self.global_env = env
+            try:
+                return self.escape_return(Interpreter.visit(self, node))
+            finally:
+                self.global_env = prev_env
+        return run
+
+    def compile_body(self, function_def: FunctionDefinitionNode) -> Compiled:
+        body = self.function_bodies.get(function_def)
+        if body is None:
+            body = self.function_bodies[function_def] = self.compile(function_def.body)
+        return body
+
+    def compile_default(self, default) -> Compiled:
+        compiled = self.compiled_defaults.get(default)
+        if compiled is None:
+            compiled = self.compiled_defaults[default] = self.compile(default)
+        return compiled
+
+    ###
+    ### # Literals and variables
+    ###
+
+    def compile_NumberNode(self, node: NumberNode):
+        value = node.value
+        return lambda env: value
+
+    def compile_StringNode(self, node: StringNode):
+        value = node.value
+        return lambda env: value
+
+    def compile_CharNode(self, node: CharNode):
+        value = node.value
+        return lambda env: value
+
+    def compile_BooleanNode(self, node: BooleanNode):
+        value = self.eval_boolean(node.value)
+        return lambda env: value
+
+    def compile_CastNode(self, node: CastNode):
+        target_type = node.target_type.lower()
+        expression = self.compile(node.expression)
+
+        if target_type == "int":
+            return lambda env: int(expression(env))
+        elif target_type == "float":
+            return lambda env: float(expression(env))
+        elif target_type == "string":
+            return lambda env: str(expression(env))
+        elif target_type == "char":
+            return lambda env: str(expression(env))[0]  # take first character
+        elif target_type == "bool":
+            return lambda env: bool(expression(env))
+        elif target_type == "void":
+            def cast_void(env):
+                expression(env)
+                return None
+            return cast_void
+
+        def unknown_cast(env):
+            raise ValueError(f"Unknown cast type: {target_type}")
+        return unknown_cast
+
+    def compile_lookup(self, address, name) -> Compiled:
+        """Compile a closure returning the variable entry for `name` at its resolved `address`."""
+        if address is not None and address[0] == 0:
+            # Variables of the current environment are read straight from their slot.
+            slot = address[1]
+            def lookup_local(env):
+                entry = env.slots[slot]
+                if entry is None:
+                    return env.get(name) # Not defined yet; the name may refer to an outer variable.
+                return entry
+            return lookup_local
+        return lambda env: env.lookup(address, name)
+
+    def compile_IdentifierNode(self, node: IdentifierNode):
+        name = node.name
+        address = node.address
+        if address is not None and address[0] == 0:
+            # Inlined compile_lookup, as variable reads are the most common node.
+            slot = address[1]
+            def load_local(env):
+                entry = env.slots[slot]
+                if entry is None:
+                    entry = env.get(name) # Not defined yet; the name may refer to an outer variable.
+                return entry.value
+            return load_local
+        return lambda env: env.lookup(address, name).value
+
+    def compile_IncNode(self, node: IncNode):
+        lookup = self.compile_lookup(node.address, node.identifier)
+        def increment(env):
+            current = lookup(env)
+            current.value += 1
+            return current.value
+        return increment
+
+    def compile_DecNode(self, node: DecNode):
+        lookup = self.compile_lookup(node.address, node.identifier)
+        def decrement(env):
+            current = lookup(env)
+            current.value -= 1
+            return current.value
+        return decrement
+
+    def compile_DefineNode(self, node: DefineNode):
+        name = node.name
+        slot = node.slot
+        declared_type = node.type_
+        type_id = intern_type(declared_type)
+        array_type_id = intern_type(f"{declared_type}[]")
+        value_fn = self.compile(node.value)
+        check_type = self.check_type
+        define_array = self.define_array
+
+        if node.type_checked:
+            def define_checked(env):
+                value = value_fn(env)
+                env.declare(name, Cell(array_type_id if isinstance(value, ARRAY_TYPES) else type_id, value), slot)
+                return value
+            return define_checked
+
+        def define(env):
+            value = value_fn(env)
+            if isinstance(value, ARRAY_TYPES):
+                value = define_array(value, declared_type)
+                env.declare(name, Cell(array_type_id, value), slot)
+                return value
+
+            if check_type(value, declared_type):
+                env.declare(name, Cell(type_id, value), slot)
+            else:
+                raise TypeError(f"Type mismatch: Expected {declared_type}, got {type(value).__name__}")
+            return value
+        return define
+
+    def compile_AssignNode(self, node: AssignNode):
+        lookup = self.compile_lookup(node.address, node.name)
+        value_fn = self.compile(node.value)
+        def assign(env):
+            value = value_fn(env)
+            lookup(env).value = value
+            return value
+        return assign
+
+    ###
+    ### # Operators
+    ###
+
+    def compile_BinOpNode(self, node: BinOpNode):
+        left = self.compile(node.left)
+        right = self.compile(node.right)
+        op = node.op
+
+        if op == "ADD":
+            def add(env):
+                l = left(env)
+                r = right(env)
+                if isinstance(l, str) or isinstance(r, str):
+                    return str(l) + str(r)
+                return l + r
+            return add
+        elif op == "SUB":
+            return lambda env: left(env) - right(env)
+        elif op == "MUL":
+            return lambda env: left(env) * right(env)
+        elif op == "DIV":
+            return lambda env: left(env) / right(env)
+        elif op == "FDIV":
+            return lambda env: left(env) // right(env)
+        elif op == "MOD":
+            return lambda env: left(env) % right(env)
+        elif op == "EQ":
+            return lambda env: left(env) == right(env)
+        elif op == "NEQ":
+            return lambda env: left(env) != right(env)
+        elif op == "LT":
+            return lambda env: left(env) < right(env)
+        elif op == "LTE":
+            return lambda env: left(env) <= right(env)
+        elif op == "GT":
+            return lambda env: left(env) > right(env)
+        elif op == "GTE":
+            return lambda env: left(env) >= right(env)
+        elif op == "AND":
+            def logical_and(env):
+                l = left(env)
+                r = right(env) # Both operands are always evaluated, like the tree-walker.
+                return bool(l) and bool(r)
+            return logical_and
+        elif op == "OR":
+            def logical_or(env):
+                l = left(env)
+                r = right(env)
+                return bool(l) or bool(r)
+            return logical_or
+
+        # SCOPERESOP and unknown operators go through the shared implementation (which raises for the latter).
+        eval_binop = self.eval_binop
+        return lambda env: eval_binop(left(env), op, right(env))
+
+    def compile_UnaryOpNode(self, node: UnaryOpNode):
+        operand = self.compile(node.operand)
+        if node.op == "NOT":
+            return lambda env: not operand(env)
+
+        op = node.op
+        def unknown_unary(env):
+            operand(env)
+            raise ValueError(f"Unknown unary operator {op}")
+        return unknown_unary
+
+    ###
+    ### # Control flow
+    ###
+
+    def compile_BlockNode(self, node: BlockNode):
+        statements = tuple(self.compile(stmt) for stmt in node.statements)
+
+        if not statements:
+            return lambda env: None
+        if len(statements) == 1:
+            return statements[0]
+
+        def block(env):
+            last_result = None
+            for stmt in statements:
+                last_result = stmt(env)
+            return last_result
+        return block
+
+    def compile_IfBlockNode(self, node: IfBlockNode):
+        condition = self.compile(node.condition)
+        true_block = self.compile(node.true_block)
+        if node.false_block:
+            false_block = self.compile(node.false_block)
+            return lambda env: true_block(env) if condition(env) else false_block(env)
+        return lambda env: true_block(env) if condition(env) else None
+
+    def compile_SwitchCaseBlockNode(self, node: SwitchCaseBlockNode):
+        expression = self.compile(node.expression)
+        bodies = [self.compile(case.body) for case in node.cases]
+        table, end = switch_jump_table(node)
+        table = {value: bodies[index] for value, index in table.items()}
+        # Cases after the literal ones are compared in order.
+        cases = tuple((self.compile(case.case_value), body) for case, body in zip(node.cases[end:], bodies[end:]))
+        default_block = self.compile(node.default_block.body) if node.default_block else None
+
+        def switch(env):
+            value = expression(env)
+            try:
+                body = table.get(value)
+            except TypeError: # Unhashable values (arrays) are not equal to any literal.
+                body = None
+            if body is not None:
+                return body(env)
+            for case_value, body in cases:
+                if value == case_value(env):
+                    return body(env)
+            if default_block:
+                # Only executes if no case value is equal to the switch expression.
+                return default_block(env)
+            return None
+        return switch
+
+    def compile_TryCatchNode(self, node: TryCatchNode):
+        try_block = self.compile(node.try_block)
+        catch_block = self.compile(node.catch_block)
+        finally_block = self.compile(node.finally_block) if node.finally_block else None
+        catch_exception = node.catch_exception
+
+        def try_catch(env):
+            try:
+                return try_block(env)
+            except ReturnException:
+                raise # A return inside the try block is not an error.
+            except catch_exception:
+                return catch_block(env)
+            finally:
+                if finally_block:
+                    finally_block(env)
+        return try_catch
+
+    def compile_WhileLoopNode(self, node: WhileLoopNode):
+        condition = self.compile(node.condition)
+        body = self.compile(node.body)
+
+        def while_loop(env):
+            while condition(env):
+                body(env)
+            return None
+        return while_loop
+
+    def compile_ForLoopNode(self, node: ForLoopNode):
+        initializer = node.initializer
+        initializer_value = node.initializer_value
+        initializer_type = intern_type(type(initializer_value).__name__)
+        condition = self.compile(node.condition)
+        increment = self.compile(node.increment)
+        body = self.compile(node.body)
+        frame_size = node.frame_size
+
+        if node.counted:
+            # The bound can't change while the loop runs, so only the loop variable is updated.
+            bound = self.compile(node.condition.right)
+            inclusive = node.condition.op == "LTE"
+
+            def counted_loop(env):
+                loop_env = Env(parent=env, size=frame_size)
+                counter = Cell(initializer_type, initializer_value)
+                loop_env.declare(initializer, counter, 0)
+                steps = counted_range(initializer_value, bound(loop_env), inclusive)
+                for counter.value in steps:
+                    body(loop_env)
+                counter.value = max(steps.start, steps.stop)
+                return None
+            return counted_loop
+
+        def for_loop(env):
+            loop_env = Env(parent=env, size=frame_size)
+            loop_env.declare(initializer, Cell(initializer_type, initializer_value), 0)
+            while condition(loop_env):
+                body(loop_env)
+                increment(loop_env)
+            return None
+        return for_loop
+
+    def compile_ForEachLoopNode(self, node: ForEachLoopNode):
+        iterator = node.iterator
+        iterable_fn = self.compile(node.iterable)
+        body = self.compile(node.body)
+        iterable_node = node.iterable
+        frame_size = node.frame_size
+        iterator_type = intern_type(type(iterator).__name__)
+
+        def foreach_loop(env):
+            loop_env = Env(parent=env, size=frame_size)
+            entry = Cell(iterator_type, None)
+            loop_env.declare(iterator, entry, 0)
+            try:
+                for item in iterable_fn(loop_env):
+                    entry.value = item
+                    body(loop_env)
+            except ReturnException:
+                raise
+            except Exception as e:
+                raise RuntimeError(f"Error during foreach loop: {e}\n{iterable_node}")
+            return None
+        return foreach_loop
+
+    def compile_OutputNode(self, node: OutputNode):
+        expression = self.compile(node.expression)
+        def output(env):
+            value = expression(env)
+            print(value)
+            return value
+        return output
+
+    ###
+    ### # Functions
+    ###
+
+    def compile_FunctionDefinitionNode(self, node: FunctionDefinitionNode):
+        self.compile_body(node)
+        name = node.name
+        def define_function(env):
+            env.define_function(name, node)
+            node.global_environment = env
+            if node.call_plan is None:
+                node.call_plan = CallPlan(node)
+            node.memo = MemoCache(name) if node.pure else None
+            return None
+        return define_function
+
+    def compile_FunctionCallNode(self, node: FunctionCallNode):
+        name = node.name
+        module_name = node.module_name
+        arguments = tuple(self.compile(arg) for arg in node.arguments)
+        argc = len(arguments)
+        tail_call = node.tail_call
+        cache = None # Inline cache of the target, see Env.function_cache and Env.module_function_cache.
+
+        def call(env):
+            # Functions can be (re)defined at runtime, so the cached target is checked on every call.
+            nonlocal cache
+            if module_name:
+                if cache is None or cache[1] is not env.modules or cache[2].version != cache[3]:
+                    cache = env.module_function_cache(module_name, name)
+                function_obj = cache[0]
+                parent_env = cache[2]
+            else:
+                function_obj = None if cache is None else env.cached_function(cache)
+                if function_obj is None:
+                    cache = env.function_cache(name)
+                    function_obj = cache[0]
+                parent_env = env
+
+            # Native functions
+            if isinstance(function_obj, NativeFunction):
+                memo = function_obj.memo
+                if memo is None:
+                    return function_obj.py_impl(*[arg(env) for arg in arguments])
+                values = [arg(env) for arg in arguments]
+                key = memo.key(values)
+                result = memo.lookup(key)
+                if result is MemoCache.MISSING:
+                    result = function_obj.py_impl(*values)
+                    memo.store(key, result)
+                return result
+
+            # User defined functions
+            if isinstance(function_obj, FunctionDefinitionNode):
+                plan = function_obj.call_plan
+                values = [arg(env) for arg in arguments]
+                if argc != plan.max_args:
+                    values.extend([self.compile_default(default)(env) for default in plan.missing_defaults(argc)])
+                memo = function_obj.memo
+                if memo is not None:
+                    key = memo.key(values)
+                    result = memo.lookup(key)
+                    if result is MemoCache.MISSING:
+                        result = self.call_function(function_obj, plan.bind(function_obj.global_environment or parent_env, values))
+                        memo.store(key, result)
+                    return result
+                # Functions see the variables of the environment they were defined in (lexical scoping).
+                call_env = plan.bind(function_obj.global_environment or parent_env, values)
+                if tail_call:
+                    # `return exec f(...)`: unwind to the call that is returning and run f from its loop.
+                    raise ReturnException(None, (function_obj, call_env))
+                return self.call_function(function_obj, call_env)
+            raise TypeError(f"Object '{name}' is not callable.")
+        return call
+
+    def call_function(self, function_def: FunctionDefinitionNode, call_env: Env):
+        while True:
+            try:
+                return self.compile_body(function_def)(call_env)
+            except ReturnException as e:
+                if e.tail_call is None:
+                    return e.value
+                function_def, call_env = e.tail_call
+
+    def compile_ReturnNode(self, node: ReturnNode):
+        expression = self.compile(node.expression)
+        def return_(env):
+            raise ReturnException(expression(env))
+        return return_
+
+    ###
+    ### # Arrays
+    ###
+
+    def compile_ArrayNode(self, node: ArrayNode):
+        elements = tuple(self.compile(elem) for elem in node.elements)
+        size = node.size
+        element_type = node.element_type
+        def array(env):
+            values = [elem(env) for elem in elements]
+            if len(values) != size: # This should not execute... as this error is caught during parsing.
+                raise ValueError(f"Array size mismatch: expected {size}, got {len(values)}")
+            return values
+        if element_type not in ARRAY_TYPECODES:
+            return array
+
+        def typed(env):
+            values = array(env)
+            typed = typed_array(values, element_type)
+            return values if typed is None else typed
+        return typed
+
+    def compile_ArrayAccessNode(self, node: ArrayAccessNode):
+        array_name = node.array_name
+        lookup = self.compile_lookup(node.address, array_name)
+        index_fn = self.compile(node.index)
+        def array_access(env):
+            array = lookup(env).value
+            index = index_fn(env)
+            if not isinstance(array, ARRAY_TYPES):
+                raise TypeError(f"Variable '{array_name}' is not an array.")
+            elif not isinstance(index, int):
+                raise TypeError(f"Array index must be an integer, got {type(index).__name__}.")
+            elif index < 0 or index >= len(array):
+                raise IndexError(f"Array index {index} out of bounds for array '{array_name}' of size {len(array)}.")
+            return array[index]
+        return array_access
@@ -0,0 +1,438 @@
+from nodes import *
+from rts import intern_type
+from typing import Any, Callable, Dict
+
+### Bytecode for the Gill virtual machine (see vm.py)
+# Every node is compiled as an expression: the instructions it emits leave exactly one value on the
+# stack (statements such as loops leave None). Blocks pop the values of all but their last statement,
+# which is how a block evaluates to the value of its last statement, exactly like the tree-walker.
+#
+# A CodeObject stores its instructions in one flat list of ints: [opcode, argument, opcode, argument, ...].
+# Arguments are either jump targets (indexes into that list) or indexes into the constant pool.
+
+LOAD_CONST = 0          # push constants[arg]
+LOAD_NAME = 1           # push the value of the variable (address, name) = constants[arg] (see Env.lookup)
+DEFINE = 2              # define variable (name, type, slot, type id, array type id, type checked) = constants[arg] with the value on top of the stack (kept on the stack)
+DECLARE = 3             # declare a loop variable (name, type id) = constants[arg] without a type check (pops the value)
+ASSIGN = 4              # assign the value on top of the stack to the variable (address, name) = constants[arg] (kept on the stack)
+STORE_ITERATOR = 5      # pop a value into the loop variable named constants[arg] (slot 0 of the loop scope)
+INC = 6                 # increment the variable (address, name) = constants[arg] and push the new value
+DEC = 7                 # decrement the variable (address, name) = constants[arg] and push the new value
+POP_TOP = 8
+BINARY_ADD = 9
+BINARY_SUB = 10
+BINARY_MUL = 11
+BINARY_DIV = 12
+BINARY_FDIV = 13
+BINARY_MOD = 14
+COMPARE_EQ = 15
+COMPARE_NEQ = 16
+COMPARE_LT = 17
+COMPARE_LTE = 18
+COMPARE_GT = 19
+COMPARE_GTE = 20
+LOGICAL_AND = 21
+LOGICAL_OR = 22
+BINARY_OP = 23          # any other binary operator, name in constants[arg] (handled by Interpreter.eval_binop)
+UNARY_NOT = 24
+CAST = 25               # cast the value on top of the stack to the type named constants[arg]
+OUTPUT = 26             # print the value on top of the stack (kept on the stack)
+JUMP = 27
+POP_JUMP_IF_FALSE = 28
+POP_JUMP_IF_TRUE = 29
+DUP_TOP = 30
+ENTER_SCOPE = 31        # run the following instructions in a new child environment with arg slots
+EXIT_SCOPE = 32
+GET_ITER = 33
+FOR_ITER = 34           # store the next item of the iterator on top of the stack in the loop variable (slot 0 of the loop scope), or pop the iterator and jump to arg
+SETUP_TRY = 35          # register an exception handler (target, exception class) = constants[arg]
+POP_TRY = 36
+RERAISE = 37            # re-raise the exception on top of the stack
+WRAP_FOREACH_ERROR = 38 # raise the exception on top of the stack as a foreach RuntimeError for iterable constants[arg]
+BUILD_ARRAY = 39        # pop (count, size, element type) = constants[arg] elements into a list or TypedArray
+ARRAY_ACCESS = 40       # index the array (address, name) = constants[arg] with the value on top of the stack
+MAKE_FUNCTION = 41      # define the function whose FunctionDefinitionNode is constants[arg]
+CALL_FUNCTION = 42      # call (name, module name or None, argument count, FunctionCallNode holding the inline cache) = constants[arg]
+RETURN_VALUE = 43
+INTERPRET = 44          # run the node constants[arg] with the tree-walking Interpreter and push its value
+TAIL_CALL = 45          # like CALL_FUNCTION, but a user function replaces the current frame instead of returning to it
+JUMP_TABLE = 46         # jump to constants[arg][value on top of the stack], or fall through if the value is not in the table
+COUNTED_RANGE = 47      # replace the bound on top of the stack with the final loop value and an iterator over rts.counted_range(*constants[arg], bound)
+LOAD_LOCAL = 48         # push the value of the variable (slot, name) = constants[arg] of the current environment
+JUMP_IF_CASE = 49       # pop a case value and jump to arg if it equals the switch value below it (which stays on the stack)
+
+OPNAMES = {value: name for name, value in list(globals().items()) if name.isupper() and isinstance(value, int)}
+
+BINARY_OPCODES = {
+    "ADD": BINARY_ADD,
+    "SUB": BINARY_SUB,
+    "MUL": BINARY_MUL,
+    "DIV": BINARY_DIV,
+    "FDIV": BINARY_FDIV,
+    "MOD": BINARY_MOD,
+    "EQ": COMPARE_EQ,
+    "NEQ": COMPARE_NEQ,
+    "LT": COMPARE_LT,
+    "LTE": COMPARE_LTE,
+    "GT": COMPARE_GT,
+    "GTE": COMPARE_GTE,
+    "AND": LOGICAL_AND,
+    "OR": LOGICAL_OR,
+}
+
+class CodeObject:
+    def __init__(self, name):
+        self.name = name
+        self.code: list[int] = []     # Flat [opcode, argument, ...] instruction array.
+        self.constants: list[Any] = [] # Constant pool indexed by instruction arguments.
+        self.constant_index: Dict[Any, int] = {}
+
+    def __repr__(self):
+        return f"CodeObject({self.name}, {len(self.code) // 2} instructions)"
+
+    def add_constant(self, value) -> int:
+        # Hashable constants are shared; everything else (nodes, classes) is keyed by identity.
+        try:
+            key = (type(value), value)
+            hash(key)
+        except TypeError:
+            key = ("id", id(value))
+        if key not in self.constant_index:
+            self.constant_index[key] = len(self.constants)
+            self.constants.append(value)
+        return self.constant_index[key]
+
+    def disassemble(self) -> str:
+        lines = []
+        for ip in range(0, len(self.code), 2):
+            op, arg = self.code[ip], self.code[ip + 1]
+            lines.append(f"{ip:>6} {OPNAMES[op]:<20}{arg}")
+        return "\n".join(lines)
+
+class Compiler:
+    """Lowers a parsed Gill program into a flat CodeObject for the VirtualMachine."""
+
+    # Node class -> compile_<NodeName> method, resolved through the MRO like Interpreter.handlers.
+    compilers: Dict[type, Callable] = {}
+
+    def __init__(self):
+        self.code: CodeObject = None
+        self.regions: list[TryCatchNode] = [] # Exception regions enclosing the code being compiled.
+
+    def compile_program(self, program: BlockNode) -> CodeObject:
+        return self.compile_code("<program>", program)
+
+    def compile_function(self, function_def: FunctionDefinitionNode) -> CodeObject:
+        return self.compile_code(function_def.name, function_def.body)
+
+    def compile_code(self, name, body) -> CodeObject:
+        outer_code, outer_regions = self.code, self.regions
+        self.code, self.regions = CodeObject(name), []
+        try:
+            self.compile(body)
+            self.emit(RETURN_VALUE)
+            return self.code
+        finally:
+            self.code, self.regions = outer_code, outer_regions
+
+    def compile(self, node):
+        compiler = self.compilers.get(node.__class__)
+        if compiler is None:
+            compiler = self.resolve_compiler(node.__class__)
+        compiler(self, node)
+
+    @classmethod
+    def resolve_compiler(cls, node_type: type) -> Callable:
+        compiler = cls.compile_fallback
+        for klass in node_type.__mro__:
+            method = getattr(cls, f"compile_{klass.__name__}", None)
+            if method is not None:
+                compiler = method
+                break
+        cls.compilers[node_type] = compiler
+        return compiler
+
+    ###
+    ### # Emitting helpers
+    ###
+
+    def emit(self, op, arg=0) -> int:
+        """Append an instruction and return its position."""
+        self.code.code.append(op)
+        self.code.code.append(arg)
+        return len(self.code.code) - 2
+
+    def emit_const(self, op, value) -> int:
+        return self.emit(op, self.code.add_constant(value))
+
+    def emit_jump(self, op) -> int:
+        """Emit a jump whose target is filled in later with patch()."""
+        return self.emit(op, -1)
+
+    def patch(self, position, target=None):
+        self.code.code[position + 1] = self.here() if target is None else target
+
+    def here(self) -> int:
+        return len(self.code.code)
+
+    ###
+    ### # Nodes
+    ###
+
+    def compile_fallback(self, node):
+        # Nodes without a dedicated instruction sequence (imports, namespaces, ...) run on the tree-walker.
+        self.emit_const(INTERPRET, node)
+
+    def compile_NoneType(self, node):
+        self.emit_const(LOAD_CONST, None)
+
+    def compile_NumberNode(self, node: NumberNode):
+        self.emit_const(LOAD_CONST, node.value)
+
+    def compile_StringNode(self, node: StringNode):
+        self.emit_const(LOAD_CONST, node.value)
+
+    def compile_CharNode(self, node: CharNode):
+        self.emit_const(LOAD_CONST, node.value)
+
+    def compile_BooleanNode(self, node: BooleanNode):
+        if node.value == "true":
+            self.emit_const(LOAD_CONST, True)
+        elif node.value == "false":
+            self.emit_const(LOAD_CONST, False)
+        else:
+            self.compile_fallback(node) # Raises the interpreter's error when executed.
+
+    def compile_CastNode(self, node: CastNode):
+        self.compile(node.expression)
+        self.emit_const(CAST, node.target_type.lower())
+
+    def compile_IdentifierNode(self, node: IdentifierNode):
+        address = node.address
+        if address is not None and address[0] == 0:
+            self.emit_const(LOAD_LOCAL, (address[1], node.name))
+        else:
+            self.emit_const(LOAD_NAME, (address, node.name))
+
+    def compile_BinOpNode(self, node: BinOpNode):
+        self.compile(node.left)
+        self.compile(node.right)
+        if node.op in BINARY_OPCODES:
+            self.emit(BINARY_OPCODES[node.op])
+        else:
+            self.emit_const(BINARY_OP, node.op)
+
+    def compile_UnaryOpNode(self, node: UnaryOpNode):
+        if node.op != "NOT":
+            self.compile_fallback(node)
+            return
+        self.compile(node.operand)
+        self.emit(UNARY_NOT)
+
+    def compile_IncNode(self, node: IncNode):
+        self.emit_const(INC, (node.address, node.identifier))
+
+    def compile_DecNode(self, node: DecNode):
+        self.emit_const(DEC, (node.address, node.identifier))
+
+    def compile_DefineNode(self, node: DefineNode):
+        self.compile(node.value)
+        self.emit_const(DEFINE, (node.name, node.type_, node.slot, intern_type(node.type_), intern_type(f"{node.type_}[]"), node.type_checked))
+
+    def compile_AssignNode(self, node: AssignNode):
+        self.compile(node.value)
+        self.emit_const(ASSIGN, (node.address, node.name))
+
+    def compile_OutputNode(self, node: OutputNode):
+        self.compile(node.expression)
+        self.emit(OUTPUT)
+
+    def compile_BlockNode(self, node: BlockNode):
+        if not node.statements:
+            self.emit_const(LOAD_CONST, None)
+            return
+        for i, stmt in enumerate(node.statements):
+            if i:
+                self.emit(POP_TOP)
+            self.compile(stmt)
+
+    def compile_IfBlockNode(self, node: IfBlockNode):
+        self.compile(node.condition)
+        to_else = self.emit_jump(POP_JUMP_IF_FALSE)
+        self.compile(node.true_block)
+        to_end = self.emit_jump(JUMP)
+        self.patch(to_else)
+        self.compile(node.false_block if node.false_block else None)
+        self.patch(to_end)
+
+    def compile_SwitchCaseBlockNode(self, node: SwitchCaseBlockNode):
+        # The switch value stays on the stack while it is looked up in the jump table of the literal
+        # cases, and then compared against the remaining case values in order.
+        self.compile(node.expression)
+        table, end = switch_jump_table(node)
+        targets = {} # Filled in with the body positions once they are known.
+        if end:
+            self.emit_const(JUMP_TABLE, targets)
+        to_bodies = []
+        for case in node.cases[end:]:
+            self.compile(case.case_value)
+            to_bodies.append(self.emit_jump(JUMP_IF_CASE))
+
+        self.emit(POP_TOP)
+        self.compile(node.default_block.body if node.default_block else None)
+        to_end = [self.emit_jump(JUMP)]
+
+        bodies = []
+        for i, case in enumerate(node.cases):
+            if i >= end:
+                self.patch(to_bodies[i - end])
+            bodies.append(self.here())
+            self.emit(POP_TOP)
+            self.compile(case.body)
+            to_end.append(self.emit_jump(JUMP))
+        targets.update((value, bodies[index]) for value, index in table.items())
+
+        for jump in to_end:
+            self.patch(jump)
+
+    def compile_TryCatchNode(self, node: TryCatchNode):
+        # try:      SETUP_TRY handler; <try block>; POP_TRY; [finally]; JUMP end
+        # handler:  POP_TOP (exception); [SETUP_TRY cleanup]; <catch block>; [POP_TRY; finally]; JUMP end
+        # cleanup:  <finally>; RERAISE
+        setup = self.emit_jump(SETUP_TRY)
+        self.regions.append(node)
+        self.compile(node.try_block)
+        self.regions.pop()
+        self.emit(POP_TRY)
+        self.compile_finally(node)
+        to_end = [self.emit_jump(JUMP)]
+
+        self.code.code[setup + 1] = self.code.add_constant((self.here(), node.catch_exception))
+        self.emit(POP_TOP)
+        if node.finally_block:
+            cleanup_setup = self.emit_jump(SETUP_TRY)
+            self.regions.append(node)
+            self.compile(node.catch_block)
+            self.regions.pop()
+            self.emit(POP_TRY)
+            self.compile_finally(node)
+            to_end.append(self.emit_jump(JUMP))
+
+            self.code.code[cleanup_setup + 1] = self.code.add_constant((self.here(), Exception))
+            self.compile(node.finally_block)
+            self.emit(POP_TOP)
+            self.emit(RERAISE)
+        else:
+            self.compile(node.catch_block)
+            to_end.append(self.emit_jump(JUMP))
+
+        for jump in to_end:
+            self.patch(jump)
+
+    def compile_finally(self, node: TryCatchNode):
+        # The finally block runs for its effects; the try/catch keeps the value below it.
+        if node.finally_block:
+            self.compile(node.finally_block)
+            self.emit(POP_TOP)
+
+    def compile_WhileLoopNode(self, node: WhileLoopNode):
+        start = self.here()
+        self.compile(node.condition)
+        to_end = self.emit_jump(POP_JUMP_IF_FALSE)
+        self.compile(node.body)
+        self.emit(POP_TOP)
+        self.emit(JUMP, start)
+        self.patch(to_end)
+        self.emit_const(LOAD_CONST, None)
+
+    def compile_ForLoopNode(self, node: ForLoopNode):
+        self.emit(ENTER_SCOPE, node.frame_size)
+        self.emit_const(LOAD_CONST, node.initializer_value)
+        self.emit_const(DECLARE, (node.initializer, intern_type(type(node.initializer_value).__name__)))
+        if node.counted:
+            # The bound can't change while the loop runs: iterate over a range, leaving the final
+            # value of the loop variable under the iterator to store once it is exhausted.
+            self.compile(node.condition.right)
+            self.emit_const(COUNTED_RANGE, (node.initializer_value, node.condition.op == "LTE"))
+            start = self.here()
+            to_end = self.emit_jump(FOR_ITER)
+            self.compile(node.body)
+            self.emit(POP_TOP)
+            self.emit(JUMP, start)
+            self.patch(to_end)
+            self.emit_const(STORE_ITERATOR, node.initializer)
+            self.emit(EXIT_SCOPE)
+            self.emit_const(LOAD_CONST, None)
+            return
+        start = self.here()
+        self.compile(node.condition)
+        to_end = self.emit_jump(POP_JUMP_IF_FALSE)
+        self.compile(node.body)
+        self.emit(POP_TOP)
+        self.compile(node.increment)
+        self.emit(POP_TOP)
+        self.emit(JUMP, start)
+        self.patch(to_end)
+        self.emit(EXIT_SCOPE)
+        self.emit_const(LOAD_CONST, None)
+
+    def compile_ForEachLoopNode(self, node: ForEachLoopNode):
+        # Errors raised anywhere in the loop are re-raised as a RuntimeError, like the tree-walker does.
+        setup = self.emit_jump(SETUP_TRY)
+        self.regions.append(None)
+        self.emit(ENTER_SCOPE, node.frame_size)
+        self.emit_const(LOAD_CONST, None)
+        self.emit_const(DECLARE, (node.iterator, intern_type(type(node.iterator).__name__)))
+        self.compile(node.iterable)
+        self.emit(GET_ITER)
+        start = self.here()
+        to_end = self.emit_jump(FOR_ITER)
+        self.compile(node.body)
+        self.emit(POP_TOP)
+        self.emit(JUMP, start)
+        self.patch(to_end)
+        self.emit(EXIT_SCOPE)
+        self.regions.pop()
+        self.emit(POP_TRY)
+        self.emit_const(LOAD_CONST, None)
+        to_exit = self.emit_jump(JUMP)
+
+        self.code.code[setup + 1] = self.code.add_constant((self.here(), Exception))
+        self.emit_const(WRAP_FOREACH_ERROR, node.iterable)
+        self.patch(to_exit)
+
+    def compile_FunctionDefinitionNode(self, node: FunctionDefinitionNode):
+        # Function bodies are compiled lazily by the VM on their first call.
+        self.emit_const(MAKE_FUNCTION, node)
+
+    def compile_FunctionCallNode(self, node: FunctionCallNode):
+        for arg in node.arguments:
+            self.compile(arg)
+        self.emit_const(CALL_FUNCTION, (node.name, node.module_name, len(node.arguments), node))
+
+    def compile_ReturnNode(self, node: ReturnNode):
+        # The resolver only marks tail calls outside of try statements, so no finally block can be skipped.
+        call = node.expression if isinstance(node.expression, FunctionCallNode) and node.expression.tail_call else None
+        if call is not None:
+            for arg in call.arguments:
+                self.compile(arg)
+        else:
+            self.compile(node.expression)
+        # Leave every enclosing exception region, running finally blocks on the way out.
+        for region in reversed(self.regions):
+            self.emit(POP_TRY)
+            if region is not None:
+                self.compile_finally(region)
+        if call is not None:
+            # A native function leaves its value for RETURN_VALUE; a user function never gets back here.
+            self.emit_const(TAIL_CALL, (call.name, call.module_name, len(call.arguments), call))
+        self.emit(RETURN_VALUE)
+
+    def compile_ArrayNode(self, node: ArrayNode):
+        for elem in node.elements:
+            self.compile(elem)
+        self.emit_const(BUILD_ARRAY, (len(node.elements), node.size, node.element_type))
+
+    def compile_ArrayAccessNode(self, node: ArrayAccessNode):
+        self.compile(node.index)
+        self.emit_const(ARRAY_ACCESS, (node.address, node.array_name))
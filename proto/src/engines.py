@@ -0,0 +1,22 @@
+from interpreter import Interpreter
+from closure_compiler import ClosureCompiler
+from vm import VirtualMachine
+from transpiler import PythonTranspiler
+from environment import Env
+
+# Execution engines selectable from main.py and repl.py with --engine.
+# Every engine is constructed with the global environment and runs a parsed program with run(ast).
+ENGINES = {
+    "tree": Interpreter,        # Tree-walking interpreter (reference implementation).
+    "closure": ClosureCompiler, # Compiles the AST into nested Python closures before running it.
+    "vm": VirtualMachine,       # Compiles the AST to bytecode (compiler.py) and runs it on a stack VM.
+    "python": PythonTranspiler, # Translates the AST to Python source and runs it through compile().
+}
+
+DEFAULT_ENGINE = "tree"
+
+def create_engine(name: str, global_env: Env, **options):
+    """Create the engine registered as `name`; `options` are passed on to its constructor."""
+    if name not in ENGINES:
+        raise ValueError(f"Unknown engine '{name}'. Available engines: {', '.join(ENGINES)}")
+    return ENGINES[name](global_env, **options)
@@ -1,9 +1,13 @@
 
 class Env(object):
-    def __init__(self, variables=None, functions=None, modules=None, parent=None):
+    __slots__ = ("parent", "variables", "slots", "functions", "modules", "version")
+
+    def __init__(self, variables=None, functions=None, modules=None, parent=None, size=0):
         self.parent = parent
-        self.variables = variables or {} # Store nested dicts as "name": {"type": type, "value": value}
+        self.variables = variables or {} # Maps names to rts.Cell objects holding the variable's type and value.
+        self.slots = [None] * size # The same entries, indexed by the slots resolver.Resolver assigned. None until defined.
         self.functions = functions or {}
+        self.version = 0 # Bumped by define_function and when a module is replaced, so call sites can tell their cached lookups went stale.
         if modules is not None:
             self.modules = modules
         elif parent is not None:
@@ -11,10 +15,142 @@ class Env(object):
         else:
             self.modules = {}
 
+    @classmethod
+    def frame(cls, parent, names, cells, size):
+        """Create the environment of a function call whose first slots hold the parameter `cells`.
+
+        Bypasses __init__ so a call allocates only what it needs: the parameter cells are stored
+        once, in both `variables` and `slots`, and the module registry is shared with `parent`.
+        """
+        env = cls.__new__(cls)
+        env.parent = parent
+        env.variables = dict(zip(names, cells))
+        if size > len(cells):
+            cells.extend([None] * (size - len(cells)))
+        env.slots = cells
+        env.functions = {}
+        env.modules = parent.modules
+        env.version = 0
+        return env
+
     def define(self, name, value):
         self.variables[name] = value
-        
+
+    def declare(self, name, entry, slot=None):
+        """Define the variable entry `name` in this environment, also storing it in `slot` if given."""
+        self.variables[name] = entry
+        if slot is not None and slot < len(self.slots):
+            self.slots[slot] = entry
+
+    def resize(self, size):
+        """Grow the slot array to hold at least `size` slots."""
+        if size > len(self.slots):
+            self.slots.extend([None] * (size - len(self.slots)))
+
+    def lookup(self, address, name):
+        """Return the variable entry for `name` using its resolved (depth, slot) `address`.
+
+        Falls back to searching by name when the name was not resolved, the environment has no such
+        slot, or the slot has not been defined yet (the name may then refer to an outer variable).
+        """
+        if address is not None:
+            depth, slot = address
+            env = self
+            while depth:
+                env = env.parent
+                depth -= 1
+            if slot < len(env.slots):
+                entry = env.slots[slot]
+                if entry is not None:
+                    return entry
+        return self.get(name)
+
+    def get(self, name):
+        """Return the variable entry for `name`, searching enclosing environments."""
+        env = self
+        while env is not None:
+            if name in env.variables:
+                return env.variables[name]
+            env = env.parent
+        raise NameError(f"Variable '{name}' is not defined.")
+
+    def set(self, name, value):
+        """Replace the variable entry for `name` in the environment that defines it."""
+        env = self
+        while env is not None:
+            if name in env.variables:
+                env.variables[name] = value
+                return
+            env = env.parent
+        raise NameError(f"Variable '{name}' is not defined.")
+
+    def get_function(self, name):
+        """Return the function `name`, searching enclosing environments."""
+        env = self
+        while env is not None:
+            if name in env.functions:
+                return env.functions[name]
+            env = env.parent
+        raise NameError(f"Function '{name}' not found.")
+
+    def define_function(self, name, function):
+        self.functions[name] = function
+        self.version += 1
+
+    def import_module(self, name, module_env):
+        """Register `module_env` as `name`; a module it replaces is marked stale by bumping its version."""
+        previous = self.modules.get(name)
+        if previous is not None and previous is not module_env:
+            previous.version += 1
+        self.modules[name] = module_env
+
+    def function_cache(self, name):
+        """Look up the function `name` like get_function, returning an inline cache entry for it.
+
+        The entry is (function, owner, version, depth): the function was found `depth` environments
+        up, in `owner`, while owner.version was `version`. cached_function() checks that it still holds.
+        """
+        env = self
+        depth = 0
+        while env is not None:
+            if name in env.functions:
+                return (env.functions[name], env, env.version, depth)
+            env = env.parent
+            depth += 1
+        raise NameError(f"Function '{name}' not found.")
+
+    def module_function_cache(self, module_name, name):
+        """Look up `module_name::name`, returning an inline cache entry (function, registry, module, version).
+
+        The entry holds while `registry` is still this environment's module registry and the module's
+        version is unchanged, which also catches the module being replaced by a new import.
+        """
+        if module_name not in self.modules:
+            raise NameError(f"Module '{module_name}' not found.")
+        module_env = self.modules[module_name]
+        if name not in module_env.functions:
+            raise NameError(f"Function '{name}' not found in module '{module_name}'.")
+        return (module_env.functions[name], self.modules, module_env, module_env.version)
+
+    def cached_function(self, cache):
+        """Return the function of a function_cache() entry if a lookup from here would still find it, else None.
+
+        Environments between here and the owner must not define any function, and the owner must not
+        have (re)defined one since the entry was made. That takes no dictionary lookups.
+        """
+        function, owner, version, depth = cache
+        env = self
+        while depth and not env.functions:
+            env = env.parent
+            depth -= 1
+        if depth or env is not owner or owner.version != version:
+            return None
+        return function
+
 class ModuleEnv(Env):
+    __slots__ = ("module_name", "members")
+
     def __init__(self, module_name, variables=None, functions=None, modules=None, parent=None):
         super().__init__(variables=variables, functions=functions, modules=modules, parent=parent)
-        self.module_name = module_name 
\ No newline at end of file
+        self.module_name = module_name
+        self.members = {} # name -> (version, rts.MemberRef) for `module::name`, see Interpreter.scope_member.
\ No newline at end of file
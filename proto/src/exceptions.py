@@ -1,4 +1,4 @@
-
 class ReturnException(Exception):
-    def __init__(self, value):
+    def __init__(self, value, tail_call=None):
         self.value = value
+        self.tail_call = tail_call # (function, call environment) to run in place of the returning call.
@@ -0,0 +1,199 @@
+from array import array
+from nodes import *
+from typing import Dict, List
+import builtins
+import hashlib
+import marshal
+import sys
+
+# Node kinds are indexes into NODE_CLASSES. The classes from nodes.py come first, in definition
+# order; node classes defined elsewhere are appended the first time they are flattened.
+NODE_CLASSES: List[type] = list(ASTNode.__subclasses__())
+NODE_KINDS: Dict[type, int] = {cls: kind for kind, cls in enumerate(NODE_CLASSES)}
+
+# Field values are stored as tagged integers: (payload << 2) | tag.
+TAG_NODE = 0  # payload is a node index
+TAG_CONST = 1 # payload is an index into the constant pool
+TAG_LIST = 2  # payload is a list index; its items are items[list_offsets[i]:list_offsets[i + 1]]
+TAG_NONE = 3
+
+def layout_signature() -> str:
+    """Identify the node layout and buffer formats; serialized FlatASTs are only valid for the same signature."""
+    layout = [(cls.__module__, cls.__name__, cls._syntax) for cls in NODE_CLASSES]
+    buffers = [(code, array(code).itemsize) for code in "BIq"]
+    return hashlib.sha256(repr((layout, buffers, sys.byteorder)).encode()).hexdigest()[:16]
+
+def node_kind(node_type: type) -> int:
+    kind = NODE_KINDS.get(node_type)
+    if kind is None:
+        kind = NODE_KINDS[node_type] = len(NODE_CLASSES)
+        NODE_CLASSES.append(node_type)
+    return kind
+
+class FlatAST:
+    """Struct-of-arrays form of an AST.
+
+    Nodes are numbered in pre-order (the root is node 0). For each node, `kinds` holds its node
+    class and `field_offsets` the position of its first field in `fields`, which stores one tagged
+    value per entry of the class' _syntax. The fields in _state are left out: they are only meaningful
+    to the run (or the process) that set them, and are given their initial value again when rebuilt. Lists of nodes are stored in `items`, and every other
+    value (names, numbers, operators, ...) in the deduplicated `constants` pool. Apart from the
+    pool, the whole tree lives in a handful of array.array buffers instead of one object per node.
+
+    root returns a read-only NodeView of the tree, and to_tree() rebuilds regular ASTNode objects
+    that the engines can run.
+    """
+
+    def __init__(self):
+        self.kinds = array("B")
+        self.field_offsets = array("I")
+        self.fields = array("q")
+        self.list_offsets = array("I", [0])
+        self.items = array("q")
+        self.constants: list = []
+        self.constant_index: dict = {}
+
+    def __len__(self):
+        return len(self.kinds)
+
+    @classmethod
+    def from_tree(cls, root: ASTNode) -> "FlatAST":
+        flat = cls()
+        flat.add_node(root)
+        return flat
+
+    @property
+    def root(self) -> "NodeView":
+        return NodeView(self, 0)
+
+    ###
+    ### # Encoding
+    ###
+
+    def add_node(self, node: ASTNode) -> int:
+        index = len(self.kinds)
+        node_type = node.__class__
+        self.kinds.append(node_kind(node_type))
+        start = len(self.fields)
+        self.field_offsets.append(start)
+        # Reserve the node's fields first so its children are numbered after it (pre-order).
+        self.fields.extend([TAG_NONE] * len(node_type._syntax))
+        for position, field in enumerate(node_type._syntax):
+            self.fields[start + position] = self.encode(getattr(node, field, None))
+        return index
+
+    def encode(self, value) -> int:
+        if value is None:
+            return TAG_NONE
+        elif isinstance(value, ASTNode):
+            return self.add_node(value) << 2 | TAG_NODE
+        elif isinstance(value, list):
+            encoded = [self.encode(item) for item in value]
+            self.items.extend(encoded)
+            self.list_offsets.append(len(self.items))
+            return (len(self.list_offsets) - 2) << 2 | TAG_LIST
+        return self.add_constant(value) << 2 | TAG_CONST
+
+    def add_constant(self, value) -> int:
+        try:
+            key = (value.__class__, value) # 1 and 1.0 and True are different constants.
+            index = self.constant_index.get(key)
+        except TypeError: # Unhashable values are stored without deduplication.
+            key = index = None
+        if index is None:
+            index = len(self.constants)
+            self.constants.append(value)
+            if key is not None:
+                self.constant_index[key] = index
+        return index
+
+    ###
+    ### # Serialization
+    ###
+
+    def dumps(self) -> bytes:
+        """Serialize with marshal. Raises ValueError if a constant can't be marshalled."""
+        # Builtin exception classes (TryCatchNode.catch_exception) are stored by name.
+        constants = list(self.constants)
+        classes = {}
+        for index, value in enumerate(constants):
+            if isinstance(value, type) and issubclass(value, BaseException) and value.__module__ == "builtins":
+                classes[index] = value.__name__
+                constants[index] = None
+        buffers = tuple(buffer.tobytes() for buffer in (self.kinds, self.field_offsets, self.fields, self.list_offsets, self.items))
+        return marshal.dumps((buffers, constants, classes))
+
+    @classmethod
+    def loads(cls, data: bytes) -> "FlatAST":
+        """Inverse of dumps()."""
+        buffers, constants, classes = marshal.loads(data)
+        flat = cls()
+        for buffer, raw in zip((flat.kinds, flat.field_offsets, flat.fields, flat.list_offsets, flat.items), buffers):
+            del buffer[:]
+            buffer.frombytes(raw)
+        for index, name in classes.items():
+            constants[index] = getattr(builtins, name)
+        flat.constants = constants
+        return flat
+
+    ###
+    ### # Decoding
+    ###
+
+    def field(self, index: int, position: int):
+        """Decode field number `position` of node `index`, returning child nodes as NodeViews."""
+        return self.decode(self.fields[self.field_offsets[index] + position], NodeView)
+
+    def decode(self, value: int, make_node):
+        tag = value & 3
+        payload = value >> 2
+        if tag == TAG_NODE:
+            return make_node(self, payload)
+        elif tag == TAG_CONST:
+            return self.constants[payload]
+        elif tag == TAG_LIST:
+            start, end = self.list_offsets[payload], self.list_offsets[payload + 1]
+            return [self.decode(item, make_node) for item in self.items[start:end]]
+        return None
+
+    def to_tree(self) -> ASTNode:
+        """Rebuild the tree as ASTNode objects."""
+        return self.build_node(self, 0)
+
+    @staticmethod
+    def build_node(flat: "FlatAST", index: int) -> ASTNode:
+        node_type = NODE_CLASSES[flat.kinds[index]]
+        node = node_type.__new__(node_type)
+        start = flat.field_offsets[index]
+        for position, field in enumerate(node_type._syntax):
+            setattr(node, field, flat.decode(flat.fields[start + position], flat.build_node))
+        node.init_state()
+        return node
+
+class NodeView:
+    """Read-only view of one node of a FlatAST, with the syntax attributes of its ASTNode class."""
+    __slots__ = ("flat", "index")
+
+    def __init__(self, flat: FlatAST, index: int):
+        self.flat = flat
+        self.index = index
+
+    @property
+    def node_type(self) -> type:
+        return NODE_CLASSES[self.flat.kinds[self.index]]
+
+    def __getattr__(self, name):
+        try:
+            position = self.node_type._syntax.index(name)
+        except ValueError:
+            raise AttributeError(f"{self.node_type.__name__} has no field '{name}'") from None
+        return self.flat.field(self.index, position)
+
+    def __eq__(self, other):
+        return isinstance(other, NodeView) and other.flat is self.flat and other.index == self.index
+
+    def __hash__(self):
+        return hash((id(self.flat), self.index))
+
+    def __repr__(self):
+        return f"NodeView({self.node_type.__name__} #{self.index})"
@@ -0,0 +1,122 @@
+from bisect import bisect_left, bisect_right
+from lexer import Lexer, STREAM_MARGIN
+from parser import Parser
+from nodes import BlockNode
+from tokenclass import TokenStream
+
+class IncrementalParser:
+    """Keeps the tokens and top-level statements of a source text up to date as the text is edited.
+
+    edit() re-lexes from shortly before the edit until the new tokens line up with the old ones
+    again; the tokens after that point are kept and only moved to their new offsets, lines and
+    columns. It then re-parses from the statement before the first changed token until a statement
+    ends where an old one started, and keeps the old statement nodes from there on. Reused nodes are
+    shared with the previous `program`, not copied.
+
+    edit() raises SyntaxError when the new text doesn't parse. The tokens are still updated, while
+    `statements` keep the last successful parse until a later edit parses the whole text again.
+    """
+
+    def __init__(self, text: str = ""):
+        self.lexer = Lexer()
+        self.text = ""
+        self.tokens = TokenStream()
+        self.statements: list = []
+        # Index of the first token of every statement, followed by the number of tokens.
+        self.bounds: list = [0]
+        self.stale = True # The statements don't match the tokens and have to be parsed from scratch.
+        self.relexed = 0  # Tokens lexed by the last edit.
+        self.reparsed = 0 # Statements parsed by the last edit.
+        if text:
+            self.edit(0, 0, text)
+        else:
+            self.stale = False
+
+    @property
+    def program(self) -> BlockNode:
+        return BlockNode(list(self.statements))
+
+    def edit(self, offset: int, removed: int, inserted: str) -> BlockNode:
+        """Replace `removed` characters at `offset` with `inserted` and return the updated program."""
+        old_text = self.text
+        if offset < 0 or removed < 0 or offset + removed > len(old_text):
+            raise ValueError(f"Edit at {offset}, removing {removed} characters, is outside of the text ({len(old_text)} characters).")
+        self.text = old_text[:offset] + inserted + old_text[offset + removed:]
+        first, end, count = self.relex(old_text, offset, removed, inserted)
+        self.reparse(first, end, count)
+        return self.program
+
+    def relex(self, old_text: str, offset: int, removed: int, inserted: str):
+        """Re-lex around an edit; returns (first changed token, old end of the change, new tokens)."""
+        tokens = self.tokens
+        offsets, lines, columns = tokens.offsets, tokens.lines, tokens.columns
+        # Tokens starting a few characters before the edit may have looked at the edited text (e.g.
+        # `(int` before a `)` is inserted), so re-lex from before them.
+        first = bisect_left(offsets, offset - STREAM_MARGIN) - 1
+        last_quote = old_text.rfind('"')
+        if '"' in inserted and 0 <= last_quote < offset:
+            # The lexer skips a quote that is never closed; closing it turns what follows into a string.
+            first = min(first, bisect_right(offsets, last_quote) - 1)
+        if first < 0:
+            first, position, line, column = 0, 0, 1, 1
+        else:
+            position, line, column = offsets[first], lines[first], columns[first]
+
+        delta = len(inserted) - removed
+        # The old tokens after the edit, at their new offsets, are where lexing can stop: from the
+        # first one the new lexer also starts a token at, the rest of the text lexes the same.
+        end = bisect_left(offsets, offset + removed)
+        line_delta = column_delta = 0
+        new_tokens = []
+        for token in self.lexer.lex((self.text,), position, line, column):
+            start = token[4]
+            while end < len(offsets) and offsets[end] + delta < start:
+                end += 1
+            if end < len(offsets) and offsets[end] + delta == start:
+                line_delta = token[2] - lines[end]
+                column_delta = token[3] - columns[end]
+                break
+            new_tokens.append(token)
+        else:
+            end = len(offsets)
+
+        tokens.shift(end, delta, line_delta, column_delta)
+        tokens.splice(first, end, new_tokens)
+        self.relexed = len(new_tokens)
+        return first, end, len(new_tokens)
+
+    def reparse(self, first: int, end: int, count: int):
+        """Re-parse after the old tokens [first, end) were replaced by `count` new ones."""
+        tokens = self.tokens
+        if self.stale:
+            statements, bounds, index = [], [0], 0
+        else:
+            statements, bounds = self.statements, self.bounds
+            # A statement looks at the token after its last one, so start with the statement the
+            # token before the change belongs to.
+            index = min(max(bisect_right(bounds, first - 1) - 1, 0), len(statements))
+        shift = count - (end - first)
+        changed_end = first + count
+
+        self.stale = True
+        start = bounds[index]
+        tokens.seek(start)
+        new_statements = []
+        new_bounds = []
+        reused = len(statements)
+        for statement in Parser(tokens).statements():
+            new_statements.append(statement)
+            new_bounds.append(start)
+            start = tokens.position
+            if start >= changed_end:
+                # Past the change, stop at the first boundary that was already one before the edit.
+                old_start = start - shift
+                candidate = bisect_left(bounds, old_start, index + 1)
+                if candidate < len(statements) and bounds[candidate] == old_start:
+                    reused = candidate
+                    break
+
+        self.statements = statements[:index] + new_statements + statements[reused:]
+        self.bounds = bounds[:index] + new_bounds + [bound + shift for bound in bounds[reused:len(statements)]] + [len(tokens)]
+        self.stale = False
+        self.reparsed = len(new_statements)
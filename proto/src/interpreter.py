@@ -3,319 +3,488 @@ from rts import *
 from environment import Env, ModuleEnv
 import os
 import importlib.util
-from typing import Dict
+from typing import Callable, Dict
 from exceptions import ReturnException
+from resolver import Resolver
+from typechecker import TypeChecker
 
 class Interpreter:
+    # Handler table mapping a node class to the visit_<NodeName> method that executes it.
+    # Entries are resolved once per class (see resolve_handler) and reused on every visit, so
+    # dispatch is a single dict lookup instead of walking an isinstance chain. Subclasses of
+    # existing nodes inherit their parent's handler, and new node types only need a matching
+    # visit_<NodeName> method (or a call to Interpreter.register) to be picked up.
+    handlers: Dict[type, Callable] = {}
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        cls.handlers = {} # Each interpreter subclass gets its own table so overridden handlers are honoured.
+
     def __init__(self, global_env: Env):
         self.global_env: Env = global_env
+        # Set by a `return` once its value is computed. Blocks and loops stop as soon as they see it and
+        # pass the value up as their own, until the function call (or run) that owns it clears it.
+        self.returning = False
+        self.pending_call = None # (function, call environment) of a tail call waiting to run, see visit_FunctionCallNode.
+        self.resolver = Resolver()
+        self.type_checker = TypeChecker(self.read_python_module_env)
         self.module_paths: Dict[str, str] = {
             "stdlib": "./proto/src/packages/stdlib.py",
         }
 
+    def run(self, program):
+        """Execute a parsed program and return the value of its last statement."""
+        self.resolve(program)
+        try:
+            return self.visit(program)
+        finally:
+            self.returning = False # A top-level return ends the program.
+
+    def resolve(self, program):
+        """Assign variable slots in `program`, size the global environment to match and type check it."""
+        self.resolver.resolve(program)
+        self.global_env.resize(self.resolver.global_size)
+        self.type_checker.check(program)
+
     def visit(self, node):
         """Dispatch method based on node type"""
+        handler = self.handlers.get(node.__class__)
+        if handler is None:
+            handler = self.resolve_handler(node.__class__)
+        return handler(self, node)
 
-        if isinstance(node, NumberNode):
-            return node.value
-        
-        elif isinstance(node, StringNode): 
-            return node.value
-        
-        elif isinstance(node, CharNode):
-            return node.value
-        
-        elif isinstance(node, BooleanNode):
-            return self.eval_boolean(node.value)
-        
-        elif isinstance(node, CastNode):
-            target_type = node.target_type.lower()
-            
-            if node.expression in self.global_env.variables: # Check if the expression is an identifier/variable
-                value = self.global_env.variables[node.expression]
-            else:
-                value = self.visit(node.expression)
-
-            if target_type == "int":
-                return int(value)
-            elif target_type == "float":
-                return float(value)
-            elif target_type == "string":
-                return str(value)
-            elif target_type == "char":
-                return str(value)[0]  # take first character
-            elif target_type == "bool":
-                return bool(value)
-            elif target_type == "void":
+    @classmethod
+    def resolve_handler(cls, node_type: type) -> Callable:
+        """Find the handler for `node_type` by walking its MRO and cache it in the handler table."""
+        handler = cls.generic_visit
+        for klass in node_type.__mro__:
+            method = getattr(cls, f"visit_{klass.__name__}", None)
+            if method is not None:
+                handler = method
+                break
+        cls.handlers[node_type] = handler
+        return handler
+
+    @classmethod
+    def register(cls, node_type: type):
+        """Decorator that installs `func` as the handler for `node_type` (and its subclasses).
+
+        Useful for node types defined outside of nodes.py:
+
+            @Interpreter.register(MyNode)
+            def visit_my_node(interpreter, node):
+                ...
+        """
+        def decorator(func):
+            setattr(cls, f"visit_{node_type.__name__}", func)
+            cls.handlers.clear() # Drop cached entries so subclasses of node_type see the new handler.
+            return func
+        return decorator
+
+    def escape_return(self, value):
+        """Re-raise a return made by tree-walked code as a ReturnException.
+
+        For engines that run some nodes on this tree-walker but unwind their own Gill calls with
+        ReturnException. Returns `value` when no return is pending.
+        """
+        if self.returning:
+            self.returning = False
+            if self.pending_call is not None:
+                function_def, call_env = self.pending_call
+                self.pending_call = None
+                value = self.call_function(function_def, call_env)
+            raise ReturnException(value)
+        return value
+
+    def generic_visit(self, node):
+        # Nodes without a handler (e.g. None for an omitted block) evaluate to nothing.
+        return None
+
+    def visit_NumberNode(self, node: NumberNode):
+        return node.value
+
+    def visit_StringNode(self, node: StringNode):
+        return node.value
+
+    def visit_CharNode(self, node: CharNode):
+        return node.value
+
+    def visit_BooleanNode(self, node: BooleanNode):
+        return self.eval_boolean(node.value)
+
+    def visit_CastNode(self, node: CastNode):
+        target_type = node.target_type.lower()
+
+        if node.expression in self.global_env.variables: # Check if the expression is an identifier/variable
+            value = self.global_env.variables[node.expression]
+        else:
+            value = self.visit(node.expression)
+
+        return self.cast_value(value, target_type)
+
+    def visit_IdentifierNode(self, node: IdentifierNode):
+        address = node.address
+        if address is not None and not address[0]:
+            entry = self.global_env.slots[address[1]] # Fast path for variables of the current environment.
+            if entry is not None:
+                return entry.value
+        # Prefer variables in scope, then check modules for member references.
+        try:
+            return self.global_env.lookup(node.address, node.name).value
+        except NameError:
+            # If not found in current environment, check if it's referencing a module.
+            if node.name in self.global_env.modules:
+                return self.global_env.modules[node.name]
+            raise
+
+    def visit_BinOpNode(self, node: BinOpNode):
+        left = self.visit(node.left)
+        right = self.visit(node.right)
+        # Quickened fast path: the guard fails (and the node deoptimizes) as soon as an operand has another type.
+        if type(left) is node.left_type and type(right) is node.right_type:
+            return node.quick(left, right)
+        return self.adapt_binop(node, left, right)
+
+    def adapt_binop(self, node: BinOpNode, left, right):
+        """Apply `node`'s generic operator, quickening the node once it has run QUICKEN_AFTER times generically.
+
+        The node is specialised for the operand types of that execution, if rts.SPECIALIZED_OPERATORS has
+        a form for them; otherwise it stays generic and tries again after another QUICKEN_AFTER executions.
+        """
+        operator = node.operator
+        if operator is None:
+            if node.op == "SCOPERESOP":
+                return self.scope_member(left, right)
+            operator = node.operator = binary_operator(node.op)
+        node.warmup += 1
+        if node.warmup >= QUICKEN_AFTER:
+            node.warmup = 0
+            left_type = type(left)
+            right_type = type(right)
+            quick = SPECIALIZED_OPERATORS.get((node.op, left_type, right_type))
+            if quick is not None:
+                node.quick, node.left_type, node.right_type = quick, left_type, right_type
+        return operator(left, right)
+
+    def visit_UnaryOpNode(self, node: UnaryOpNode):
+        value = self.visit(node.operand)
+        if node.op == "NOT":
+            return not value
+        else:
+            raise ValueError(f"Unknown unary operator {node.op}")
+
+    def visit_IncNode(self, node: IncNode):
+        current = self.global_env.lookup(node.address, node.identifier)
+        current.value += 1
+        return current.value
+
+    def visit_DecNode(self, node: DecNode):
+        current = self.global_env.lookup(node.address, node.identifier)
+        current.value -= 1
+        return current.value
+
+    def visit_IfBlockNode(self, node: IfBlockNode):
+        condition = self.visit(node.condition)
+        if condition:
+            return self.visit(node.true_block)
+        elif node.false_block:
+            return self.visit(node.false_block)
+        return None
+
+    def visit_SwitchCaseBlockNode(self, node: SwitchCaseBlockNode):
+        expression = self.visit(node.expression)
+        table, end = node.jump_table or switch_jump_table(node)
+        cases = node.cases
+        try:
+            index = table.get(expression)
+        except TypeError: # Unhashable values (arrays) are not equal to any literal.
+            index = None
+        if index is not None:
+            return self.visit(cases[index].body)
+        for case in cases[end:] if end else cases:
+            if expression == self.visit(case.case_value):
+                return self.visit(case.body)
+        if node.default_block:
+            # Only executes if loop terminated with no expression being equal to any case value.
+            return self.visit(node.default_block.body)
+
+    def visit_TryCatchNode(self, node: TryCatchNode):
+        try:
+            return self.visit(node.try_block)
+        except node.catch_exception as e:
+            return self.visit(node.catch_block)
+        finally:
+            if node.finally_block:
+                # A return from the try or catch block is still pending once the finally block has run.
+                returning = self.returning
+                self.returning = False
+                self.visit(node.finally_block)
+                self.returning = returning or self.returning
+
+    def visit_WhileLoopNode(self, node: WhileLoopNode):
+        while self.visit(node.condition):
+            result = self.visit(node.body)
+            if self.returning:
+                return result
+
+    def visit_ForLoopNode(self, node: ForLoopNode):
+        loop_env = Env(parent=self.global_env, size=node.frame_size)
+        loop_env.declare(node.initializer, Cell(intern_type(type(node.initializer_value).__name__), node.initializer_value), 0)
+        prev_env = self.global_env
+        self.global_env = loop_env
+        try:
+            if node.counted:
+                # The bound can't change while the loop runs, so only the loop variable is updated.
+                condition = node.condition
+                steps = counted_range(node.initializer_value, self.visit(condition.right), condition.op == "LTE")
+                counter = loop_env.slots[0]
+                body = node.body
+                for counter.value in steps:
+                    result = self.visit(body)
+                    if self.returning:
+                        return result
+                counter.value = max(steps.start, steps.stop)
                 return None
-            else:
-                raise ValueError(f"Unknown cast type: {target_type}")    
-                
-        elif isinstance(node, IdentifierNode):
-            # Prefer variables in the current environment, then check modules for member references.
-            try:
-                return self.global_env.variables[node.name]["value"]
-            except NameError:
-                # If not found in current environment, check if it's referencing a module.
-                if node.name in self.global_env.modules:
-                    return self.global_env.modules[node.name]
-                raise
-            
-        elif isinstance(node, BinOpNode):
-            left = self.visit(node.left)
-            right = self.visit(node.right)
-            return self.eval_binop(left, node.op, right)
-        
-        elif isinstance(node, UnaryOpNode):
-            value = self.visit(node.operand)
-            if node.op == "NOT":
-                return not value
-            else:
-                raise ValueError(f"Unknown unary operator {node.op}") 
-            
-        elif isinstance(node, IncNode):
-            current = self.global_env.variables[node.identifier]
-            current["value"] += 1
-            self.global_env.variables[node.identifier] = current
-            return current["value"]
-            
-        elif isinstance(node, DecNode):
-            current = self.global_env.variables[node.identifier]
-            current["value"] -= 1
-            self.global_env.variables[node.identifier] = current
-            return current["value"]
-            
-        elif isinstance(node, IfBlockNode):
-            condition = self.visit(node.condition)
-            if condition:
-                return self.visit(node.true_block)
-            elif node.false_block:
-                return self.visit(node.false_block)
-            return None
-        
-        elif isinstance(node, SwitchCaseBlockNode):
-            expression = self.visit(node.expression)
-            for case in node.cases:
-                if expression == self.visit(case.case_value):
-                    return self.visit(case.body)
-            if node.default_block:
-                # Only executes if loop terminated with no expression being equal to any case value.
-                return self.visit(node.default_block.body)
-        
-        elif isinstance(node, TryCatchNode):
-            try:
-                return self.visit(node.try_block)
-            except node.catch_exception as e:
-                return self.visit(node.catch_block)
-            finally:
-                if node.finally_block:
-                    self.visit(node.finally_block)
-        
-        elif isinstance(node, WhileLoopNode):
             while self.visit(node.condition):
-                self.visit(node.body)  # just execute the body, ignore the return
-
-        elif isinstance(node, ForLoopNode):
-            loop_env = Env(parent=self.global_env)
-            loop_env.variables[node.initializer] = {
-                "type": type(node.initializer_value).__name__,
-                "value": node.initializer_value
-            }
-            prev_env = self.global_env
-            self.global_env = loop_env
-            try:
-                while self.visit(node.condition):
-                    self.visit(node.body)
-                    self.visit(node.increment)
-            finally:
-                self.global_env = prev_env
+                result = self.visit(node.body)
+                if self.returning:
+                    return result
+                self.visit(node.increment)
+        finally:
+            self.global_env = prev_env
 
-        elif isinstance(node, ForEachLoopNode):
-            loop_env = Env(parent=self.global_env)
-            loop_env.variables[node.iterator] = {
-                "type": type(node.iterator).__name__,
-                "value": None
-            }
+    def visit_ForEachLoopNode(self, node: ForEachLoopNode):
+        loop_env = Env(parent=self.global_env, size=node.frame_size)
+        loop_env.declare(node.iterator, Cell(intern_type(type(node.iterator).__name__), None), 0)
+        prev_env = self.global_env
+        self.global_env = loop_env
+        try:
+            iterable = self.visit(node.iterable)
+            for item in iterable:
+                loop_env.variables[node.iterator].value = item
+                result = self.visit(node.body)
+                if self.returning:
+                    return result
+        except Exception as e:
+            raise RuntimeError(f"Error during foreach loop: {e}\n{node.iterable}")
+        finally:
+            self.global_env = prev_env
+
+    def visit_OutputNode(self, node: OutputNode):
+        value = self.visit(node.expression)
+        print(value)
+        return value  # or None
+
+    def visit_DefineNode(self, node: DefineNode):
+        value = self.visit(node.value)
+
+        if isinstance(value, ARRAY_TYPES):
+            declared_type = node.type_
+            if not node.type_checked:
+                value = self.define_array(value, declared_type)
+
+            self.global_env.declare(node.name, Cell(intern_type(f"{declared_type}[]"), value), node.slot)
+
+            return value
+
+        if node.type_checked or self.check_type(value, node.type_):
+            self.global_env.declare(node.name, Cell(intern_type(node.type_), value), node.slot)
+        else:
+            raise TypeError(f"Type mismatch: Expected {node.type_}, got {type(value).__name__}")
+
+        return value
+
+    def visit_AssignNode(self, node: AssignNode):
+        value = self.visit(node.value)
+        self.global_env.lookup(node.address, node.name).value = value
+        return value
+
+    def visit_BlockNode(self, node: BlockNode):
+        last_result = None
+        for stmt in node.statements:
+            last_result = self.visit(stmt)  # OutputNode prints internally
+            if self.returning:
+                break
+        return last_result
+
+    def visit_NamespaceDefinitionNode(self, node: NamespaceDefinitionNode):
+        namespace_env = Env(parent=self.global_env)
+        for stmt in node.body.statements:
+            self.visit(stmt)
+            if self.returning:
+                break
+        self.global_env.variables[node.name] = Cell(intern_type("namespace"), namespace_env)
+        return None
+
+    def visit_FunctionDefinitionNode(self, node: FunctionDefinitionNode):
+        # Store the function definition in the global environment
+        self.global_env.define_function(node.name, node)
+        node.global_environment = self.global_env
+        if node.call_plan is None:
+            node.call_plan = CallPlan(node)
+        node.memo = MemoCache(node.name) if node.pure else None
+        return None
+
+    def visit_FunctionCallNode(self, node: FunctionCallNode):
+        # Resolve the function object from the global environment or module scope, reusing the
+        # call site's cached lookup while its environment's version says it is still valid.
+        cache = node.call_cache
+        if node.module_name:
+            if cache is None or cache[1] is not self.global_env.modules or cache[2].version != cache[3]:
+                cache = node.call_cache = self.global_env.module_function_cache(node.module_name, node.name)
+            function_obj = cache[0]
+            parent_env = cache[2]
+        else:
+            function_obj = None if cache is None else self.global_env.cached_function(cache)
+            if function_obj is None:
+                cache = node.call_cache = self.global_env.function_cache(node.name)
+                function_obj = cache[0]
+            parent_env = self.global_env
+
+        # Native functions
+        if isinstance(function_obj, NativeFunction):
+            arg_values = [self.visit(arg) for arg in node.arguments]
+            memo = function_obj.memo
+            if memo is None:
+                return function_obj.py_impl(*arg_values)
+            key = memo.key(arg_values)
+            result = memo.lookup(key)
+            if result is MemoCache.MISSING:
+                result = function_obj.py_impl(*arg_values)
+                memo.store(key, result)
+            return result
+
+        # User defined functions
+        if isinstance(function_obj, FunctionDefinitionNode):
+            plan = function_obj.call_plan
+            # Arguments and the defaults of parameters left out are evaluated in the caller's environment.
+            values = [self.visit(arg) for arg in node.arguments]
+            if len(values) != plan.max_args:
+                values.extend([self.visit(default) for default in plan.missing_defaults(len(values))])
+            memo = function_obj.memo
+            if memo is not None:
+                key = memo.key(values)
+                result = memo.lookup(key)
+                if result is not MemoCache.MISSING:
+                    return result
+            # Functions see the variables of the environment they were defined in (lexical scoping).
+            call_env = plan.bind(function_obj.global_environment or parent_env, values)
+            # A pure function stores its result when the call returns, so it does not run as a tail call.
+            if node.tail_call and memo is None:
+                # `return exec f(...)`: the function we are in returns f's value, so f runs in the loop of
+                # the call that is returning instead of nesting another Python frame inside it.
+                self.pending_call = (function_obj, call_env)
+                return None
+            # Same as call_function, written out because it runs on every call.
             prev_env = self.global_env
-            self.global_env = loop_env
+            self.global_env = call_env
             try:
-                iterable = self.visit(node.iterable)
-                for item in iterable:
-                    loop_env.variables[node.iterator]["value"] = item
-                    self.visit(node.body)
-            except Exception as e:
-                raise RuntimeError(f"Error during foreach loop: {e}\n{node.iterable}")
+                result = self.visit(function_obj.body)
+                while self.pending_call is not None:
+                    function_obj, self.global_env = self.pending_call
+                    self.pending_call = None
+                    self.returning = False
+                    result = self.visit(function_obj.body)
             finally:
                 self.global_env = prev_env
+            self.returning = False
+            if memo is not None:
+                memo.store(key, result)
+            return result
+        raise TypeError(f"Object '{node.name}' is not callable.")
 
-        elif isinstance(node, OutputNode):
-            value = self.visit(node.expression)
-            print(value)
-            return value  # or None
-        
-        elif isinstance(node, DefineNode):
-            value = self.visit(node.value)
+    def call_function(self, function_def: FunctionDefinitionNode, call_env: Env):
+        """Run `function_def` in `call_env`, followed by the tail calls it makes, and return its value."""
+        prev_env = self.global_env
+        self.global_env = call_env
+        try:
+            result = self.visit(function_def.body)
+            while self.pending_call is not None:
+                function_def, self.global_env = self.pending_call
+                self.pending_call = None
+                self.returning = False
+                result = self.visit(function_def.body)
+        finally:
+            self.global_env = prev_env
+        self.returning = False
+        return result
 
-            if isinstance(value, list):
-                declared_type = node.type_
-                for i, element in enumerate(value):
-                    if not self.check_type(element, declared_type):
-                        raise TypeError(f"Type mismatch in array at index {i}: Expected {declared_type}, got {type(element).__name__}")
-                    
-                self.global_env.variables[node.name] = {"type": f"{declared_type}[]", "value": value}
+    def visit_ReturnNode(self, node: ReturnNode):
+        value = self.visit(node.expression)
+        self.returning = True
+        return value
 
-                return value
+    def visit_ArrayNode(self, node: ArrayNode):
+        elements = [self.visit(elem) for elem in node.elements]
+        if len(elements) != node.size: # This should not execute... as this error is caught during parsing.
+            raise ValueError(f"Array size mismatch: expected {node.size}, got {len(elements)}")
+        if node.element_type in ARRAY_TYPECODES:
+            typed = typed_array(elements, node.element_type)
+            if typed is not None:
+                return typed
+        return elements
 
-            if self.check_type(value, node.type_):
-                self.global_env.variables[node.name] = {"type": node.type_, "value": value}
-            else:
-                raise TypeError(f"Type mismatch: Expected {node.type_}, got {type(value).__name__}")
-            
-            return value
-        
-        elif isinstance(node, AssignNode):
-            value = self.visit(node.value)
-            current = self.global_env.get(node.name)
-            current["value"] = value
-            self.global_env.set(node.name, current)
-            return value
-                        
-        elif isinstance(node, BlockNode):
-            last_result = None
-            for stmt in node.statements:
-                last_result = self.visit(stmt)  # OutputNode prints internally
-            return last_result 
-        
-        elif isinstance(node, NamespaceDefinitionNode):
-            namespace_env = Env(parent=self.global_env)
-            for stmt in node.body.statements:
-                self.visit(stmt)
-            self.global_env.variables[node.name] = {"type": "namespace", "value": namespace_env}
-            return None
-            
-        elif isinstance(node, FunctionDefinitionNode):
-            # Store the function definition in the global environment
-            self.global_env.functions[node.name] = node
-            node.global_environment = self.global_env
-            return None
-        
-        elif isinstance(node, FunctionCallNode):
-            # Resolve fumction object from global environment or module scope.
-            if node.module_name:
-                if node.module_name not in self.global_env.modules:
-                    raise NameError(f"Module '{node.module_name}' not found.")
-                module_env = self.global_env.modules[node.module_name]
-                if node.name not in module_env.functions:
-                    raise NameError(f"Function '{node.name}' not found in module '{node.module_name}'.")
-                function_obj = module_env.functions[node.name]
-                parent_env = module_env
+    def visit_ArrayAccessNode(self, node: ArrayAccessNode):
+        array_name = self.global_env.lookup(node.address, node.array_name)
+        index = self.visit(node.index)
+        if not isinstance(array_name.value, ARRAY_TYPES):
+            raise TypeError(f"Variable '{node.array_name}' is not an array.")
+        elif not isinstance(index, int):
+            raise TypeError(f"Array index must be an integer, got {type(index).__name__}.")
+        elif index < 0 or index >= len(array_name.value):
+            raise IndexError(f"Array index {index} out of bounds for array '{node.array_name}' of size {len(array_name.value)}.")
+        return array_name.value[index]
+
+    ###
+    ### # Import and module handling
+    ###
+
+    def visit_ImportNode(self, node: ImportNode):
+        module_name = node.module_name
+        module_env: ModuleEnv = self.load_python_module_env(module_name)
+        self.global_env.import_module(module_name, module_env)
+        self.global_env.variables[module_name] = Cell(intern_type("module"), module_env)
+        return None
+
+    def eval_binop(self, left, op, right):
+        if op == "SCOPERESOP":
+            return self.scope_member(left, right)
+        return binary_operator(op)(left, right)
+
+    def scope_member(self, module, name):
+        """Evaluate `module::name` to a MemberRef."""
+        if isinstance(module, ModuleEnv):
+            # A member is a function if the module defines one by that name, which can only change
+            # when the module's version does.
+            cached = module.members.get(name)
+            if cached is not None and cached[0] == module.version:
+                return cached[1]
+            if name in module.functions:
+                member = MemberRef(kind="function", env=module, name=name)
+            elif name in module.variables:
+                member = MemberRef(kind="variable", env=module, name=name)
             else:
-                if node.name not in self.global_env.functions:
-                    raise NameError(f"Function '{node.name}' not found.")
-                function_obj = self.global_env.functions[node.name]
-                parent_env = self.global_env
-            
-            # Native functions
-            if isinstance(function_obj, NativeFunction):
-                arg_values = [self.visit(arg) for arg in node.arguments]
-                return function_obj.py_impl(*arg_values)
-            
-            # User defined functions
-            if isinstance(function_obj, FunctionDefinitionNode):
-                function_def = function_obj
-                call_env = Env(parent=parent_env)
-                if len(node.arguments) != len(function_def.parameters):
-                    raise TypeError(f"Argument count mismatch in call to '{function_def.name}': expected {len(function_def.parameters)}, got {len(node.arguments)}")
-                for param in function_def.parameters:
-                    call_env.variables[param.name] = {"type": param.type_, "value": self.visit(param.default_value) if param.has_default else None}
-                for i, arg_node in enumerate(node.arguments):
-                    call_env.variables[function_def.parameters[i].name]["value"] = self.visit(arg_node)
-                prev_env = self.global_env
-                self.global_env = call_env
-                try:
-                    return self.visit(function_def.body)
-                except ReturnException as e:
-                    return e.value
-                finally:
-                    self.global_env = prev_env
-            raise TypeError(f"Object '{node.name}' is not callable.")
-        
-        elif isinstance(node, ReturnNode):
-            value = self.visit(node.expression)
-            raise ReturnException(value)
-        
-        elif isinstance(node, ArrayNode):
-            elements = [self.visit(elem) for elem in node.elements]
-            if len(elements) != node.size: # This should not execute... as this error is caught during parsing.
-                raise ValueError(f"Array size mismatch: expected {node.size}, got {len(elements)}")
-            return elements
-        
-        elif isinstance(node, ArrayAccessNode):
-            array_name = self.global_env.get(node.array_name)
-            index = self.visit(node.index)
-            if not isinstance(array_name["value"], list):
-                raise TypeError(f"Variable '{node.array_name}' is not an array.")
-            elif not isinstance(index, int):
-                raise TypeError(f"Array index must be an integer, got {type(index).__name__}.")
-            elif index < 0 or index >= len(array_name["value"]):
-                raise IndexError(f"Array index {index} out of bounds for array '{node.array_name}' of size {len(array_name['value'])}.")
-            return array_name["value"][index]
-        
-        ###
-        ### # Import and module handling
-        ###
-
-        elif isinstance(node, ImportNode):
-            module_name = node.module_name
-            module_env: ModuleEnv = self.load_python_module_env(module_name)
-            self.global_env.modules[module_name] = module_env
-            self.global_env.variables[module_name] = {"type": "module", "value": module_env}
+                raise NameError(f"'{name}' not found in scope.")
+            module.members[name] = (module.version, member)
+            return member
+        raise TypeError(f"Left operand of scope resolution operator must be a module, got {type(module).__name__}.")
+
+    def cast_value(self, value, target_type):
+        if target_type == "int":
+            return int(value)
+        elif target_type == "float":
+            return float(value)
+        elif target_type == "string":
+            return str(value)
+        elif target_type == "char":
+            return str(value)[0]  # take first character
+        elif target_type == "bool":
+            return bool(value)
+        elif target_type == "void":
             return None
-    
-    def eval_binop(self, left, op, right):
-        if op == "ADD":
-            if isinstance(left, str) or isinstance(right, str):
-                return str(left) + str(right)
-            return left + right
-        elif op == "SUB":
-            return left - right
-        elif op == "MUL":
-            return left * right
-        elif op == "DIV":
-            return left / right
-        elif op == "FDIV":
-            return left // right
-        elif op == "MOD":
-            return left % right
-        elif op == "EQ":
-            return left == right
-        elif op == "NEQ":
-            return left != right
-        elif op == "LT":
-            return left < right
-        elif op == "LTE":
-            return left <= right
-        elif op == "GT":
-            return left > right
-        elif op == "GTE":
-            return left >= right
-        elif op == "AND":
-            return bool(left) and bool(right)
-        elif op == "OR":
-            return bool(left) or bool(right)
-        elif op == "NOT":
-            return not left
-        elif op == "SCOPERESOP":
-            if isinstance(left, ModuleEnv):
-                if right in left.functions:
-                    return MemberRef(kind="function", env=left, name=right)
-                if right in left.variables:
-                    return MemberRef(kind="variable", env=left, name=right)
-                raise NameError(f"'{right}' not found in scope.")
-            raise TypeError(f"Left operand of scope resolution operator must be a module, got {type(left).__name__}.")
         else:
-            raise ValueError(f"Unknown operator {op}")
-       
+            raise ValueError(f"Unknown cast type: {target_type}")
+
     def eval_boolean(self, value):
         if value == "true":
             return True
@@ -324,26 +493,46 @@ class Interpreter:
         else:
             raise ValueError(f"Invalid boolean value: {value}")
         
+    def define_array(self, value, declared_type: str):
+        """Check that every element of the array `value` has `declared_type`, and return it as the array
+        a define of that type stores: a TypedArray for int, float, bool and char arrays where possible.
+
+        A TypedArray of the declared type needs no check, since its buffer only holds values of that type.
+        """
+        typecode = ARRAY_TYPECODES.get(declared_type)
+        if isinstance(value, TypedArray) and value.typecode == typecode:
+            return value
+        for i, element in enumerate(value):
+            if not self.check_type(element, declared_type):
+                raise TypeError(f"Type mismatch in array at index {i}: Expected {declared_type}, got {type(element).__name__}")
+        if typecode is not None:
+            typed = typed_array(value if isinstance(value, list) else value.tolist(), declared_type)
+            if typed is not None:
+                return typed
+        return value
+
     def check_type(self, value, expected_type):
-        type_map = {
-            "int": int,
-            "float": float,
-            "string": str,
-            "char": str,
-            "bool": bool,
-            "void": type(None)
-        }
-        if expected_type not in type_map:
+        expected_class = TYPE_CLASSES.get(expected_type)
+        if expected_class is None:
             raise ValueError(f"Unknown type: {expected_type}")
         if isinstance(value, str) and expected_type == "char":
             return len(value) == 1
-        return isinstance(value, type_map[expected_type])
+        return isinstance(value, expected_class)
     
     def load_python_module_env(self, module_name: str) -> ModuleEnv:
         # Check cache.
         if module_name in self.global_env.variables:
-            return self.global_env.variables[module_name]
-        
+            return self.global_env.variables[module_name].value
+
+        module_env = self.read_python_module_env(module_name)
+
+        # Cache in global environment.
+        self.global_env.import_module(module_name, module_env)
+
+        return module_env
+
+    def read_python_module_env(self, module_name: str) -> ModuleEnv:
+        """Load the native Python module `module_name` and return its ModuleEnv, without importing it into the program."""
         # Find file if cache returns nothing.
         if module_name not in self.module_paths:
             if f"{module_name}.py" in os.listdir("./proto/src/packages/"):
@@ -378,7 +567,4 @@ class Interpreter:
         if not isinstance(module_env, ModuleEnv):
             raise ImportError(f"'module_env' in '{module_name}' is not a ModuleEnv instance")        
 
-        # Cache in global environment.
-        self.global_env.modules[module_name] = module_env
-
         return module_env
\ No newline at end of file
@@ -1,109 +1,205 @@
+import codecs
 import re
-from tokenclass import Token
+from itertools import starmap
+from tokenclass import Token, TokenStream
+
+# Words that IDENTIFIER matches but that lex as another kind.
+KEYWORDS = {
+    "out": "OUTPUT",
+    "if": "IF",
+    "else": "ELSE",
+    "switch": "SWITCH",
+    "case": "CASE",
+    "try": "TRY",
+    "catch": "CATCH",
+    "finally": "FINALLY",
+    "while": "WHILE",
+    "foreach": "FOREACH",
+    "for": "FOR",
+    "define": "DEFINE",
+    "assign": "ASSIGN",
+    "namespace": "NAMESPACE",
+    "import": "IMPORT",
+    "function": "FUNCTION",
+    "pure": "PURE",
+    "default": "DEFAULT",
+    "return": "RETURN",
+    "exec": "EXECUTE",
+    "int": "TYPE",
+    "float": "TYPE",
+    "string": "TYPE",
+    "char": "TYPE",
+    "bool": "TYPE",
+    "void": "TYPE",
+    "true": "BOOLEAN",
+    "false": "BOOLEAN",
+}
+
+# Alternatives are tried in order, so longer operators come before their prefixes.
+TOKEN_SPECS = [
+    ("WHITESPACE", r"\s+"),
+    ("IDENTIFIER", r"[A-Za-z_][A-Za-z0-9_]*"),
+    ("NUMBER", r"\d+(?:\.\d*)?"),
+    ("STRING", r'"[^"]*"'),
+    ("CHAR", r"'.'"),
+    ("CAST", r"\((?:int|float|string|char|bool|void)\)"),
+    ("COMMENT", r"//[^\n]*"),
+    ("BLOCKCOMMENT", r"/\*(?:.|\n)*?(?:\*/|\Z)"), # An unterminated block comment runs to the end of the source.
+    ("INC", r"\+\+"),
+    ("DEC", r"--"),
+    ("SCOPERESOP", r"::"),
+    ("EQ", r"=="),
+    ("NEQ", r"!="),
+    ("LTE", r"<="),
+    ("GTE", r">="),
+    ("AND", r"&&"),
+    ("OR", r"\|\|"),
+    ("FDIV", r"\\\\"),
+    ("COMMA", r","),
+    ("LPAREN", r"\("),
+    ("RPAREN", r"\)"),
+    ("LCBRACE", r"\{"),
+    ("RCBRACE", r"\}"),
+    ("LBRACKET", r"\["),
+    ("RBRACKET", r"\]"),
+    ("DOT", r"\."),
+    ("COLON", r":"),
+    ("SEMICOLON", r";"),
+    ("ADD", r"\+"),
+    ("SUB", r"-"),
+    ("MUL", r"\*"),
+    ("DIV", r"/"),
+    ("MOD", r"%"),
+    ("LT", r"<"),
+    ("GT", r">"),
+    ("NOT", r"!"),
+]
+
+TOKEN_REGEX = re.compile("|".join(f"(?P<{name}>{pattern})" for name, pattern in TOKEN_SPECS))
+
+# Lexer.lex also matches a string whose closing quote hasn't been read yet, so it can wait for the
+# next chunk instead of skipping the quote.
+STREAM_REGEX = re.compile(TOKEN_REGEX.pattern + r'|(?P<PARTIAL>"[^"]*\Z)')
+
+# Characters (or bytes, for binary sources) read per chunk by Lexer.stream.
+CHUNK_SIZE = 1 << 20
+
+# Lexer.lex keeps the tokens that end this close to the end of a chunk for the next one: the longest
+# token that can be cut short while still matching another kind (`(string)`) is shorter.
+STREAM_MARGIN = 16
+
+# Matches that produce no token (semicolons are optional in GILL). They are the only matches, along
+# with strings, that can span lines.
+SKIPPED = frozenset(("WHITESPACE", "COMMENT", "BLOCKCOMMENT", "SEMICOLON"))
 
 class Lexer:
+    """Splits GILL source into Tokens in a single regex pass.
+
+    Identifiers are matched generically and then looked up in KEYWORDS, so `outer` is one
+    IDENTIFIER rather than OUTPUT followed by `er`. Characters no pattern matches are skipped.
+
+    tokenize() lexes a string into a TokenStream; stream() yields the same tokens as Token objects,
+    lazily, from a file object or mmap read chunk by chunk.
+    """
+
     def __init__(self):
-        self.position = 0
-        self.current_char = None
         self.text = ""
-        self.tokens = []
-        self.token_specs = [
-            ("OUTPUT", r"out"),
-            ("IF", r"if"),
-            ("ELSE", r"else"),
-            ("SWITCH", r"switch"),
-            ("CASE", r"case"),
-            ("TRY", r"try"),
-            ("CATCH", r"catch"),
-            ("FINALLY", r"finally"),
-            ("WHILE", r"while"),
-            ("FOREACH", r"foreach"),
-            ("FOR", r"for"),
-            ("DEFINE", r"define"),
-            ("ASSIGN", r"assign"),
-            ("NAMESPACE", r"namespace"),
-            ("IMPORT", r"import"),
-            ("FUNCTION", r"function"),
-            ("DEFAULT", r"default"),
-            ("RETURN", r"return"),
-            ("TYPE", r"int|float|string|char|bool|void"),
-            ("CAST", r"\((int|float|string|char|bool|void)\)"),
-            ("NUMBER", r"\d+(\.\d*)?"),
-            ("STRING", r'"[^"]*"'),
-            ("CHAR", r"'.'"),
-            # ("NULLABLEID", r"\??[A-Za-z_][A-Za-z0-9_]*"),
-            ("INC", r"\+\+"),
-            ("DEC", r"--"),  
-            ("EXECUTE", r"exec"),         
-            ("IDENTIFIER", r"[A-Za-z_][A-Za-z0-9_]*"),
-            ("COMMENT", r"//"),
-            ("CMTBLOCKSTART", r"/\*"),
-            ("CMTBLOCKEND", r"\*/"),
-            ("COMMA", r","),
-            ("LPAREN", r"\("),
-            ("RPAREN", r"\)"),
-            ("LCBRACE", r"\{"),
-            ("RCBRACE", r"\}"),
-            ("LBRACKET", r"\["),
-            ("RBRACKET", r"\]"),
-            ("SCOPERESOP", r"::"),
-            ("DOT", r"\."),
-            ("COLON", r":"),
-            ("SEMICOLON", r";"),
-            ("ADD", r"\+"),
-            ("SUB", r"-"),
-            ("MUL", r"\*"),
-            ("DIV", r"/"),
-            ("FDIV", r"\\\\"),
-            ("MOD", r"%"),
-            ("EQ", r"=="),
-            ("NEQ", r"!="),
-            ("LT", r"<"),
-            ("LTE", r"<="),
-            ("GT", r">"),
-            ("GTE", r">="),
-            ("AND", r"&&"),
-            ("OR", r"\|\|"),
-            ("NOT", r"!"),
-            ("WHITESPACE", r"\s+"),
-            ("NEWLINE", r"\n")
-        ]
-
-        self.token_regex = "|".join(f"(?P<{name}>{pattern})" for name, pattern in self.token_specs)
-
-    def tokenize(self, text):
-        # Remove double slash comments
-        text = re.sub(r"//[^\n]*", "", text)
+        self.tokens = TokenStream()
+
+    def tokenize(self, text) -> TokenStream:
         self.text = text
-        self.position = 0
-        self.tokens = []
-        line_num = 1
-        line_start = 0
-
-        for match in re.finditer(self.token_regex, text):
-            kind = match.lastgroup
-            value = match.group()
-            column = match.start() - line_start + 1
-            if kind in ("WHITESPACE", "NEWLINE", "SEMICOLON"): # Ignore whitespace, newlines, and semicolons (semicolons are optional in GILL)
-                line_num += 1
-                line_start = match.end()
-                continue
-            elif kind == "NUMBER":
-                value = float(value) if '.' in value else int(value)
-            elif kind == "STRING":
-                value = value[1:-1]  # Remove quotes
-            elif kind == "CHAR":
-                value = value[1]  # Remove quotes
-            elif kind == "CAST":
-                value = value[1:-1].lower()  # turn "(string)" into "string", "(int)" into "int", etc.
-            elif kind == "IDENTIFIER":
-                if value == "true":
-                    kind = "BOOLEAN"
-                    value = "true"
-                elif value == "false":
-                    kind = "BOOLEAN"
-                    value = "false"
-
-            self.tokens.append(Token(kind, value, line_num, column))
-
-        return self.tokens
\ No newline at end of file
+        self.tokens = TokenStream()
+        self.tokens.extend(self.lex((text,)))
+        return self.tokens
+
+    def stream(self, source, chunk_size=CHUNK_SIZE):
+        """Yield the Tokens of `source`, a file object or mmap, reading it `chunk_size` at a time.
+
+        Binary sources (files opened with "rb", mmaps) are decoded as UTF-8. Only the current chunk
+        and the unfinished token at its end are held in memory.
+        """
+        return starmap(Token, self.lex(read_chunks(source, chunk_size)))
+
+    def lex(self, chunks, position=0, line=1, column=1):
+        """Yield (kind, value, line, column, offset) for each token of the text split into `chunks`, an iterable of strings.
+
+        Lexing starts at `position` in the first chunk, which is at `line` and `column` of the text.
+        """
+        keywords = KEYWORDS
+        finditer = STREAM_REGEX.finditer
+        buffer = ""
+        base = 0 # Offset of buffer[0] in the text.
+        line_num = line
+        newline = position - column # Position in buffer of the last newline, for columns.
+        chunks = iter(chunks)
+        chunk = next(chunks, None)
+        pos = position
+
+        while chunk is not None:
+            buffer += chunk
+            chunk = next(chunks, None)
+            # Unless this was the last chunk, tokens ending past `limit` may continue in the next one.
+            limit = len(buffer) if chunk is None else len(buffer) - STREAM_MARGIN
+            scanning = True
+            while scanning:
+                scanning = False
+                for match in finditer(buffer, pos):
+                    end = match.end()
+                    if end > limit:
+                        # Rescan from the end of the last token, as the characters no token matched
+                        # before this one may start one once more input is read (the quote of 'c').
+                        break
+                    pos = end
+                    kind = match.lastgroup
+                    value = match.group()
+                    if kind in SKIPPED:
+                        if "\n" in value:
+                            line_num += value.count("\n")
+                            newline = pos - len(value) + value.rindex("\n")
+                        continue
+                    start = match.start()
+                    column = start - newline
+                    if kind == "IDENTIFIER":
+                        kind = keywords.get(value, "IDENTIFIER")
+                    elif kind == "NUMBER":
+                        value = float(value) if '.' in value else int(value)
+                    elif kind == "STRING":
+                        newlines = value.count("\n")
+                        if newlines:
+                            line_num += newlines
+                            newline = start + value.rindex("\n")
+                        yield kind, value[1:-1], line_num - newlines, column, base + start
+                        continue
+                    elif kind == "CHAR":
+                        value = value[1]  # Remove quotes
+                    elif kind == "CAST":
+                        value = value[1:-1]  # turn "(string)" into "string", "(int)" into "int", etc.
+                    elif kind == "PARTIAL":
+                        # A string that is never closed: skip its opening quote and rescan after it.
+                        pos = start + 1
+                        scanning = True
+                        break
+                    yield kind, value, line_num, column, base + start
+                else:
+                    # Nothing left but characters no token matches (or could match with more input).
+                    pos = max(pos, limit)
+            newline -= pos
+            base += pos
+            buffer = buffer[pos:]
+            pos = 0
+
+def read_chunks(source, chunk_size):
+    """Yield the text of a file object or mmap in chunks of about `chunk_size` characters."""
+    decoder = None
+    while True:
+        data = source.read(chunk_size)
+        if isinstance(data, bytes):
+            if decoder is None:
+                decoder = codecs.getincrementaldecoder("utf-8")()
+            text = decoder.decode(data, final=not data)
+        else:
+            text = data
+        if text:
+            yield text
+        if not data:
+            return
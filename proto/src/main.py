@@ -1,26 +1,108 @@
+import argparse
 from parser import Parser
 from lexer import Lexer
-from interpreter import Interpreter
+from engines import ENGINES, DEFAULT_ENGINE, create_engine
 from environment import Env
+from optimizer import Optimizer
+from ast_cache import ASTCache
+from nodes import BlockNode, FunctionDefinitionNode, iter_child_nodes
+from rts import GILL_VERSION, MemoCache
+import sys
+
+arg_parser = argparse.ArgumentParser(description="Run a GILL program.")
+arg_parser.add_argument("file", nargs="?", default="./proto/src/example.gill", help="Path to the .gill file to run.")
+arg_parser.add_argument("--engine", choices=ENGINES, default=DEFAULT_ENGINE, help="Execution engine to run the program with.")
+arg_parser.add_argument("--dump-python", action="store_true", help="Print the Python source generated by the python engine to stderr.")
+arg_parser.add_argument("--no-cache", action="store_true", help="Always lex and parse the file instead of using its .gillc cache.")
+arg_parser.add_argument("--stream", action="store_true", help="Lex and parse the file while reading it instead of loading it whole (skips the .gillc cache).")
+arg_parser.add_argument("--pipeline", action="store_true", help="Run each top-level statement as soon as it is parsed, lexing the file while reading it (skips the .gillc cache).")
+arg_parser.add_argument("--no-optimize", action="store_true", help="Skip constant folding and dead branch elimination.")
+arg_parser.add_argument("--optimizer-stats", action="store_true", help="Print how many nodes the optimizer removed to stderr.")
+arg_parser.add_argument("--memo-size", type=int, default=MemoCache.default_size, help="Number of results cached per pure function (0 disables memoization).")
+arg_parser.add_argument("--memo-stats", action="store_true", help="Print the cache hits and misses of pure functions to stderr.")
+args = arg_parser.parse_args()
+MemoCache.default_size = args.memo_size
+if args.dump_python and args.engine != "python":
+    arg_parser.error("--dump-python requires --engine python")
 
 lexer = Lexer()
+optimizer = None if args.no_optimize else Optimizer()
 global_env = Env()
-interpreter = Interpreter(global_env)
+interpreter = create_engine(args.engine, global_env, **({"dump_source": True} if args.dump_python else {}))
 
 def format_value(value):
     if isinstance(value, bool):
         return "true" if value else "false"
     return str(value)
 
-with open("./proto/src/example.gill", "r") as file:
-    code = file.read()  # read the whole file as one string
-
-try:
+def parse(code):
     tokens = lexer.tokenize(code)
     parser = Parser(tokens)
     # parser.debug = True  # Enable debug mode
-    ast = parser.parse() # parse the entire program
-    result = format_value(interpreter.visit(ast))
+    return parser.parse() # parse the entire program
+
+def parse_file(path):
+    if args.stream:
+        # Tokens are lexed from the open file as the parser asks for them.
+        with open(path, "r") as file:
+            return Parser(lexer.stream(file)).parse()
+    with open(path, "r") as file:
+        code = file.read()  # read the whole file as one string
+    if args.no_cache:
+        return parse(code)
+    return ASTCache(GILL_VERSION).parse(path, code, parse)
+
+# Pure functions defined by the program, whose caches --memo-stats reports.
+pure_functions = []
+
+def collect_pure_functions(node):
+    stack = [node]
+    while stack:
+        node = stack.pop()
+        if isinstance(node, FunctionDefinitionNode) and node.pure:
+            pure_functions.append(node)
+        stack.extend(iter_child_nodes(node))
+
+def print_memo_stats():
+    caches = [function_def.memo for function_def in pure_functions if function_def.memo is not None]
+    for module_env in global_env.modules.values():
+        caches.extend(function_obj.memo for function_obj in module_env.functions.values() if getattr(function_obj, "memo", None) is not None)
+    for memo in caches:
+        if memo.hits or memo.misses:
+            print(f"{memo.name}: {memo.hits} hits, {memo.misses} misses, {len(memo.entries)}/{memo.max_size} entries", file=sys.stderr)
+
+def run_pipelined(path):
+    # Each statement runs as its own program in the same engine, like a line typed into repl.py, so
+    # the statement and its tokens can be freed before the next one is parsed.
+    result = None
+    removed = 0
+    with open(path, "r") as file:
+        for statement in Parser(lexer.stream(file)).statements():
+            program = BlockNode([statement])
+            if args.memo_stats:
+                collect_pure_functions(program)
+            if optimizer:
+                program = optimizer.optimize(program)
+                removed += optimizer.removed
+            result = interpreter.run(program)
+    if optimizer and args.optimizer_stats:
+        print(f"Optimizer removed {removed} nodes.", file=sys.stderr)
+    return result
+
+try:
+    if args.pipeline:
+        result = format_value(run_pipelined(args.file))
+    else:
+        ast = parse_file(args.file)
+        if args.memo_stats:
+            collect_pure_functions(ast)
+        if optimizer:
+            ast = optimizer.optimize(ast)
+            if args.optimizer_stats:
+                print(f"Optimizer removed {optimizer.removed} nodes.", file=sys.stderr)
+        result = format_value(interpreter.run(ast))
+    if args.memo_stats:
+        print_memo_stats()
 except Exception as e:
     print("An error occurred during execution:")
     print(e)
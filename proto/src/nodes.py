@@ -1,9 +1,45 @@
 from environment import Env
+from rts import intern_type
 
 class ASTNode:
-    pass
+    # Nodes declare their attributes in __slots__ so large programs don't pay for a __dict__ per node.
+    # _fields lists every slot along the MRO, in declaration order, for passes that walk any node.
+    # _state maps the fields that hold analysis results or execution state rather than parsed syntax
+    # to their initial value, and _syntax lists the other fields; only those are cached (see flat_ast).
+    __slots__ = ()
+    _fields: tuple = ()
+    _state: dict = {}
+    _syntax: tuple = ()
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        fields = []
+        for klass in reversed(cls.__mro__):
+            for field in klass.__dict__.get("__slots__", ()):
+                if field not in fields:
+                    fields.append(field)
+        cls._fields = tuple(fields)
+        cls._syntax = tuple(field for field in fields if field not in cls._state)
+
+    def init_state(self):
+        """Give the fields in _state their initial value, for a node rebuilt from its syntax fields without its constructor."""
+        for field, value in self._state.items():
+            setattr(self, field, value)
+
+def iter_child_nodes(node):
+    """Yield the direct child nodes of `node`, flattening lists of nodes."""
+    for field in node._fields:
+        value = getattr(node, field, None)
+        if isinstance(value, ASTNode):
+            yield value
+        elif isinstance(value, list):
+            for item in value:
+                if isinstance(item, ASTNode):
+                    yield item
 
 class CastNode(ASTNode):
+    __slots__ = ("target_type", "expression")
+
     def __init__(self, target_type: str, expression):
         self.target_type = target_type
         self.expression = expression
@@ -12,6 +48,8 @@ class CastNode(ASTNode):
         return f"CastNode(to={self.target_type}, expr={self.expression})"
 
 class NumberNode(ASTNode):
+    __slots__ = ("value", "type_")
+
     def __init__(self, value):
         self.value = value
         self.type_ = "INT" if isinstance(value, int) else "FLOAT"
@@ -20,14 +58,20 @@ class NumberNode(ASTNode):
         return f"NumberNode({self.type_}:{self.value})"
 
 class IdentifierNode(ASTNode):
+    __slots__ = ("name", "declared_type", "address")
+    _state = {"address": None}
+
     def __init__(self, name, declared_type=None):
         self.name = name
         self.declared_type = declared_type
+        self.address = None # (depth, slot) of the variable, assigned by resolver.Resolver.
 
     def __repr__(self):
         return f"IdentifierNode({self.name})"
     
 class NullableIdentifierNode(ASTNode):
+    __slots__ = ("name",)
+
     def __init__(self, name):
         self.name = name
 
@@ -35,6 +79,8 @@ class NullableIdentifierNode(ASTNode):
         return f"NullableIdentifierNode({self.name})"
 
 class StringNode(ASTNode):
+    __slots__ = ("value",)
+
     def __init__(self, value):
         self.value = value
 
@@ -42,6 +88,8 @@ class StringNode(ASTNode):
         return f"StringNode({self.value})"
     
 class BooleanNode(ASTNode):
+    __slots__ = ("value",)
+
     def __init__(self, value):
         self.value = value
 
@@ -49,50 +97,91 @@ class BooleanNode(ASTNode):
         return f"BooleanNode({self.value})"
 
 class CharNode(ASTNode):
+    __slots__ = ("value",)
+
     def __init__(self, value):
         self.value = value
 
     def __repr__(self):
         return f"CharNode({self.value})"
+
+# Nodes whose value is known without running the program.
+LITERAL_NODES = (NumberNode, StringNode, CharNode, BooleanNode)
+
+def literal_value(node):
+    """Return the value of a node in LITERAL_NODES."""
+    if isinstance(node, BooleanNode):
+        return node.value == "true"
+    return node.value
     
 class DefineNode(ASTNode):
+    __slots__ = ("name", "type_", "value", "slot", "type_checked")
+    _state = {"slot": None, "type_checked": False}
+
     def __init__(self, name, type_, value):
         self.name = name
         self.type_ = type_
         self.value = value
+        self.slot = None # Slot of the variable in the current environment, assigned by resolver.Resolver.
+        self.type_checked = False # True if typechecker.TypeChecker proved the value has the declared type, so it is not checked at runtime.
 
 class AssignNode(ASTNode):
+    __slots__ = ("name", "value", "address")
+    _state = {"address": None}
+
     def __init__(self, name, value):
         self.name = name
         self.value = value
+        self.address = None
 
     def __repr__(self):
         return f"DefineNode(name={self.name}, type={self.type_}, value={self.value})"
 
 class BinOpNode(ASTNode):
+    __slots__ = ("left", "op", "right", "operator", "quick", "left_type", "right_type", "warmup")
+    _state = {"operator": None, "quick": None, "left_type": None, "right_type": None, "warmup": 0}
+
     def __init__(self, left, op, right):
         self.left = left
         self.op = op
         self.right = right
+        # Execution state for the tree-walker (see Interpreter.visit_BinOpNode): the generic operator from
+        # rts.BINARY_OPERATORS, resolved on first use, and the rts.SPECIALIZED_OPERATORS entry the node has
+        # been quickened to, which only applies while the operands have exactly left_type and right_type.
+        self.operator = None
+        self.quick = None
+        self.left_type = None
+        self.right_type = None
+        self.warmup = 0 # Generic executions since the node was created or last quickened.
 
     def __repr__(self):
         return f"BinOpNode({self.left}, {self.op}, {self.right})"
     
 class IncNode(ASTNode):
+    __slots__ = ("identifier", "address")
+    _state = {"address": None}
+
     def __init__(self, identifier):
         self.identifier = identifier
+        self.address = None
 
     def __repr__(self):
         return f"IncNode({self.identifier})"
 
 class DecNode(ASTNode):
+    __slots__ = ("identifier", "address")
+    _state = {"address": None}
+
     def __init__(self, identifier):
         self.identifier = identifier
+        self.address = None
 
     def __repr__(self):
         return f"DecNode({self.identifier})"
     
 class UnaryOpNode(ASTNode):
+    __slots__ = ("op", "operand")
+
     def __init__(self, op, operand):
         self.op = op
         self.operand = operand
@@ -100,31 +189,63 @@ class UnaryOpNode(ASTNode):
 # Nodes for control flow, blocks, logic and loops, functions and classes, etc...
 
 class BlockNode(ASTNode):
+    __slots__ = ("statements",)
+
     def __init__(self, statements):
         self.statements = statements
 
 class IfBlockNode(ASTNode):
+    __slots__ = ("condition", "true_block", "false_block")
+
     def __init__(self, condition, true_block, false_block=None):
         self.condition = condition
         self.true_block = true_block
         self.false_block = false_block # Also considered an "else" block.
 
 class SwitchCaseBlockNode(ASTNode): # Contains the switch statement, array of cases, and a default case if provided.
+    __slots__ = ("expression", "cases", "default_block", "jump_table")
+    _state = {"jump_table": None}
+
     def __init__(self, expression: ASTNode, cases: list["CaseBlockNode"], default_block=None):
         self.expression = expression
         self.cases = cases
         self.default_block = default_block
+        self.jump_table = None # (table, end) from switch_jump_table(), built the first time it is needed.
+
+def switch_jump_table(node: SwitchCaseBlockNode) -> tuple:
+    """Return (table, end) for dispatching `node` without comparing against each case in turn.
+
+    The cases before index `end` all have literal values, and `table` maps each of those values to
+    the index of the first such case. A value that is not in the table can only match one of the
+    cases from `end` on, which are compared in order.
+    """
+    if node.jump_table is None:
+        table = {}
+        end = 0
+        for case in node.cases:
+            if not isinstance(case.case_value, LITERAL_NODES):
+                break
+            table.setdefault(literal_value(case.case_value), end)
+            end += 1
+        node.jump_table = (table, end)
+    return node.jump_table
 
 class CaseBlockNode(ASTNode):
+    __slots__ = ("case_value", "body")
+
     def __init__(self, case_value: ASTNode, body: BlockNode):
         self.case_value = case_value
         self.body = body
 
 class DefaultBlockNode(ASTNode): # This executes if no case matches the switch expression.
+    __slots__ = ("body",)
+
     def __init__(self, body: BlockNode):
         self.body = body
 
 class TryCatchNode(ASTNode):
+    __slots__ = ("try_block", "catch_block", "catch_exception", "finally_block")
+
     def __init__(self, try_block, catch_block, catch_exception=Exception, finally_block=None):
         self.try_block = try_block
         self.catch_block = catch_block
@@ -132,78 +253,127 @@ class TryCatchNode(ASTNode):
         self.finally_block = finally_block # Optional finally block.
 
 class WhileLoopNode(ASTNode):
+    __slots__ = ("condition", "body")
+
     def __init__(self, condition, body):
         self.condition = condition
         self.body = body
 
 class ForLoopNode(ASTNode):
+    __slots__ = ("initializer", "initializer_value", "condition", "increment", "body", "frame_size", "counted")
+    _state = {"frame_size": 1, "counted": False}
+
     def __init__(self, initializer, initializer_value, condition, increment, body):
         self.initializer = initializer
         self.initializer_value = initializer_value
         self.condition = condition
         self.increment = increment
         self.body = body
+        self.frame_size = 1 # Number of slots in the loop environment (the initializer is slot 0), set by resolver.Resolver.
+        self.counted = False # True if the loop can run over an rts.counted_range(), set by resolver.Resolver (see is_counted_loop).
 
 class ForEachLoopNode(ASTNode):
+    __slots__ = ("iterator", "iterable", "body", "frame_size", "local_environment", "global_environment")
+    _state = {"frame_size": 1, "local_environment": None, "global_environment": None}
+
     def __init__(self, iterator, iterable, body):
         self.iterator = iterator
         self.iterable = iterable
         self.body = body
+        self.frame_size = 1 # Number of slots in the loop environment (the iterator is slot 0), set by resolver.Resolver.
         self.local_environment: Env = None # Defined later in the interpreter. Stores the loops local variables including the iterator.
         self.global_environment: Env = None # Defined later in the interpreter. Points to the global environment where the loop was defined.
 
 # Nodes for functions...
 
 class ParameterNode(ASTNode):
+    __slots__ = ("name", "type_", "type_id", "default_value")
+    _state = {"type_id": None} # Type ids are only valid in the process that interned them.
+
     def __init__(self, name, type_):
         self.name = name
         self.type_ = type_
+        self.type_id = intern_type(type_) # Interned type of the parameter's Cell (see rts.Cell).
         self.default_value = None  # Optional default value for the parameter
 
+    def init_state(self):
+        self.type_id = intern_type(self.type_)
+
+    @property
+    def has_default(self):
+        return self.default_value is not None
+
 class FunctionDefinitionNode(ASTNode):
-    def __init__(self, name, parameters, body, return_type):
+    __slots__ = ("name", "parameters", "local_environment", "global_environment", "body", "return_type", "frame_size", "call_plan", "pure", "memo", "py_impl")
+    _state = {"local_environment": None, "global_environment": None, "frame_size": 0, "call_plan": None, "memo": None, "py_impl": None}
+
+    def __init__(self, name, parameters, body, return_type, pure=False):
         self.name = name
         self.parameters: list[ParameterNode] = parameters
         self.local_environment: Env = None # Defined later in the interpreter. Stores the functions local variables including parameter values.
         self.global_environment: Env = None # Defined later in the interpreter. Points to the global environment where the function was defined.
         self.body: BlockNode = body
         self.return_type = None if return_type == "void" or return_type == "VOID" else return_type
+        self.frame_size = len(parameters) # Number of slots in a call environment (parameters come first), set by resolver.Resolver.
+        self.call_plan = None # rts.CallPlan for binding call arguments, built when the function is defined.
+        self.pure = pure # Declared with `function pure`: calls with the same arguments return the same value.
+        self.memo = None # rts.MemoCache of a pure function's results, created each time the function is defined.
 
         self.py_impl = None  # For built-in functions implemented in Python
 
+    def init_state(self):
+        super().init_state()
+        self.frame_size = len(self.parameters)
+
 class FunctionCallNode(ASTNode):
+    __slots__ = ("name", "arguments", "module_name", "tail_call", "call_cache")
+    _state = {"tail_call": False, "call_cache": None}
+
     def __init__(self, name, arguments, module_name=None):
         self.name = name
         self.arguments = arguments
         self.module_name = module_name # For function calls that specify a module (e.g. stdlib.printf)
+        self.tail_call = False # True if the call is returned directly and can replace the calling function, set by resolver.Resolver.
+        self.call_cache = None # Inline cache of the resolved function, see Env.function_cache and Env.module_function_cache.
 
 
 # Keywords for return, break, continue, etc...
 
 class ReturnNode(ASTNode):
+    __slots__ = ("expression",)
+
     def __init__(self, expression):
         self.expression = expression
 
 # Keywords for output and input...
 
 class OutputNode(ASTNode):
+    __slots__ = ("expression",)
+
     def __init__(self, expression):
         self.expression = expression
 
 # Nodes for arrays & other data structures...
 
 class ArrayNode(ASTNode):
-    def __init__(self, elements, size):
+    __slots__ = ("elements", "size", "element_type")
+
+    def __init__(self, elements, size, element_type=None):
         self.elements = elements
         self.size = size
+        self.element_type = element_type # The declared type of the define; int, float, bool and char arrays are built as TypedArrays.
 
     def __repr__(self):
         return f"ArrayNode(size={self.size})"
     
 class ArrayAccessNode(ASTNode):
+    __slots__ = ("array_name", "index", "address")
+    _state = {"address": None}
+
     def __init__(self, array_name, index):
         self.array_name = array_name
         self.index = index
+        self.address = None
 
     def __repr__(self):
         return f"ArrayAccessNode(array={self.array_name}, index={self.index})"
@@ -211,6 +381,8 @@ class ArrayAccessNode(ASTNode):
 # Nodes for special operators regarding namespaces, imports, and other language features.
 
 class NameScopeResolutionOpNode(ASTNode):
+    __slots__ = ("scope_name", "identifier")
+
     def __init__(self, scope_name: IdentifierNode, identifier: IdentifierNode):
         self.scope_name = scope_name # Represents the namespace or scope name.
         self.identifier = identifier # Represents the target object within the scope.
@@ -219,6 +391,8 @@ class NameScopeResolutionOpNode(ASTNode):
         return f"NameScopeResolutionOpNode(scope={self.scope_name}, id={self.identifier})"
     
 class ImportNode(ASTNode):
+    __slots__ = ("module_name", "alias")
+
     def __init__(self, module_name: IdentifierNode, alias: IdentifierNode = None):
         self.module_name = module_name
         self.alias = alias
@@ -227,6 +401,8 @@ class ImportNode(ASTNode):
         return f"ImportNode(module={self.module_name}, alias={self.alias})"
     
 class NamespaceDefinitionNode(ASTNode):
+    __slots__ = ("name", "body")
+
     def __init__(self, name: IdentifierNode, body: BlockNode):
         self.name = name
         self.body = body
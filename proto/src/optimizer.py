@@ -0,0 +1,176 @@
+from nodes import *
+from environment import Env
+from interpreter import Interpreter
+from typing import Callable, Dict
+
+# Folded strings longer than this are left to be built at runtime, so `"ab" * 100000` does not
+# bloat the AST.
+MAX_FOLDED_STRING = 4096
+
+def count_nodes(node) -> int:
+    """Number of nodes in the tree rooted at `node`."""
+    count = 0
+    pending = [node]
+    while pending:
+        node = pending.pop()
+        count += 1
+        pending.extend(iter_child_nodes(node))
+    return count
+
+def literal_node(value):
+    """Build the literal node evaluating to `value`, or None if `value` has no literal form."""
+    if isinstance(value, bool):
+        return BooleanNode("true" if value else "false")
+    elif isinstance(value, (int, float)):
+        return NumberNode(value)
+    elif isinstance(value, str) and len(value) <= MAX_FOLDED_STRING:
+        return StringNode(value)
+    return None
+
+class Optimizer:
+    """AST pass run between Parser.parse and execution.
+
+    Folds operator and cast trees whose operands are all literals, and replaces if/while/switch
+    statements whose condition folds to a constant with the branch that would run. Blocks do not
+    open a scope, so a pruned branch's statements are spliced into the enclosing block.
+
+    Constant expressions are evaluated by the tree-walking Interpreter, so folded values match what
+    every engine computes at runtime. Expressions that raise (e.g. `1 / 0`) are left in place to
+    fail when the program runs.
+    """
+
+    # Same shape as Interpreter.handlers, mapping node classes to optimize_<NodeName> methods.
+    optimizers: Dict[type, Callable] = {}
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        cls.optimizers = {}
+
+    def __init__(self):
+        self.evaluator = Interpreter(Env())
+        self.removed = 0 # Nodes removed by the last call to optimize().
+
+    def optimize(self, program):
+        """Optimize `program` in place and return it; sets `removed` to the number of nodes dropped."""
+        before = count_nodes(program)
+        program = self.transform(program)
+        self.removed = before - count_nodes(program)
+        return program
+
+    def transform(self, node):
+        if node is None:
+            return None
+        optimizer = self.optimizers.get(node.__class__)
+        if optimizer is None:
+            optimizer = self.resolve_optimizer(node.__class__)
+        return optimizer(self, node)
+
+    @classmethod
+    def resolve_optimizer(cls, node_type: type) -> Callable:
+        """Find the optimizer for `node_type` by walking its MRO and cache it in the optimizer table."""
+        optimizer = cls.generic_optimize
+        for klass in node_type.__mro__:
+            method = getattr(cls, f"optimize_{klass.__name__}", None)
+            if method is not None:
+                optimizer = method
+                break
+        cls.optimizers[node_type] = optimizer
+        return optimizer
+
+    def generic_optimize(self, node):
+        # Optimize the children in place, leaving the node itself unchanged.
+        for field in node._fields:
+            value = getattr(node, field, None)
+            if isinstance(value, ASTNode):
+                setattr(node, field, self.transform(value))
+            elif isinstance(value, list):
+                setattr(node, field, [self.transform(item) if isinstance(item, ASTNode) else item for item in value])
+        return node
+
+    def fold(self, node):
+        """Replace `node` with a literal when all of its operands are literals."""
+        try:
+            value = self.evaluator.visit(node)
+        except Exception:
+            return node
+        folded = literal_node(value)
+        return node if folded is None else folded
+
+    def constant(self, node):
+        """Return (True, value) if `node` is a literal, else (False, None)."""
+        if isinstance(node, LITERAL_NODES):
+            return True, self.evaluator.visit(node)
+        return False, None
+
+    ###
+    ### # Constant folding
+    ###
+
+    def optimize_BinOpNode(self, node: BinOpNode):
+        node.left = self.transform(node.left)
+        node.right = self.transform(node.right)
+        if isinstance(node.left, LITERAL_NODES) and isinstance(node.right, LITERAL_NODES):
+            return self.fold(node)
+        return node
+
+    def optimize_UnaryOpNode(self, node: UnaryOpNode):
+        node.operand = self.transform(node.operand)
+        if isinstance(node.operand, LITERAL_NODES):
+            return self.fold(node)
+        return node
+
+    def optimize_CastNode(self, node: CastNode):
+        node.expression = self.transform(node.expression)
+        if isinstance(node.expression, LITERAL_NODES):
+            return self.fold(node)
+        return node
+
+    ###
+    ### # Dead branch elimination
+    ###
+
+    def optimize_BlockNode(self, node: BlockNode):
+        statements = [self.transform(stmt) for stmt in node.statements]
+        node.statements = []
+        for i, stmt in enumerate(statements):
+            # The last statement is kept as is because it is the block's value, even when it is an
+            # empty block evaluating to nothing.
+            if isinstance(stmt, BlockNode) and i < len(statements) - 1:
+                node.statements.extend(stmt.statements)
+            else:
+                node.statements.append(stmt)
+        return node
+
+    def optimize_IfBlockNode(self, node: IfBlockNode):
+        node.condition = self.transform(node.condition)
+        node.true_block = self.transform(node.true_block)
+        node.false_block = self.transform(node.false_block)
+        is_constant, condition = self.constant(node.condition)
+        if not is_constant:
+            return node
+        if condition:
+            return node.true_block
+        return node.false_block if node.false_block else BlockNode([])
+
+    def optimize_WhileLoopNode(self, node: WhileLoopNode):
+        node.condition = self.transform(node.condition)
+        is_constant, condition = self.constant(node.condition)
+        if is_constant and not condition:
+            return BlockNode([])
+        node.body = self.transform(node.body)
+        return node
+
+    def optimize_SwitchCaseBlockNode(self, node: SwitchCaseBlockNode):
+        node = self.generic_optimize(node)
+        is_constant, expression = self.constant(node.expression)
+        if not is_constant:
+            return node
+        for case in node.cases:
+            is_constant, case_value = self.constant(case.case_value)
+            if not is_constant:
+                return node # Can't tell whether this case matches before the program runs.
+            if expression == case_value:
+                return case.body
+        if node.default_block:
+            return node.default_block.body
+        return BlockNode([])
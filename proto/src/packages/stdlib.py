@@ -7,7 +7,7 @@ from typing import Any
 # This file contains built-in functions and definitions for the GIL language.
 
 ### Variables
-gill_version = "0.1.0"  # Version of the GILL language
+gill_version = GILL_VERSION  # Version of the GILL language
 
 ### Functions
 
@@ -69,6 +69,7 @@ REGISTER ALL STDLIB FUNCTIONS AND VARIABLES IN THE MODULE ENVIRONMENT
 # NativeFunctionNode takes the function name, parameters (as list of ParameterSpec), and the python implementation.
 # ParameterSpec takes in a 'kind' parameter. Note that this parameter is optional and defaults to literal "positional".
 # Note that the parameters can be an empty list if there are no parameters.
+# Pass pure=True for functions whose result only depends on their arguments, so repeated calls are answered from a cache.
 
 #                    Module Name (should reflect name of python file) (i.e. stdlib.py)
 #                         |
@@ -78,9 +79,9 @@ module_env = ModuleEnv("stdlib")
 module_env.functions = {
     "printf": NativeFunction("printf", [ParameterSpec("format", "string", ParameterSpec.NO_DEFAULT, ParameterSpec.POSITIONAL), ParameterSpec("args", "varargs", kind=ParameterSpec.VARARGS)], printf),
     "printfr": NativeFunction("printfr", [ParameterSpec("format", "string", ParameterSpec.NO_DEFAULT, ParameterSpec.POSITIONAL), ParameterSpec("args", "varargs", kind=ParameterSpec.VARARGS)], printfr),
-    "str_len": NativeFunction("str_len", [ParameterSpec("s", "string", ParameterSpec.NO_DEFAULT, ParameterSpec.POSITIONAL)], str_len),
+    "str_len": NativeFunction("str_len", [ParameterSpec("s", "string", ParameterSpec.NO_DEFAULT, ParameterSpec.POSITIONAL)], str_len, pure=True),
     "sizeof": NativeFunction("sizeof", [ParameterSpec("object", "var", ParameterSpec.NO_DEFAULT, ParameterSpec.POSITIONAL)], sizeof),
-    "pow": NativeFunction("pow", [ParameterSpec("base", "float", ParameterSpec.NO_DEFAULT, ParameterSpec.POSITIONAL), ParameterSpec("exponent", "float", ParameterSpec.NO_DEFAULT, ParameterSpec.POSITIONAL)], pow)
+    "pow": NativeFunction("pow", [ParameterSpec("base", "float", ParameterSpec.NO_DEFAULT, ParameterSpec.POSITIONAL), ParameterSpec("exponent", "float", ParameterSpec.NO_DEFAULT, ParameterSpec.POSITIONAL)], pow, pure=True)
 }
 
 # Variables to register in the stdlib module
@@ -1,36 +1,69 @@
 from nodes import *
-from tokenclass import Token
+from tokenclass import Token, TokenBuffer, TokenStream
+
+# Version of the trees the lexer and parser build. Bump it when a change to either builds a different
+# tree for the same source (the node layout is checked separately), so .gillc caches are rebuilt.
+TREE_VERSION = 1
+
+# Infix operators, by token kind: (left binding power, right binding power). Higher powers bind
+# tighter. An operator whose right power is above its left power is left-associative.
+BINDING_POWERS = {
+    "OR": (1, 2),
+    "AND": (3, 4),
+    "EQ": (5, 6),
+    "NEQ": (5, 6),
+    "LT": (7, 8),
+    "LTE": (7, 8),
+    "GT": (7, 8),
+    "GTE": (7, 8),
+    "ADD": (9, 10),
+    "SUB": (9, 10),
+    "MUL": (11, 12),
+    "DIV": (11, 12),
+    "FDIV": (11, 12),
+    "MOD": (11, 12),
+}
+
+# Casts take an arithmetic operand, stopping before comparisons and logical operators.
+CAST_OPERAND_POWER = BINDING_POWERS["ADD"][0]
 
 class Parser:
     def __init__(self, tokens, debug=False):
-        self.tokens = tokens
-        self.position = 0
+        # `tokens` is a TokenStream from Lexer.tokenize, or any iterable of Tokens such as
+        # Lexer.stream(), which is read through a small lookahead buffer.
+        self.tokens = tokens if isinstance(tokens, TokenStream) else TokenBuffer(tokens)
         self.debug = debug
 
     @property
     def current_token(self) -> Token:
-        if self.position < len(self.tokens):
-            return self.tokens[self.position]
-        return None
+        """The current token as a Token object; the parser itself only reads current_kind."""
+        return self.tokens.current
+
+    @property
+    def current_kind(self) -> str:
+        return self.tokens.kind
 
     def eat(self, kind):
-        token: Token = self.current_token
-        if token and token.kind == kind:
-            self.position += 1
-            return token
-        raise SyntaxError(f"Expected token {kind}, got {token}")
+        """Consume a token of `kind` and return its value."""
+        if self.tokens.kind == kind:
+            return self.tokens.advance()
+        raise SyntaxError(f"Expected token {kind}, got {self.current_token}")
 
     def parse(self):
-        statements = []
-        while self.current_token is not None:
+        return BlockNode(list(self.statements()))
+
+    def statements(self):
+        """Yield the top-level statements one by one, each parsed only when it is asked for."""
+        while self.current_kind is not None:
             stmt = self.parse_statement()
-            if stmt is not None:
-                statements.append(stmt)
-        return BlockNode(statements)
+            if stmt is None:
+                # parse_statement didn't consume anything, e.g. a lone identifier.
+                raise SyntaxError(f"Unexpected token {self.current_token} in statement parsing.")
+            yield stmt
 
     def parse_define(self):
         self.eat("DEFINE")
-        name = self.eat("IDENTIFIER").value
+        name = self.eat("IDENTIFIER")
 
         declared_size: int | None = None
         value_node = None
@@ -38,74 +71,63 @@ class Parser:
         if self.check("LBRACKET"):
             # Array definition
             self.eat("LBRACKET")
-            size_token: Token = None
             if self.check("NUMBER"):
-                size_token = self.eat("NUMBER")
-            declared_size = size_token.value if size_token else None
+                declared_size = self.eat("NUMBER")
             self.eat("RBRACKET")
-            type_token = self.eat("TYPE").value
-            value_node = self.parse_array(declared_size)
+            type_token = self.eat("TYPE")
+            value_node = self.parse_array(declared_size, type_token)
             return DefineNode(name, type_token, value_node)
 
-        type_token = self.eat("TYPE").value
+        type_token = self.eat("TYPE")
         value_node = self.parse_expr()
         return DefineNode(name, type_token, value_node)
     
     def parse_assign(self):
         self.eat("ASSIGN")
-        name = self.eat("IDENTIFIER").value
+        name = self.eat("IDENTIFIER")
         value_node = self.parse_expr()
         return AssignNode(name, value_node)
     
     def parse_casting(self):
-        cast_token = self.eat("CAST").value
-        expr_node = self.parse_expr()
+        cast_token = self.eat("CAST")
+        # A cast applies to the arithmetic expression after it: `(int) 1.5 + 1.5` is 3.
+        expr_node = self.parse_expr(CAST_OPERAND_POWER)
         # Cast token would be the target type...
         return CastNode(cast_token, expr_node)
 
     # --- Expression grammar ---
-    # expr   -> term ((ADD|SUB) term)*
-    # term   -> factor ((MUL|DIV|FDIV) factor)*
-    # factor -> NUMBER | IDENTIFIER | '(' expr ')'
-
-    def parse_expr(self):
-        node = self.parse_term()
-        while self.current_token and self.current_token.kind in ("ADD", "SUB"):
-            op = self.eat(self.current_token.kind).kind
-            right = self.parse_term()
-            node = BinOpNode(node, op, right)
-        return node
-
-    def parse_term(self):
+    # Expressions are parsed by precedence climbing (a Pratt parser): parse_factor reads an operand,
+    # then parse_expr keeps extending it with the infix operators in BINDING_POWERS.
+    # factor -> NUMBER | IDENTIFIER | '(' expr ')' | ...
+
+    def parse_expr(self, min_power=0):
+        """Parse an expression whose operators all have a left binding power of at least `min_power`.
+
+        A chain of operators of the same precedence is built by the loop, not by recursion, so the
+        nesting depth of the parser only grows with the number of precedence levels in a row.
+        """
         node = self.parse_factor()
-        while self.current_token and self.current_token.kind in ("MUL", "DIV", "FDIV"):
-            op = self.eat(self.current_token.kind).kind
-            right = self.parse_factor()
-            node = BinOpNode(node, op, right)
-        return node
-    
-    def parse_boolean(self):
-        node = self.parse_expr()
-        while self.current_token and self.current_token.kind in ("EQ", "NEQ", "LT", "LTE", "GT", "GTE", "AND", "OR"):
-            op = self.eat(self.current_token.kind).kind
-            right = self.parse_expr()
-            node = BinOpNode(node, op, right)
-        return node
+        tokens = self.tokens
+        while True:
+            op = tokens.kind
+            powers = BINDING_POWERS.get(op)
+            if powers is None or powers[0] < min_power:
+                return node
+            tokens.advance()
+            node = BinOpNode(node, op, self.parse_expr(powers[1]))
 
     def parse_factor(self):
-        token = self.current_token
-        print(f"Parsing factor with token: {token}") if self.debug else None
-        if token.kind == "NUMBER":
-            self.eat("NUMBER")
-            return NumberNode(token.value)
+        kind = self.current_kind
+        print(f"Parsing factor with token: {self.current_token}") if self.debug else None
+        if kind == "NUMBER":
+            return NumberNode(self.eat("NUMBER"))
         
-        elif token.kind == "IDENTIFIER":
-            print(f"Parsing IDENTIFIER: {token}") if self.debug else None
-            self.eat("IDENTIFIER")
+        elif kind == "IDENTIFIER":
+            print(f"Parsing IDENTIFIER: {self.current_token}") if self.debug else None
+            variable_name = self.eat("IDENTIFIER")
             print(f"Current token after eating IDENTIFIER: {self.current_token}") if self.debug else None
             if self.check("LBRACKET"):
-                return self.parse_array_access(token.value)
-            variable_name = token.value
+                return self.parse_array_access(variable_name)
 
             if self.check("INC"):
                 self.eat("INC")
@@ -117,53 +139,48 @@ class Parser:
             
             return IdentifierNode(variable_name, declared_type=None)
         
-        elif token.kind == "STRING":
-            self.eat("STRING")
-            return StringNode(token.value)
+        elif kind == "STRING":
+            return StringNode(self.eat("STRING"))
         
-        elif token.kind == "CHAR":
-            self.eat("CHAR")
-            return CharNode(token.value)
+        elif kind == "CHAR":
+            return CharNode(self.eat("CHAR"))
         
-        elif token.kind == "LPAREN":
+        elif kind == "LPAREN":
             self.eat("LPAREN")
 
             # Check if this is a cast: (type)expr
-            if self.current_token and self.current_token.kind == "CAST":
-                cast_token = self.eat("CAST").value
+            if self.check("CAST"):
+                cast_token = self.eat("CAST")
                 expr_node = self.parse_factor()  # parse the value to cast
                 self.expect("RPAREN")  # close the entire (type expr)
                 return CastNode(cast_token, expr_node)
             else:
                 # normal parenthesized expression
-                node = self.parse_boolean()
+                node = self.parse_expr()
                 self.expect("RPAREN")
                 return node
 
-        elif token.kind == "BOOLEAN":
-            self.eat("BOOLEAN")
-            return BooleanNode(token.value)
+        elif kind == "BOOLEAN":
+            return BooleanNode(self.eat("BOOLEAN"))
         
-        elif token.kind == "NOT":
-            op = self.eat("NOT").kind
+        elif kind == "NOT":
+            self.eat("NOT")
+            op = "NOT"
             operand = self.parse_factor()
             return UnaryOpNode(op, operand)
         
-        elif token.kind == "OUTPUT":
+        elif kind == "OUTPUT":
             self.eat("OUTPUT")
             return self.parse_output_expr()
         
-        elif token.kind == "CAST":
+        elif kind == "CAST":
             return self.parse_casting()
         
-        elif token.kind == "EXECUTE":
+        elif kind == "EXECUTE":
             return self.parse_function_call()
 
         else:
-            for token in self.tokens:
-                print(token)
-
-            raise SyntaxError(f"Unexpected token {token} (method:parse_factor)")
+            raise SyntaxError(f"Unexpected token {self.current_token} (method:parse_factor)")
         
     def parse_output_expr(self):
         print(f"Parsing output expression, current token: {self.current_token}") if self.debug else None
@@ -175,36 +192,43 @@ class Parser:
             return OutputNode(expr_node)
         
     def expect(self, kind):
-        if self.current_token.kind != kind:
-            raise SyntaxError(f"Expected {kind}, got {self.current_token.kind}\nError @ {self.current_token.line}:{self.current_token.column}")
-        token = self.current_token
-        self.position += 1
-        return token
+        if self.tokens.kind != kind:
+            if self.tokens.kind is None:
+                raise SyntaxError(f"Expected {kind}, got unexpected end of input")
+            token = self.current_token
+            raise SyntaxError(f"Expected {kind}, got {token.kind}\nError @ {token.line}:{token.column}")
+        return self.tokens.advance()
 
     def check(self, kind):
         """Return True if the current token matches `kind`."""
-        return self.current_token is not None and self.current_token.kind == kind
+        return self.tokens.kind == kind
     
     def peek(self, offset=1):
-        pos = self.position + offset
-        if pos < len(self.tokens):
-            return self.tokens[pos]
-        return None
+        return self.tokens.peek(offset)
+
+    def peek_kind(self, offset=1):
+        return self.tokens.peek_kind(offset)
     
     def parse_function_definition(self):
         self.eat("FUNCTION")
+        # `function pure int f(...)`: the result only depends on the arguments, so calls may be memoized.
+        pure = self.check("PURE")
+        if pure:
+            self.eat("PURE")
 
         if not self.check("TYPE"):
+            if self.current_kind is None:
+                self.expect("TYPE") # A SyntaxError, so the REPL reads the rest of the definition.
             raise Exception("FunctionDefinitionError: Missing return type for function definition.")
         
-        return_type = self.eat("TYPE").value
-        name = self.eat("IDENTIFIER").value
+        return_type = self.eat("TYPE")
+        name = self.eat("IDENTIFIER")
         parameters: list[tuple[str, str]] = []
         self.eat("LPAREN")
         if not self.check("RPAREN"):
             while True:
-                param_type = self.eat("TYPE").value
-                param_name = self.eat("IDENTIFIER").value
+                param_type = self.eat("TYPE")
+                param_name = self.eat("IDENTIFIER")
                 if self.check("DEFAULT"):
                     self.eat("DEFAULT")
                     default_value_node = self.parse_expr()
@@ -220,17 +244,17 @@ class Parser:
 
         self.eat("RPAREN")
         body = self.parse_block()
-        return FunctionDefinitionNode(name, parameters, body, return_type)
+        return FunctionDefinitionNode(name, parameters, body, return_type, pure)
     
     def parse_namespace_definition(self):
         self.eat("NAMESPACE")
-        name = self.eat("IDENTIFIER").value
+        name = self.eat("IDENTIFIER")
         body = self.parse_block()
         return NamespaceDefinitionNode(name, body)
     
     def parse_import(self):
         self.eat("IMPORT")
-        module_name = self.eat("IDENTIFIER").value
+        module_name = self.eat("IDENTIFIER")
         return ImportNode(module_name)
     
     def parse_function_call(self):
@@ -240,10 +264,10 @@ class Parser:
             raise SyntaxError("No function or method specified to execute.")
 
         # module::function(...)
-        if (self.position + 1) < len(self.tokens) and self.tokens[self.position + 1].kind == "SCOPERESOP":
-            module_name = self.eat("IDENTIFIER").value
+        if self.peek_kind() == "SCOPERESOP":
+            module_name = self.eat("IDENTIFIER")
             self.eat("SCOPERESOP")
-            function_name = self.eat("IDENTIFIER").value
+            function_name = self.eat("IDENTIFIER")
 
             args = []
             self.eat("LPAREN")
@@ -259,7 +283,7 @@ class Parser:
             return FunctionCallNode(function_name, args, module_name=module_name)
 
         # function(...)
-        function_name = self.eat("IDENTIFIER").value
+        function_name = self.eat("IDENTIFIER")
         args = []
         self.eat("LPAREN")
         if not self.check("RPAREN"):
@@ -291,12 +315,12 @@ class Parser:
 
     def parse_if(self):
         self.eat("IF")
-        condition = self.parse_boolean()
+        condition = self.parse_expr()
         true_block = self.parse_block()
         false_block = None
 
         # Check the current token AFTER the true block
-        if self.current_token and self.current_token.kind == "ELSE":
+        if self.check("ELSE"):
             false_block = self.parse_else()
 
         return IfBlockNode(condition, true_block, false_block)
@@ -330,6 +354,8 @@ class Parser:
             case_value_node = self.parse_expr()
             self.eat("RPAREN")
             case_block = self.parse_block() # This function automatically eats the LCBRACE and RCBRACE
+        elif not self.check("DEFAULT"):
+            raise SyntaxError(f"Expected case or default in switch, got {self.current_token}")
 
         return CaseBlockNode(case_value_node, case_block)
 
@@ -339,7 +365,7 @@ class Parser:
 
     def parse_while(self):
         self.eat("WHILE")
-        condition = self.parse_boolean()
+        condition = self.parse_expr()
         body = self.parse_block()
         return WhileLoopNode(condition, body)
     
@@ -347,11 +373,11 @@ class Parser:
         self.eat("FOR")
         self.eat("LPAREN")
         self.eat("DEFINE")
-        initializer = self.eat("IDENTIFIER").value
+        initializer = self.eat("IDENTIFIER")
         self.eat("TYPE")
-        initializer_value = self.eat("NUMBER").value
+        initializer_value = self.eat("NUMBER")
         self.eat("COMMA")
-        condition = self.parse_boolean()
+        condition = self.parse_expr()
         self.eat("COMMA")
         increment = self.parse_statement()
         self.eat("RPAREN")
@@ -362,7 +388,7 @@ class Parser:
         self.eat("FOREACH")
         self.eat("LPAREN")
         self.eat("DEFINE")
-        iterator = self.eat("IDENTIFIER").value
+        iterator = self.eat("IDENTIFIER")
         self.eat("TYPE")
         self.eat("COLON")
         iterable = self.parse_expr()
@@ -370,7 +396,7 @@ class Parser:
         body = self.parse_block()
         return ForEachLoopNode(iterator, iterable, body)
     
-    def parse_array(self, declared_size=None):
+    def parse_array(self, declared_size=None, element_type=None):
         self.eat("LBRACKET")
         elements = []
         if not self.check("RBRACKET"):
@@ -385,7 +411,7 @@ class Parser:
         if declared_size is not None and declared_size < arr_size:
             raise SyntaxError(f"Array size mismatch: declared size {declared_size}, but got {arr_size} elements.")
         self.eat("RBRACKET")
-        return ArrayNode(elements, arr_size)
+        return ArrayNode(elements, arr_size, element_type)
     
     def parse_array_access(self, array_name):
         self.eat("LBRACKET")
@@ -394,96 +420,94 @@ class Parser:
         return ArrayAccessNode(array_name, index_node)
     
     def parse_statement(self):
-        tok = self.current_token
+        kind = self.current_kind
 
-        if tok.kind == "NUMBER":
+        if kind == "NUMBER":
             print(f"Parsing NUMBER, current token: {self.current_token}") if self.debug else None
             return self.parse_expr()
-        elif tok.kind == "DEFINE":
+        elif kind == "DEFINE":
             print(f"Parsing DEFINE statement, current token: {self.current_token}") if self.debug else None
             return self.parse_define()
-        elif tok.kind == "ASSIGN":
+        elif kind == "ASSIGN":
             print(f"Parsing ASSIGN statement, current token: {self.current_token}") if self.debug else None
             return self.parse_assign()
-        elif tok.kind == "IDENTIFIER":
-            next_tok: Token = self.peek()
-            print(f"Next token after IDENTIFIER: {next_tok}") if self.debug else None
-            if next_tok and next_tok.kind == "LBRACKET":
+        elif kind == "IDENTIFIER":
+            next_kind = self.peek_kind()
+            print(f"Next token after IDENTIFIER: {self.peek()}") if self.debug else None
+            if next_kind == "LBRACKET":
                 print(f"Parsing ARRAY ACCESS statement, current token: {self.current_token}") if self.debug else None
-                var_name = tok.value
-                self.eat("IDENTIFIER")
+                var_name = self.eat("IDENTIFIER")
                 return self.parse_array_access(var_name)
             
-            if next_tok and next_tok.kind == "INC":
+            if next_kind == "INC":
                 print(f"Parsing INC statement, current token: {self.current_token}") if self.debug else None
-                var_name = tok.value
-                self.eat("IDENTIFIER")
+                var_name = self.eat("IDENTIFIER")
                 self.eat("INC")
                 return IncNode(var_name)
             
-            elif next_tok and next_tok.kind == "DEC":
+            elif next_kind == "DEC":
                 print(f"Parsing DEC statement, current token: {self.current_token}") if self.debug else None
-                var_name = tok.value
-                self.eat("IDENTIFIER")
+                var_name = self.eat("IDENTIFIER")
                 self.eat("DEC")
                 return DecNode(var_name)
             
-            elif next_tok and next_tok.kind in ("ADD", "SUB", "MUL", "DIV", "FDIV", "EQ", "NEQ", "LT", "LTE", "GT", "GTE", "AND", "OR"):
-                return self.parse_boolean()
+            elif next_kind in BINDING_POWERS:
+                return self.parse_expr()
             
-        elif tok.kind == "FUNCTION":
+        elif kind == "FUNCTION":
             print(f"Parsing FUNCTION statement, current token: {self.current_token}") if self.debug else None
             return self.parse_function_definition()
-        elif tok.kind == "NAMESPACE":
+        elif kind == "NAMESPACE":
             print(f"Parsing NAMESPACE statement, current token: {self.current_token}") if self.debug else None
             return self.parse_namespace_definition()
-        elif tok.kind == "IMPORT":
+        elif kind == "IMPORT":
             print(f"Parsing IMPORT statement, current token: {self.current_token}") if self.debug else None
             return self.parse_import()
-        elif tok.kind == "RETURN":
+        elif kind == "RETURN":
             print(f"Parsing RETURN statement, current token: {self.current_token}") if self.debug else None
             self.eat("RETURN")
             expr_node = self.parse_expr()
             return ReturnNode(expr_node)
-        elif tok.kind == "EXECUTE":
+        elif kind == "EXECUTE":
             print(f"Parsing FUNCTION CALL statement, current token: {self.current_token}") if self.debug else None
             return self.parse_function_call()
-        elif tok.kind == "LCBRACE":
+        elif kind == "LCBRACE":
             print(f"Parsing block, current token: {self.current_token}") if self.debug else None
             return self.parse_block()
-        elif tok.kind == "IF":
+        elif kind == "IF":
             print(f"Parsing IF statement, current token: {self.current_token}") if self.debug else None
             return self.parse_if()
-        elif tok.kind == "SWITCH":
+        elif kind == "SWITCH":
             print(f"Parsing SWITCH statement, current token: {self.current_token}") if self.debug else None
             return self.parse_switch()
-        elif tok.kind == "TRY":
+        elif kind == "TRY":
             print(f"Parsing TRY-CATCH statement, current token: {self.current_token}") if self.debug else None
             return self.parse_try_catch()
-        elif tok.kind == "WHILE":
+        elif kind == "WHILE":
             print(f"Parsing WHILE loop, current token: {self.current_token}") if self.debug else None
             return self.parse_while()
-        elif tok.kind == "OUTPUT":
+        elif kind == "OUTPUT":
             print(f"Parsing OUTPUT statement, current token: {self.current_token}") if self.debug else None
             self.eat("OUTPUT")
             return self.parse_output_expr()
-        elif tok.kind == "FOR":
+        elif kind == "FOR":
             print(f"Parsing FOR loop, current token: {self.current_token}") if self.debug else None
             return self.parse_for()
-        elif tok.kind == "FOREACH":
+        elif kind == "FOREACH":
             print(f"Parsing FOREACH loop, current token: {self.current_token}") if self.debug else None
             return self.parse_foreach()
         else:
-            raise SyntaxError(f"Unexpected token {tok} in statement parsing.\n{self.tokens}")
+            raise SyntaxError(f"Unexpected token {self.current_token} in statement parsing.")
 
     def parse_block(self):
         self.expect("LCBRACE")
         statements = []
 
         while not self.check("RCBRACE"):
-            stmt = self.parse_statement()  
-            if stmt:
-                statements.append(stmt)
+            stmt = self.parse_statement()
+            if stmt is None:
+                raise SyntaxError(f"Unexpected token {self.current_token} in statement parsing.")
+            statements.append(stmt)
 
         self.expect("RCBRACE")
         return BlockNode(statements)
@@ -1,24 +1,50 @@
-from parser import Parser
-from lexer import Lexer
-from interpreter import Interpreter
+import argparse
+from incremental import IncrementalParser
+from engines import ENGINES, DEFAULT_ENGINE, create_engine
 from environment import Env
+from optimizer import Optimizer
+import sys
 
-lexer = Lexer()
+arg_parser = argparse.ArgumentParser(description="Interactive GILL prompt.")
+arg_parser.add_argument("--engine", choices=ENGINES, default=DEFAULT_ENGINE, help="Execution engine to run statements with.")
+arg_parser.add_argument("--dump-python", action="store_true", help="Print the Python source generated by the python engine to stderr.")
+arg_parser.add_argument("--no-optimize", action="store_true", help="Skip constant folding and dead branch elimination.")
+arg_parser.add_argument("--optimizer-stats", action="store_true", help="Print how many nodes the optimizer removed to stderr.")
+args = arg_parser.parse_args()
+if args.dump_python and args.engine != "python":
+    arg_parser.error("--dump-python requires --engine python")
+
+optimizer = None if args.no_optimize else Optimizer()
 global_env = Env()
-interpreter = Interpreter(global_env)
+interpreter = create_engine(args.engine, global_env, **({"dump_source": True} if args.dump_python else {}))
 
 def format_value(value):
     if isinstance(value, bool):
         return "true" if value else "false"
     return str(value)
 
+# Lines of a statement that isn't complete yet; each new line is appended to it as an edit, so only
+# the tail of the pending input is lexed and parsed again.
+pending = IncrementalParser()
+
 while True:
     try:
-        line = input(">>> ")
-        tokens = lexer.tokenize(line)
-        parser = Parser(tokens)
-        ast = parser.parse()
-        result = interpreter.visit(ast)
+        line = input("... " if pending.text else ">>> ")
+        try:
+            pending.edit(len(pending.text), 0, line + "\n")
+        except SyntaxError:
+            if pending.tokens.kind is None:
+                # The input ended in the middle of a statement: read its next line.
+                continue
+            raise
+        ast = pending.program
+        pending = IncrementalParser()
+        if optimizer:
+            ast = optimizer.optimize(ast)
+            if args.optimizer_stats:
+                print(f"Optimizer removed {optimizer.removed} nodes.", file=sys.stderr)
+        result = interpreter.run(ast)
         print(format_value(result))
     except Exception as e:
+        pending = IncrementalParser()
         print(f"Error: {e}")
@@ -0,0 +1,200 @@
+from nodes import *
+from typing import Callable, Dict, List
+
+# Nodes that open a new environment at runtime, and so a new resolver scope.
+SCOPE_NODES = (FunctionDefinitionNode, ForLoopNode, ForEachLoopNode)
+
+def collect_defines(statements, names: Dict[str, int]):
+    """Assign a slot to every variable defined directly in this scope (not in nested scopes)."""
+    pending = list(reversed(statements))
+    while pending:
+        node = pending.pop()
+        if isinstance(node, DefineNode):
+            names.setdefault(node.name, len(names))
+        if not isinstance(node, SCOPE_NODES):
+            pending.extend(reversed(list(iter_child_nodes(node))))
+
+# Nodes that give a variable a new value, and the field naming the variable.
+WRITE_FIELDS = {
+    DefineNode: "name",
+    AssignNode: "name",
+    IncNode: "identifier",
+    DecNode: "identifier",
+    ForLoopNode: "initializer",
+    ForEachLoopNode: "iterator",
+}
+
+def is_counted_loop(node: ForLoopNode) -> bool:
+    """Return True if `node` is `for (define i int N, i < M, i++)` (or `i <= M`) and the body never writes i.
+
+    M must be a number, or a variable that the body does not write and cannot change through a call.
+    Such a loop visits the same values of i as range(N, M), so engines run it as a Python for loop.
+    """
+    condition = node.condition
+    if type(node.initializer_value) is not int or not isinstance(condition, BinOpNode) or condition.op not in ("LT", "LTE"):
+        return False
+    if not isinstance(condition.left, IdentifierNode) or condition.left.name != node.initializer:
+        return False
+    if not isinstance(node.increment, IncNode) or node.increment.identifier != node.initializer:
+        return False
+    bound = condition.right
+    if not isinstance(bound, (NumberNode, IdentifierNode)):
+        return False
+
+    written = set()
+    calls = False
+    pending = [node.body]
+    while pending:
+        child = pending.pop()
+        field = WRITE_FIELDS.get(child.__class__)
+        if field is not None:
+            written.add(getattr(child, field))
+        elif isinstance(child, FunctionCallNode):
+            calls = True
+        pending.extend(iter_child_nodes(child))
+    if node.initializer in written:
+        return False
+    return isinstance(bound, NumberNode) or not (calls or bound.name in written or bound.name == node.initializer)
+
+class Resolver:
+    """Static pass that gives every variable a (depth, slot) address.
+
+    Scopes follow the environments the engines create at runtime: the program, each function call
+    and each for/foreach loop; blocks do not open a scope. Every `define` in a scope is given a
+    slot up front, then each variable reference is annotated with the number of parent links to
+    follow (depth) and the slot to read in that environment (see Env.lookup). Names that are not
+    defined in any enclosing scope, such as imported modules, are left unresolved and looked up by
+    name.
+
+    The program scope persists between calls to resolve(), so the REPL can resolve one line at a
+    time against the same global environment.
+    """
+
+    # Same shape as Interpreter.handlers, mapping node classes to resolve_<NodeName> methods.
+    resolvers: Dict[type, Callable] = {}
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        cls.resolvers = {}
+
+    def __init__(self):
+        self.scopes: List[Dict[str, int]] = [{}] # Innermost last. Maps variable names to slots.
+        self.in_function = False
+        self.try_depth = 0 # Number of try statements around the current node within its function.
+
+    @property
+    def global_size(self) -> int:
+        """Number of slots the global environment needs."""
+        return len(self.scopes[0])
+
+    def resolve(self, program: BlockNode):
+        collect_defines(program.statements, self.scopes[0])
+        self.visit(program)
+
+    def visit(self, node):
+        if node is None:
+            return
+        resolver = self.resolvers.get(node.__class__)
+        if resolver is None:
+            resolver = self.resolve_resolver(node.__class__)
+        resolver(self, node)
+
+    @classmethod
+    def resolve_resolver(cls, node_type: type) -> Callable:
+        """Find the resolver for `node_type` by walking its MRO and cache it in the resolver table."""
+        resolver = cls.generic_resolve
+        for klass in node_type.__mro__:
+            method = getattr(cls, f"resolve_{klass.__name__}", None)
+            if method is not None:
+                resolver = method
+                break
+        cls.resolvers[node_type] = resolver
+        return resolver
+
+    def generic_resolve(self, node):
+        for child in iter_child_nodes(node):
+            self.visit(child)
+
+    def address_of(self, name: str):
+        """Return the (depth, slot) of `name` in the innermost scope defining it, or None."""
+        for depth, scope in enumerate(reversed(self.scopes)):
+            slot = scope.get(name)
+            if slot is not None:
+                return depth, slot
+        return None
+
+    def resolve_scope(self, names: Dict[str, int], statements) -> int:
+        """Resolve `statements` in a new scope starting with `names`; returns the scope's size."""
+        collect_defines(statements, names)
+        self.scopes.append(names)
+        try:
+            for stmt in statements:
+                self.visit(stmt)
+        finally:
+            self.scopes.pop()
+        return len(names)
+
+    ###
+    ### # Variables
+    ###
+
+    def resolve_IdentifierNode(self, node: IdentifierNode):
+        node.address = self.address_of(node.name)
+
+    def resolve_DefineNode(self, node: DefineNode):
+        self.visit(node.value)
+        node.slot = self.scopes[-1][node.name]
+
+    def resolve_AssignNode(self, node: AssignNode):
+        self.visit(node.value)
+        node.address = self.address_of(node.name)
+
+    def resolve_IncNode(self, node: IncNode):
+        node.address = self.address_of(node.identifier)
+
+    def resolve_DecNode(self, node: DecNode):
+        node.address = self.address_of(node.identifier)
+
+    def resolve_ArrayAccessNode(self, node: ArrayAccessNode):
+        self.visit(node.index)
+        node.address = self.address_of(node.array_name)
+
+    ###
+    ### # Calls
+    ###
+
+    def resolve_ReturnNode(self, node: ReturnNode):
+        # A returned call can replace the current call, unless a try statement still has to see it.
+        if isinstance(node.expression, FunctionCallNode):
+            node.expression.tail_call = self.in_function and not self.try_depth
+        self.visit(node.expression)
+
+    def resolve_TryCatchNode(self, node: TryCatchNode):
+        self.try_depth += 1
+        try:
+            self.generic_resolve(node)
+        finally:
+            self.try_depth -= 1
+
+    ###
+    ### # Scopes
+    ###
+
+    def resolve_FunctionDefinitionNode(self, node: FunctionDefinitionNode):
+        # Default values are evaluated in the caller's environment, so they stay unresolved.
+        names = {}
+        for param in node.parameters:
+            names.setdefault(param.name, len(names))
+        outer = self.in_function, self.try_depth
+        self.in_function, self.try_depth = True, 0
+        try:
+            node.frame_size = self.resolve_scope(names, [node.body])
+        finally:
+            self.in_function, self.try_depth = outer
+
+    def resolve_ForLoopNode(self, node: ForLoopNode):
+        node.frame_size = self.resolve_scope({node.initializer: 0}, [node.condition, node.body, node.increment])
+        node.counted = is_counted_loop(node)
+
+    def resolve_ForEachLoopNode(self, node: ForEachLoopNode):
+        node.frame_size = self.resolve_scope({node.iterator: 0}, [node.iterable, node.body])
@@ -1,5 +1,9 @@
+from collections import OrderedDict
+from array import array, typecodes
+import math
+import operator
 from dataclasses import dataclass
-from typing import Literal
+from typing import Callable, Dict, List, Literal
 from environment import Env
 
 ### Runtime System (RTS) Classes for Gill
@@ -7,14 +11,62 @@ from environment import Env
 # They are used by the interpreter to manage the execution of Gill programs.
 #
 # If you are creating your own native modules in Python, you will need to create instances of these classes to represent the variables and functions you want to expose to Gill code.
-# Use NativeVariable for simple variables and NativeFunction for functions. The Interpreter will look up these entities in the global environment when executing Gill code.
+# Use NativeVariable for simple variables (a Cell holding the Python value) and NativeFunction for functions. The Interpreter will look up these entities in the global environment when executing Gill code.
 # ParameterSpec is used to define the parameters of native functions, including their types and default values.
 
-class NativeVariable:
+GILL_VERSION = "0.1.0" # Version of the GILL language, stdlib's gill_version.
+
+# Declared type names are interned to small integers, so cells store and compare a type id
+# instead of a type string.
+TYPE_IDS: Dict[str, int] = {}
+TYPE_NAMES: List[str] = []
+
+def intern_type(type_name: str) -> int:
+    type_id = TYPE_IDS.get(type_name)
+    if type_id is None:
+        type_id = TYPE_IDS[type_name] = len(TYPE_NAMES)
+        TYPE_NAMES.append(type_name)
+    return type_id
+
+# Python classes of the values of each declared type, for Interpreter.check_type.
+TYPE_CLASSES: Dict[str, type] = {
+    "int": int,
+    "float": float,
+    "string": str,
+    "char": str,
+    "bool": bool,
+    "void": type(None),
+}
+
+class Cell:
+    """Storage for one variable in an Env: its interned declared type and current value.
+
+    Cells replace the {"type": ..., "value": ...} dicts variables used to be stored as; with
+    __slots__ they take a fraction of the memory and are cheaper to create.
+    """
+    __slots__ = ("type_id", "value")
+
+    def __init__(self, type_id: int, value):
+        self.type_id = type_id
+        self.value = value
+
+    @property
+    def type_(self) -> str:
+        return TYPE_NAMES[self.type_id]
+
+    def __repr__(self):
+        return f"Cell({self.type_}: {self.value!r})"
+
+class NativeVariable(Cell):
+    __slots__ = ("name",)
+
     def __init__(self, name, type_, py_impl):
+        super().__init__(intern_type(type_), py_impl)
         self.name = name
-        self.type_ = type_
-        self.py_impl = py_impl
+
+    @property
+    def py_impl(self):
+        return self.value
 
 class ParameterSpec:
     POSITIONAL = "positional"
@@ -34,10 +86,224 @@ class ParameterSpec:
         return self.default_value is not self.NO_DEFAULT
 
 class NativeFunction:
-    def __init__(self, name, parameters, py_impl):
+    # Pass pure=True for functions whose result depends only on their arguments (and that have no side
+    # effects), so engines can answer repeated calls from a MemoCache instead of calling py_impl.
+    def __init__(self, name, parameters, py_impl, pure=False):
         self.name = name
         self.parameters = parameters
         self.py_impl = py_impl
+        self.memo = MemoCache(name) if pure else None
+
+class MemoCache:
+    """Bounded LRU cache of a pure function's results, keyed by its argument values.
+
+    Keys also hold the argument types, so a call with 2 is not answered with the result of a call
+    with 2.0 or true. Calls with an unhashable argument (an array) are not cached.
+    """
+    __slots__ = ("name", "max_size", "entries", "hits", "misses")
+    MISSING = object()
+    default_size = 256 # Size of caches created without one; main.py sets it from --memo-size.
+
+    def __init__(self, name: str, max_size: int = None):
+        self.name = name
+        self.max_size = MemoCache.default_size if max_size is None else max_size
+        self.entries: OrderedDict = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def key(values) -> tuple:
+        return (tuple(values), tuple(map(type, values)))
+
+    def lookup(self, key):
+        """Return the cached result for `key`, or MemoCache.MISSING."""
+        try:
+            value = self.entries[key]
+        except KeyError:
+            self.misses += 1
+            return self.MISSING
+        except TypeError: # unhashable argument
+            return self.MISSING
+        self.entries.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def store(self, key, value):
+        if self.max_size <= 0:
+            return
+        try:
+            self.entries[key] = value
+        except TypeError:
+            return
+        if len(self.entries) > self.max_size:
+            self.entries.popitem(last=False)
+
+    def __repr__(self):
+        return f"MemoCache({self.name}: {self.hits} hits, {self.misses} misses, {len(self.entries)}/{self.max_size} entries)"
+
+class CallPlan:
+    """How calls to a user function bind their arguments, worked out once when the function is defined.
+
+    Parameters take the first slots of the call environment, in order. A call may leave out trailing
+    parameters that have a default; only the defaults of the parameters it leaves out are evaluated.
+    """
+    __slots__ = ("name", "names", "type_ids", "defaults", "min_args", "max_args", "frame_size")
+
+    def __init__(self, function_def):
+        parameters = function_def.parameters
+        self.name = function_def.name
+        self.names = tuple(param.name for param in parameters)
+        self.type_ids = tuple(param.type_id for param in parameters)
+        self.defaults = tuple(param.default_value for param in parameters)
+        self.max_args = len(parameters)
+        # Every parameter up to the last one without a default must be passed.
+        self.min_args = max((i + 1 for i, param in enumerate(parameters) if not param.has_default), default=0)
+        self.frame_size = function_def.frame_size
+
+    def missing_defaults(self, argc: int) -> tuple:
+        """Return the default value nodes of the parameters a call passing `argc` arguments leaves out."""
+        if argc < self.min_args or argc > self.max_args:
+            expected = self.max_args if self.min_args == self.max_args else f"{self.min_args} to {self.max_args}"
+            raise TypeError(f"Argument count mismatch in call to '{self.name}': expected {expected}, got {argc}")
+        return self.defaults[argc:]
+
+    def bind(self, parent: Env, values: list) -> Env:
+        """Return the call environment for a complete list of parameter `values`."""
+        return Env.frame(parent, self.names, list(map(Cell, self.type_ids, values)), self.frame_size)
+
+def counted_range(start: int, bound, inclusive: bool) -> range:
+    """Return the values of i in a counted loop `for (define i int start, i < bound, i++)`, or `i <= bound` if inclusive.
+
+    When the loop finishes, i holds max(range.start, range.stop): the first value that failed the condition.
+    """
+    if not isinstance(bound, int):
+        if not isinstance(bound, float):
+            raise TypeError(f"'{'<=' if inclusive else '<'}' not supported between instances of 'int' and '{type(bound).__name__}'")
+        bound = math.floor(bound) if inclusive else math.ceil(bound)
+    return range(start, bound + 1 if inclusive else bound)
+
+# Arrays of these element types are stored unboxed, in a TypedArray with this array.array type code
+# ('w' replaces the deprecated 'u' for chars from Python 3.13).
+ARRAY_TYPECODES: Dict[str, str] = {
+    "int": "q",
+    "float": "d",
+    "bool": "b",
+    "char": "w" if "w" in typecodes else "u",
+}
+
+class TypedArray(array):
+    """A Gill array of ints, floats, bools or chars, stored unboxed in an array.array buffer.
+
+    A million ints take 8 MB here, instead of the 8 MB of pointers plus 28 MB of int objects a list
+    needs. The buffer converts each value as it is written, raising TypeError for a value of the wrong
+    type, and indexing or iterating reads the stored values directly. Gill arrays have a fixed size,
+    so the methods that would grow or shrink one raise TypeError.
+    """
+    __slots__ = ()
+
+    def __repr__(self):
+        return repr(self.tolist()) # Print like the list it replaces.
+
+    __str__ = __repr__
+
+    def __add__(self, other):
+        return type(self)(self.typecode, array.__add__(self, other))
+
+    def resize(self, *args):
+        raise TypeError("Gill arrays have a fixed size.")
+
+    append = extend = insert = pop = remove = fromlist = frombytes = fromfile = fromunicode = resize
+    __delitem__ = __iadd__ = __imul__ = resize
+
+class BoolArray(TypedArray):
+    """TypedArray of bools, one byte each; reading converts them back from 0 and 1."""
+    __slots__ = ()
+
+    def __getitem__(self, index):
+        return bool(array.__getitem__(self, index))
+
+    def __iter__(self):
+        return map(bool, array.__iter__(self))
+
+    def tolist(self):
+        return list(self)
+
+# Python values that are arrays at runtime, for isinstance checks. Native functions may also return
+# a plain array.array.
+ARRAY_TYPES = (list, array)
+
+def typed_array(values: list, element_type: str):
+    """Return the array elements `values` stored unboxed as a TypedArray of `element_type`, or None if they
+    cannot be: when one of them is not of that type, or an int does not fit in 64 bits.
+
+    The int buffer would convert bools, and the float and bool buffers ints, so for those the values
+    are checked first.
+    """
+    if element_type == "int":
+        if not all(type(value) is int for value in values):
+            return None
+    elif element_type == "float":
+        if not all(isinstance(value, float) for value in values):
+            return None
+    elif element_type == "bool":
+        if not all(isinstance(value, bool) for value in values):
+            return None
+        return BoolArray("b", values)
+    try:
+        return TypedArray(ARRAY_TYPECODES[element_type], values)
+    except (TypeError, OverflowError):
+        return None
+
+def add_values(left, right):
+    """Gill's `+`: string concatenation if either side is a string, numeric addition otherwise."""
+    if isinstance(left, str) or isinstance(right, str):
+        return str(left) + str(right)
+    return left + right
+
+# Binary operators by token name. SCOPERESOP needs the interpreter and is handled there.
+BINARY_OPERATORS: Dict[str, Callable] = {
+    "ADD": add_values,
+    "SUB": operator.sub,
+    "MUL": operator.mul,
+    "DIV": operator.truediv,
+    "FDIV": operator.floordiv,
+    "MOD": operator.mod,
+    "EQ": operator.eq,
+    "NEQ": operator.ne,
+    "LT": operator.lt,
+    "LTE": operator.le,
+    "GT": operator.gt,
+    "GTE": operator.ge,
+    "AND": lambda left, right: bool(left) and bool(right),
+    "OR": lambda left, right: bool(left) or bool(right),
+    "NOT": lambda left, right: not left,
+}
+
+def binary_operator(op: str) -> Callable:
+    """Return the generic implementation of binary operator `op`."""
+    operator = BINARY_OPERATORS.get(op)
+    if operator is None:
+        raise ValueError(f"Unknown operator {op}")
+    return operator
+
+# Number of generic executions after which a BinOpNode is specialised for its operand types.
+QUICKEN_AFTER = 8
+
+# Specialised forms of the binary operators, by (operator, left operand type, right operand type).
+# Each one gives the same result as the generic operator for exactly those types (note that bool
+# is not int here, since the keys are matched with `type(value) is ...`), but skips its checks:
+# int + int is a plain addition, and bool and bool a bitwise and.
+SPECIALIZED_OPERATORS: Dict[tuple, Callable] = {
+    **{(op, left, right): operator.add if op == "ADD" else BINARY_OPERATORS[op]
+       for op in ("ADD", "SUB", "MUL", "DIV", "FDIV", "MOD", "EQ", "NEQ", "LT", "LTE", "GT", "GTE")
+       for left in (int, float) for right in (int, float)},
+    **{(op, str, str): operator.add if op == "ADD" else BINARY_OPERATORS[op]
+       for op in ("ADD", "EQ", "NEQ", "LT", "LTE", "GT", "GTE")},
+    ("EQ", bool, bool): operator.eq,
+    ("NEQ", bool, bool): operator.ne,
+    ("AND", bool, bool): operator.and_,
+    ("OR", bool, bool): operator.or_,
+}
 
 # MemberRef is not meant to be used for developing native modules, but it is used internally by the interpreter to represent references to variables and functions in the environment.
 @dataclass(frozen=True)
@@ -1,10 +1,173 @@
+from array import array
+from collections import deque
+from typing import Dict, List
+
+# Token kinds are small integers indexing KIND_NAMES; a kind is registered the first time a
+# TokenStream stores it.
+KIND_NAMES: List[str] = []
+KIND_IDS: Dict[str, int] = {}
+
+def kind_id(kind: str) -> int:
+    number = KIND_IDS.get(kind)
+    if number is None:
+        number = KIND_IDS[kind] = len(KIND_NAMES)
+        KIND_NAMES.append(kind)
+    return number
 
 class Token:
-    def __init__(self, kind, value, line, column):
+    __slots__ = ("kind", "value", "line", "column", "offset")
+
+    def __init__(self, kind, value, line, column, offset=None):
         self.kind = kind
         self.value = value
         self.line = line
         self.column = column
+        self.offset = offset # Position of the token's first character in the source text.
 
     def __repr__(self):
-        return f"Token<kind:{self.kind}:{self.value} @ {self.line}:{self.column}>"
\ No newline at end of file
+        return f"Token<kind:{self.kind}:{self.value} @ {self.line}:{self.column}>"
+
+# The parser reads tokens through one of the two cursors below. Both expose the current token's
+# kind name as `kind`, move on with advance() (which returns the value of the token it moves past)
+# and look ahead with peek_kind(). `current` and peek() build Token objects, for error messages.
+
+class TokenStream:
+    """Tokens stored column-wise, as produced by Lexer.tokenize.
+
+    Kinds are stored as kind ids, and lines, columns and offsets as array.array buffers. Values are
+    interned in `literals`, so every occurrence of an identifier or literal shares one object and
+    costs one index in `values`. No object is allocated per token; indexing or iterating the stream
+    builds Token views on demand.
+    """
+
+    def __init__(self):
+        self.kinds = array("B")
+        self.values = array("I")
+        self.lines = array("I")
+        self.columns = array("I")
+        self.offsets = array("I")
+        self.literals: list = []
+        self.literal_ids: dict = {}
+        self.position = 0
+        self.kind = None # Kind name of the token at `position`, None past the end.
+
+    def extend(self, tokens):
+        """Append (kind, value, line, column, offset) tuples."""
+        kinds, values, lines, columns, offsets = self.kinds, self.values, self.lines, self.columns, self.offsets
+        literals, literal_ids = self.literals, self.literal_ids
+        kind_ids = KIND_IDS
+        for kind, value, line, column, offset in tokens:
+            number = kind_ids.get(kind)
+            kinds.append(kind_id(kind) if number is None else number)
+            # 1 and 1.0 compare equal but are different literals.
+            key = (value.__class__, value) if kind == "NUMBER" else value
+            literal = literal_ids.get(key)
+            if literal is None:
+                literal = literal_ids[key] = len(literals)
+                literals.append(value)
+            values.append(literal)
+            lines.append(line)
+            columns.append(column)
+            offsets.append(offset)
+        self.seek(self.position)
+
+    def splice(self, start: int, end: int, tokens):
+        """Replace the tokens in [start, end) with (kind, value, line, column, offset) tuples."""
+        replacement = TokenStream()
+        replacement.literals, replacement.literal_ids = self.literals, self.literal_ids
+        replacement.extend(tokens)
+        for buffer in ("kinds", "values", "lines", "columns", "offsets"):
+            getattr(self, buffer)[start:end] = getattr(replacement, buffer)
+        self.seek(min(self.position, len(self.kinds)))
+
+    def shift(self, start: int, offset_delta: int, line_delta: int, column_delta: int):
+        """Move the tokens from `start` on by `offset_delta` characters and `line_delta` lines.
+
+        Tokens on the same line as token `start` also move by `column_delta` columns.
+        """
+        if start >= len(self.kinds):
+            return
+        lines, columns, offsets = self.lines, self.columns, self.offsets
+        if column_delta:
+            line = lines[start]
+            index = start
+            while index < len(lines) and lines[index] == line:
+                columns[index] += column_delta
+                index += 1
+        if line_delta:
+            lines[start:] = array("I", [line + line_delta for line in lines[start:]])
+        if offset_delta:
+            offsets[start:] = array("I", [offset + offset_delta for offset in offsets[start:]])
+
+    def __len__(self):
+        return len(self.kinds)
+
+    def __getitem__(self, index: int) -> Token:
+        return Token(KIND_NAMES[self.kinds[index]], self.literals[self.values[index]], self.lines[index], self.columns[index], self.offsets[index])
+
+    def __iter__(self):
+        for index in range(len(self.kinds)):
+            yield self[index]
+
+    def seek(self, position: int):
+        self.position = position
+        self.kind = KIND_NAMES[self.kinds[position]] if position < len(self.kinds) else None
+
+    @property
+    def current(self) -> Token:
+        return self[self.position] if self.position < len(self.kinds) else None
+
+    def advance(self):
+        position = self.position
+        value = self.literals[self.values[position]]
+        position += 1
+        self.position = position
+        self.kind = KIND_NAMES[self.kinds[position]] if position < len(self.kinds) else None
+        return value
+
+    def peek_kind(self, offset=1) -> str:
+        position = self.position + offset
+        return KIND_NAMES[self.kinds[position]] if position < len(self.kinds) else None
+
+    def peek(self, offset=1) -> Token:
+        position = self.position + offset
+        return self[position] if position < len(self.kinds) else None
+
+class TokenBuffer:
+    """Bounded lookahead over an iterable of Tokens.
+
+    Tokens are pulled from the iterable as the parser advances, and at most `lookahead` of them
+    are held at a time, so a lazily lexed source is never materialized as a list.
+    """
+
+    def __init__(self, tokens, lookahead=2):
+        self.tokens = iter(tokens)
+        self.lookahead = lookahead
+        self.pending = deque()
+        self.current: Token = next(self.tokens, None)
+        self.kind = self.current.kind if self.current else None
+
+    def peek(self, offset=1) -> Token:
+        """The token `offset` positions ahead of the current one, or None past the end."""
+        if offset == 0:
+            return self.current
+        if offset > self.lookahead:
+            raise ValueError(f"Can't look {offset} tokens ahead, the buffer holds {self.lookahead}.")
+        pending = self.pending
+        while len(pending) < offset:
+            token = next(self.tokens, None)
+            if token is None:
+                return None
+            pending.append(token)
+        return pending[offset - 1]
+
+    def peek_kind(self, offset=1) -> str:
+        token = self.peek(offset)
+        return token.kind if token else None
+
+    def advance(self):
+        """Move past the current token and return its value."""
+        value = self.current.value
+        self.current = token = self.pending.popleft() if self.pending else next(self.tokens, None)
+        self.kind = token.kind if token else None
+        return value
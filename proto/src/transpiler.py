@@ -0,0 +1,749 @@
+import sys
+from nodes import *
+from rts import *
+from environment import Env
+from interpreter import Interpreter
+from typing import Callable, Dict, List, Optional
+from resolver import SCOPE_NODES
+
+# Python operators for the Gill binary operators that map onto them one-to-one.
+PYTHON_OPERATORS = {
+    "SUB": "-",
+    "MUL": "*",
+    "DIV": "/",
+    "FDIV": "//",
+    "MOD": "%",
+    "EQ": "==",
+    "NEQ": "!=",
+    "LT": "<",
+    "LTE": "<=",
+    "GT": ">",
+    "GTE": ">=",
+}
+
+# Switches with fewer literal cases than this keep an if/elif chain, which CPython runs faster than
+# a dict lookup followed by a bisection when there are only a few comparisons to make.
+MIN_JUMP_TABLE_CASES = 24
+
+def native_name(module_name, name):
+    return f"n_{module_name}__{name}"
+
+def memoized(memo: MemoCache, function: Callable) -> Callable:
+    """Wrap `function` so calls with arguments already in `memo` return the cached result."""
+    def call(*args):
+        key = memo.key(args)
+        value = memo.lookup(key)
+        if value is MemoCache.MISSING:
+            value = function(*args)
+            memo.store(key, value)
+        return value
+    return call
+
+# Value of the Python variable of a Gill variable or function that its scope has not defined yet.
+UNDEFINED = object()
+
+class TailCall:
+    """Returned by the Python function of a Gill function for a `return exec f(...)` tail call, so the
+    call runs in the trampoline loop of its caller instead of on top of the Python stack."""
+    __slots__ = ("function", "args")
+
+    def __init__(self, function: Callable, args: tuple):
+        self.function = function
+        self.args = args
+
+def trampolined(body: Callable) -> Callable:
+    """Wrap the Python function of a Gill function that makes tail calls, running them in a loop.
+
+    A tail call to another trampolined function runs its `tail_body`, which may return a TailCall
+    in turn, so chains of tail calls take constant stack. Any other callable (an untrampolined or
+    memoized function) is simply called.
+    """
+    def call(*args):
+        result = body(*args)
+        while type(result) is TailCall:
+            function = result.function
+            result = getattr(function, "tail_body", function)(*result.args)
+        return result
+    call.tail_body = body
+    return call
+
+class Frame:
+    """A generated Python function: the names it assigns that belong to enclosing functions or to the module."""
+    __slots__ = ("globals", "nonlocals", "tail_calls")
+
+    def __init__(self):
+        self.globals = set()
+        self.nonlocals = set()
+        self.tail_calls = False
+
+class Scope:
+    """The Python names of the variables and functions of a Gill scope (the program, a function call or
+    a loop) while it is translated.
+
+    Each scope names its variables v<n>_<name> and its functions f<n>_<name>, where <n> numbers the
+    scope (and is empty for the program, whose names are module globals shared by every translation),
+    so they never collide with the names of another scope. A name refers to the innermost scope that
+    has defined it when it runs, like Env.lookup. Until a scope's definition has certainly run, it may
+    still refer to an outer one; the generated code then checks which is defined.
+    """
+    __slots__ = ("tag", "frame", "variables", "functions", "definitions", "defined_variables", "defined_functions", "reset")
+
+    def __init__(self, tag: str, frame: Optional[Frame], variables=()):
+        self.tag = tag
+        self.frame = frame # The Python function holding the names, or None for module globals.
+        self.variables: Dict[str, str] = {}
+        self.functions: Dict[str, str] = {}
+        self.definitions: Dict[str, list] = {} # Function name -> FunctionDefinitionNodes defining it here.
+        # Names certainly defined at the node being translated (None: all of them, for the program,
+        # which has no outer scope to fall back to).
+        self.defined_variables = None if frame is None else set(variables)
+        self.defined_functions = None if frame is None else set()
+        self.reset = set() # Python names set to UNDEFINED when the scope is entered, as a read may come before their definition.
+        for name in variables:
+            self.add_variable(name)
+
+    def add_variable(self, name: str) -> str:
+        python_name = self.variables.get(name)
+        if python_name is None:
+            python_name = self.variables[name] = f"v{self.tag}_{name}"
+        return python_name
+
+    def add_function(self, node: FunctionDefinitionNode) -> str:
+        definitions = self.definitions.setdefault(node.name, [])
+        if node not in definitions:
+            definitions.append(node)
+        python_name = self.functions.get(node.name)
+        if python_name is None:
+            python_name = self.functions[node.name] = f"f{self.tag}_{node.name}"
+        return python_name
+
+    def collect(self, statements):
+        """Name the variables and functions defined directly in this scope (not in nested scopes)."""
+        pending = list(reversed(statements))
+        while pending:
+            node = pending.pop()
+            if isinstance(node, DefineNode):
+                self.add_variable(node.name)
+            elif isinstance(node, FunctionDefinitionNode):
+                self.add_function(node)
+            # Namespaces run on the tree-walker, so what they define has no Python name.
+            if not isinstance(node, (*SCOPE_NODES, NamespaceDefinitionNode)):
+                pending.extend(reversed(list(iter_child_nodes(node))))
+
+class PythonTranspiler(Interpreter):
+    """Execution engine that translates a Gill program into Python source and runs it with compile()/exec().
+
+    Gill variables and functions become Python variables (v_<name>) and functions (f_<name>), loops and
+    branches become Python statements, and `exec module::function(...)` calls are bound at translation
+    time to the NativeFunction.py_impl callable (n_<module>__<function>). CPython then runs the program
+    as ordinary bytecode. Every statement stores its value in `_r` so programs still evaluate to the
+    value of their last statement. Set dump_source to print the generated code to stderr.
+    """
+
+    # Node class -> emit_<NodeName> statement generator / expr_<NodeName> expression generator.
+    statement_emitters: Dict[type, Callable] = {}
+    expression_emitters: Dict[type, Callable] = {}
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        cls.statement_emitters = {}
+        cls.expression_emitters = {}
+
+    def __init__(self, global_env: Env, dump_source: bool = False):
+        super().__init__(global_env)
+        self.dump_source = dump_source
+        self.constants = [] # Values referenced by generated code as _k[index] (nodes, exception classes).
+        self.namespace = {
+            "__builtins__": __builtins__,
+            "_k": self.constants,
+            "_define": self.define_value,
+            "_add": self.add_values,
+            "_array": self.build_array,
+            "_index": self.index_array,
+            "_binop": self.eval_binop,
+            "_cast": self.cast_value,
+            "_interpret": self.interpret,
+            "_out": self.output_value,
+            "_raise": self.raise_error,
+            "_memoize": self.memoize,
+            "_range": counted_range,
+            "_missing": ParameterSpec.NO_DEFAULT, # Stands in for parameters a call leaves out.
+            "_undefined": UNDEFINED,
+            "_TailCall": TailCall,
+            "_trampoline": trampolined,
+        }
+        self.lines: list[str] = []
+        self.indent = 0
+        self.temp_count = 0
+        self.scope_count = 0
+        self.program_scope = Scope("", None) # Persists between translations, like the global environment.
+        self.scopes: List[Scope] = [self.program_scope] # Innermost last.
+        self.frame = Frame() # The Python function being generated.
+        self.last_source = None
+
+    def run(self, program):
+        self.resolve(program) # Keeps nodes run through the tree-walker fallback consistent with the global environment.
+        source = self.translate(program)
+        if self.dump_source:
+            print(f"# --- generated Python ---\n{source}# --- end of generated Python ---", file=sys.stderr)
+        code = compile(source, "<gill>", "exec")
+        exec(code, self.namespace)
+        return self.namespace["__gill_program__"]()
+
+    def translate(self, program: BlockNode) -> str:
+        """Translate `program` into the source of a Python module defining __gill_program__()."""
+        self.lines = []
+        self.indent = 0
+        self.scopes = [self.program_scope]
+        self.frame = Frame()
+        statements = program.statements if isinstance(program, BlockNode) else [program]
+        self.program_scope.collect(statements)
+
+        self.line("def __gill_program__():")
+        self.indent += 1
+        # Top-level names are module globals so functions and later REPL lines can see them.
+        declarations = self.placeholder()
+        self.line("_r = None")
+        self.emit_statements(statements, "_r")
+        self.line("return _r")
+        self.fill(declarations, self.declarations(self.frame))
+        self.indent -= 1
+
+        self.last_source = "\n".join(line for line in self.lines if line) + "\n"
+        return self.last_source
+
+    ###
+    ### # Runtime helpers called from generated code
+    ###
+
+    def define_value(self, value, declared_type):
+        if isinstance(value, ARRAY_TYPES):
+            return self.define_array(value, declared_type)
+        if not self.check_type(value, declared_type):
+            raise TypeError(f"Type mismatch: Expected {declared_type}, got {type(value).__name__}")
+        return value
+
+    def add_values(self, left, right):
+        if isinstance(left, str) or isinstance(right, str):
+            return str(left) + str(right)
+        return left + right
+
+    def build_array(self, values, element_type):
+        typed = typed_array(values, element_type)
+        return values if typed is None else typed
+
+    def index_array(self, array, index, array_name):
+        if not isinstance(array, ARRAY_TYPES):
+            raise TypeError(f"Variable '{array_name}' is not an array.")
+        elif not isinstance(index, int):
+            raise TypeError(f"Array index must be an integer, got {type(index).__name__}.")
+        elif index < 0 or index >= len(array):
+            raise IndexError(f"Array index {index} out of bounds for array '{array_name}' of size {len(array)}.")
+        return array[index]
+
+    def output_value(self, value):
+        print(value)
+        return value
+
+    def raise_error(self, error, *evaluated):
+        # `evaluated` are the values of the expressions to evaluate before the error, like the arguments of a call.
+        raise error
+
+    def memoize(self, function_def: FunctionDefinitionNode, function: Callable) -> Callable:
+        function_def.memo = MemoCache(function_def.name)
+        return memoized(function_def.memo, function)
+
+    def interpret(self, node):
+        # Nodes without a Python translation run on the tree-walker against the global environment.
+        return self.escape_return(self.visit(node))
+
+    ###
+    ### # Code generation helpers
+    ###
+
+    def line(self, text):
+        self.lines.append("    " * self.indent + text)
+
+    def placeholder(self) -> tuple:
+        """Reserve the current line for lines only known later (see fill)."""
+        self.lines.append("")
+        return len(self.lines) - 1, self.indent
+
+    def fill(self, placeholder: tuple, lines: List[str]):
+        index, indent = placeholder
+        self.lines[index] = "\n".join("    " * indent + line for line in lines)
+
+    def constant(self, value) -> str:
+        self.constants.append(value)
+        return f"_k[{len(self.constants) - 1}]"
+
+    def temp(self) -> str:
+        self.temp_count += 1
+        return f"_t{self.temp_count}"
+
+    def lookup_emitter(self, table, prefix, node_type):
+        if node_type not in table:
+            emitter = None
+            for klass in node_type.__mro__:
+                emitter = getattr(type(self), f"{prefix}{klass.__name__}", None)
+                if emitter is not None:
+                    break
+            table[node_type] = emitter # None means "no translation", which is cached too.
+        return table[node_type]
+
+    def emit_statements(self, statements, result):
+        """Emit `statements`, storing the value of each one in the variable named `result`."""
+        if not statements:
+            self.line(f"{result} = None")
+        for stmt in statements:
+            self.emit_statement(stmt, result)
+
+    def emit_statement(self, node, result):
+        emitter = self.lookup_emitter(self.statement_emitters, "emit_", node.__class__)
+        if emitter is not None:
+            emitter(self, node, result)
+        else:
+            self.line(f"{result} = {self.expr(node)}")
+
+    def expr(self, node) -> str:
+        """Return a Python expression evaluating `node`."""
+        emitter = self.lookup_emitter(self.expression_emitters, "expr_", node.__class__)
+        if emitter is not None:
+            return emitter(self, node)
+        return f"_interpret({self.constant(node)})"
+
+    def block(self, node, result):
+        scope = self.scopes[-1]
+        if scope.defined_variables is not None:
+            defined = set(scope.defined_variables), set(scope.defined_functions)
+        self.indent += 1
+        if isinstance(node, BlockNode):
+            self.emit_statements(node.statements, result)
+        elif node is None:
+            self.line(f"{result} = None")
+        else:
+            self.emit_statement(node, result)
+        self.indent -= 1
+        if scope.defined_variables is not None:
+            # The block may not run, so what it defines is only certain until its end.
+            scope.defined_variables, scope.defined_functions = defined
+
+    ###
+    ### # Scopes
+    ###
+
+    def enter_scope(self, frame: Frame, variables: List[str], statements) -> Scope:
+        self.scope_count += 1
+        scope = Scope(str(self.scope_count), frame, variables)
+        scope.collect(statements)
+        self.scopes.append(scope)
+        return scope
+
+    def leave_scope(self):
+        self.scopes.pop()
+
+    def resolve_name(self, name: str, functions: bool = False) -> list:
+        """Return the (scope, Python name) pairs the variable (or function) `name` may refer to here, innermost first.
+
+        The first is the innermost scope that defines `name`. If its definition may not have run yet,
+        the name can still refer to an outer one, up to the scope where the definition certainly ran;
+        the generated code takes the first one that is not UNDEFINED.
+        """
+        candidates = []
+        for scope in reversed(self.scopes):
+            python_name = (scope.functions if functions else scope.variables).get(name)
+            if python_name is not None:
+                candidates.append((scope, python_name))
+                defined = scope.defined_functions if functions else scope.defined_variables
+                if defined is None or name in defined:
+                    break
+        else:
+            # Not defined by any scope yet: a global, which a later program may define.
+            candidates.append((self.program_scope, f"{'f' if functions else 'v'}_{name}"))
+        for scope, python_name in candidates[:-1]:
+            scope.reset.add(python_name)
+        return candidates
+
+    def read(self, name: str) -> str:
+        """Return a Python expression reading the variable `name`."""
+        *uncertain, (_, expression) = self.resolve_name(name)
+        for _, python_name in reversed(uncertain):
+            expression = f"({python_name} if {python_name} is not _undefined else {expression})"
+        return expression
+
+    def emit_store(self, name: str, statements: Callable[[str], List[str]]):
+        """Emit `statements(python_name)` for the variable `name` that is currently defined."""
+        candidates = self.resolve_name(name)
+        for scope, python_name in candidates:
+            self.declare_write(scope, python_name)
+        if len(candidates) == 1:
+            for line in statements(candidates[0][1]):
+                self.line(line)
+            return
+        keyword = "if"
+        for _, python_name in candidates[:-1]:
+            self.line(f"{keyword} {python_name} is not _undefined:")
+            for line in statements(python_name):
+                self.line(f"    {line}")
+            keyword = "elif"
+        self.line("else:")
+        for line in statements(candidates[-1][1]):
+            self.line(f"    {line}")
+
+    def declare_write(self, scope: Scope, python_name: str):
+        """Note that the current Python function assigns `python_name`, a name of `scope`."""
+        if scope.frame is None:
+            self.frame.globals.add(python_name)
+        elif scope.frame is not self.frame:
+            self.frame.nonlocals.add(python_name)
+
+    def declarations(self, frame: Frame) -> List[str]:
+        lines = []
+        if frame.globals:
+            lines.append(f"global {', '.join(sorted(frame.globals))}")
+        if frame.nonlocals:
+            lines.append(f"nonlocal {', '.join(sorted(frame.nonlocals))}")
+        return lines
+
+    def resets(self, scope: Scope) -> List[str]:
+        return [f"{' = '.join(sorted(scope.reset))} = _undefined"] if scope.reset else []
+
+    def call(self, node: FunctionCallNode, args: List[str]) -> str:
+        """Return a Python expression calling the Gill function that `node` calls."""
+        if node.tail_call:
+            self.frame.tail_calls = True
+        *uncertain, (scope, python_name) = self.resolve_name(node.name, functions=True)
+        expression = self.call_function(scope, python_name, node, args)
+        for scope, python_name in reversed(uncertain):
+            expression = f"({self.call_function(scope, python_name, node, args)} if {python_name} is not _undefined else {expression})"
+        return expression
+
+    def call_function(self, scope: Scope, python_name: str, node: FunctionCallNode, args: List[str]) -> str:
+        """Return a call of the function `python_name` of `scope` that also passes the defaults of the
+        parameters the call leaves out, evaluated here, in the caller's scope (see rts.CallPlan).
+
+        If the scope defines the function more than once, the defaults are those of the definition
+        that ran last, which the function's `gill_node` tells. A call passing a number of arguments the
+        definition does not accept raises the same TypeError as in the other engines, once the
+        arguments are evaluated.
+        """
+        calls = []
+        for definition in scope.definitions.get(node.name, ()):
+            try:
+                defaults = [self.expr(default) for default in CallPlan(definition).missing_defaults(len(args))]
+            except TypeError as error:
+                calls.append((definition, f"_raise({self.constant(error)}{''.join(', ' + arg for arg in args)})"))
+                continue
+            calls.append((definition, self.call_expression(python_name, args + defaults, node.tail_call)))
+        if not calls: # Defined by a later program, so its defaults are evaluated by the function (see emit_FunctionDefinitionNode).
+            return self.call_expression(python_name, args, node.tail_call)
+        expression = calls[-1][1]
+        for definition, call in reversed(calls[:-1]):
+            if call != expression:
+                expression = f"({call} if {python_name}.gill_node is {self.constant(definition)} else {expression})"
+        return expression
+
+    def call_expression(self, python_name: str, args: List[str], tail_call: bool) -> str:
+        if tail_call:
+            # Run by the trampoline of the calling function (see trampolined).
+            return f"_TailCall({python_name}, ({''.join(arg + ', ' for arg in args)}))"
+        return f"{python_name}({', '.join(args)})"
+
+    def is_string_expr(self, node):
+        return isinstance(node, (StringNode, CharNode)) or (isinstance(node, CastNode) and node.target_type.lower() in ("string", "char"))
+
+    def is_number_expr(self, node):
+        if isinstance(node, NumberNode):
+            return True
+        if isinstance(node, CastNode):
+            return node.target_type.lower() in ("int", "float")
+        if isinstance(node, BinOpNode) and node.op in ("ADD", "SUB", "MUL", "DIV", "FDIV", "MOD"):
+            return self.is_number_expr(node.left) and self.is_number_expr(node.right)
+        return False
+
+    ###
+    ### # Expressions
+    ###
+
+    def expr_NoneType(self, node):
+        return "None"
+
+    def expr_NumberNode(self, node: NumberNode):
+        return repr(node.value)
+
+    def expr_StringNode(self, node: StringNode):
+        return repr(node.value)
+
+    def expr_CharNode(self, node: CharNode):
+        return repr(node.value)
+
+    def expr_BooleanNode(self, node: BooleanNode):
+        if node.value in ("true", "false"):
+            return repr(self.eval_boolean(node.value))
+        return f"_interpret({self.constant(node)})"
+
+    def expr_CastNode(self, node: CastNode):
+        target_type = node.target_type.lower()
+        value = self.expr(node.expression)
+        if target_type == "int":
+            return f"int({value})"
+        elif target_type == "float":
+            return f"float({value})"
+        elif target_type == "string":
+            return f"str({value})"
+        elif target_type == "bool":
+            return f"bool({value})"
+        return f"_cast({value}, {target_type!r})"
+
+    def expr_IdentifierNode(self, node: IdentifierNode):
+        return self.read(node.name)
+
+    def expr_BinOpNode(self, node: BinOpNode):
+        left = self.expr(node.left)
+        right = self.expr(node.right)
+        op = node.op
+
+        if op == "ADD":
+            if self.is_number_expr(node.left) and self.is_number_expr(node.right):
+                return f"({left} + {right})"
+            if self.is_string_expr(node.left) or self.is_string_expr(node.right):
+                return f"(str({left}) + str({right}))"
+            return f"_add({left}, {right})"
+        elif op in PYTHON_OPERATORS:
+            return f"({left} {PYTHON_OPERATORS[op]} {right})"
+        elif op == "AND":
+            return f"(bool({left}) & bool({right}))" # '&' evaluates both operands, like the tree-walker.
+        elif op == "OR":
+            return f"(bool({left}) | bool({right}))"
+        return f"_binop({left}, {op!r}, {right})"
+
+    def expr_UnaryOpNode(self, node: UnaryOpNode):
+        if node.op == "NOT":
+            return f"(not {self.expr(node.operand)})"
+        return f"_interpret({self.constant(node)})"
+
+    def expr_OutputNode(self, node: OutputNode):
+        return f"_out({self.expr(node.expression)})"
+
+    def expr_FunctionCallNode(self, node: FunctionCallNode):
+        arguments = [self.expr(arg) for arg in node.arguments]
+        if not node.module_name:
+            return self.call(node, arguments)
+        args = ", ".join(arguments)
+
+        # Module functions are resolved now and called directly through their Python implementation.
+        module_env = self.global_env.modules.get(node.module_name)
+        if module_env is None:
+            error = self.constant(NameError(f"Module '{node.module_name}' not found."))
+        elif node.name not in module_env.functions:
+            error = self.constant(NameError(f"Function '{node.name}' not found in module '{node.module_name}'."))
+        elif not isinstance(module_env.functions[node.name], NativeFunction):
+            return f"_interpret({self.constant(node)})"
+        else:
+            bound_name = native_name(node.module_name, node.name)
+            function_obj = module_env.functions[node.name]
+            self.namespace[bound_name] = function_obj.py_impl if function_obj.memo is None else memoized(function_obj.memo, function_obj.py_impl)
+            return f"{bound_name}({args})"
+        return f"_raise({error})"
+
+    def expr_ArrayNode(self, node: ArrayNode):
+        if len(node.elements) != node.size: # This should not execute... as this error is caught during parsing.
+            error = self.constant(ValueError(f"Array size mismatch: expected {node.size}, got {len(node.elements)}"))
+            return f"_raise({error})"
+        values = f"[{', '.join(self.expr(elem) for elem in node.elements)}]"
+        if node.element_type in ARRAY_TYPECODES:
+            return f"_array({values}, {node.element_type!r})"
+        return values
+
+    def expr_ArrayAccessNode(self, node: ArrayAccessNode):
+        return f"_index({self.read(node.array_name)}, {self.expr(node.index)}, {node.array_name!r})"
+
+    ###
+    ### # Statements
+    ###
+
+    def emit_DefineNode(self, node: DefineNode, result):
+        value = self.expr(node.value)
+        if not node.type_checked:
+            value = f"_define({value}, {node.type_!r})"
+        scope = self.scopes[-1]
+        python_name = scope.add_variable(node.name)
+        self.declare_write(scope, python_name)
+        self.line(f"{python_name} = {result} = {value}")
+        if scope.defined_variables is not None:
+            scope.defined_variables.add(node.name)
+
+    def emit_AssignNode(self, node: AssignNode, result):
+        value = self.expr(node.value)
+        candidates = self.resolve_name(node.name)
+        if len(candidates) == 1:
+            self.declare_write(*candidates[0])
+            self.line(f"{candidates[0][1]} = {result} = {value}")
+            return
+        self.line(f"{result} = {value}")
+        self.emit_store(node.name, lambda name: [f"{name} = {result}"])
+
+    def emit_IncNode(self, node: IncNode, result):
+        self.emit_store(node.identifier, lambda name: [f"{name} += 1", f"{result} = {name}"])
+
+    def emit_DecNode(self, node: DecNode, result):
+        self.emit_store(node.identifier, lambda name: [f"{name} -= 1", f"{result} = {name}"])
+
+    def emit_OutputNode(self, node: OutputNode, result):
+        self.line(f"{result} = {self.expr(node.expression)}")
+        self.line(f"print({result})")
+
+    def emit_BlockNode(self, node: BlockNode, result):
+        self.emit_statements(node.statements, result)
+
+    def emit_IfBlockNode(self, node: IfBlockNode, result):
+        self.line(f"if {self.expr(node.condition)}:")
+        self.block(node.true_block, result)
+        self.line("else:")
+        self.block(node.false_block if node.false_block else None, result)
+
+    def emit_SwitchCaseBlockNode(self, node: SwitchCaseBlockNode, result):
+        value = self.temp()
+        self.line(f"{value} = {self.expr(node.expression)}")
+        default_body = node.default_block.body if node.default_block else None
+        if not node.cases:
+            self.emit_statements(default_body.statements if default_body else [], result)
+            return
+        table, end = switch_jump_table(node)
+        if end < MIN_JUMP_TABLE_CASES:
+            end = 0
+        keyword = "if"
+        if end:
+            # The literal cases are found by looking the value up in the jump table, and the case
+            # index is then narrowed down by bisection instead of comparing the value with each case.
+            index = self.temp()
+            self.line("try:")
+            self.line(f"    {index} = {self.constant(table)}.get({value}, -1)")
+            self.line("except TypeError: # Unhashable values (arrays) are not equal to any literal.")
+            self.line(f"    {index} = -1")
+            self.line(f"if {index} >= 0:")
+            self.emit_case_search(index, node.cases, 0, end, result)
+            keyword = "elif"
+        for case in node.cases[end:]:
+            self.line(f"{keyword} {value} == {self.expr(case.case_value)}:")
+            self.block(case.body, result)
+            keyword = "elif"
+        self.line("else:")
+        self.block(default_body, result)
+
+    def emit_case_search(self, index, cases, low, high, result):
+        """Emit a block that runs the body of the case at position `index`, known to be in [low, high)."""
+        if high - low == 1:
+            self.block(cases[low].body, result)
+            return
+        middle = (low + high) // 2
+        self.indent += 1
+        self.line(f"if {index} < {middle}:")
+        self.emit_case_search(index, cases, low, middle, result)
+        self.line("else:")
+        self.emit_case_search(index, cases, middle, high, result)
+        self.indent -= 1
+
+    def emit_TryCatchNode(self, node: TryCatchNode, result):
+        self.line("try:")
+        self.block(node.try_block, result)
+        self.line(f"except {self.constant(node.catch_exception)}:")
+        self.block(node.catch_block, result)
+        if node.finally_block:
+            # The finally block runs for its effects only, so its values go to a throwaway variable.
+            self.line("finally:")
+            self.block(node.finally_block, "_")
+
+    def emit_WhileLoopNode(self, node: WhileLoopNode, result):
+        self.line(f"while {self.expr(node.condition)}:")
+        self.block(node.body, "_")
+        self.line(f"{result} = None")
+
+    def emit_ForLoopNode(self, node: ForLoopNode, result):
+        # The loop's scope is new each time the loop runs, so its variables are reset first.
+        reset = self.placeholder()
+        scope = self.enter_scope(self.frame, [node.initializer], [node.condition, node.body, node.increment])
+        counter = scope.variables[node.initializer]
+        self.line(f"{counter} = {node.initializer_value!r}")
+        if node.counted:
+            # The bound can't change while the loop runs, so the loop becomes a Python for over a range.
+            steps = self.temp()
+            self.line(f"{steps} = _range({node.initializer_value!r}, {self.expr(node.condition.right)}, {node.condition.op == 'LTE'})")
+            self.line(f"for {counter} in {steps}:")
+            self.block(node.body, "_")
+            self.line(f"{counter} = max({steps}.start, {steps}.stop)")
+        else:
+            self.line(f"while {self.expr(node.condition)}:")
+            self.block(node.body, "_")
+            self.indent += 1
+            self.emit_statement(node.increment, "_")
+            self.indent -= 1
+        self.fill(reset, self.resets(scope))
+        self.leave_scope()
+        self.line(f"{result} = None")
+
+    def emit_ForEachLoopNode(self, node: ForEachLoopNode, result):
+        reset = self.placeholder()
+        scope = self.enter_scope(self.frame, [node.iterator], [node.iterable, node.body])
+        iterator = scope.variables[node.iterator]
+        self.line(f"{iterator} = None") # Defined before the iterable is evaluated, like in the tree-walker.
+        # Errors raised anywhere in the loop are re-raised as a RuntimeError, like the tree-walker does.
+        self.line("try:")
+        self.indent += 1
+        self.line(f"for {iterator} in {self.expr(node.iterable)}:")
+        self.block(node.body, "_")
+        self.indent -= 1
+        self.line("except Exception as _e:")
+        self.indent += 1
+        self.line(f"raise RuntimeError(f\"Error during foreach loop: {{_e}}\\n{{{self.constant(node.iterable)}}}\")")
+        self.indent -= 1
+        self.fill(reset, self.resets(scope))
+        self.leave_scope()
+        self.line(f"{result} = None")
+
+    def emit_FunctionDefinitionNode(self, node: FunctionDefinitionNode, result):
+        scope = self.scopes[-1]
+        python_name = scope.add_function(node)
+        self.declare_write(scope, python_name)
+        if scope.defined_functions is not None:
+            scope.defined_functions.add(node.name) # Before the body, which may call it.
+        # Calls pass the defaults of the parameters they leave out, evaluated in the caller's scope
+        # (see call_function). Only calls translated before the function was known leave them out,
+        # and for those the function evaluates them in the scope it is defined in.
+        plan = CallPlan(node)
+        fallbacks = [self.expr(default) for default in plan.defaults[plan.min_args:]]
+
+        outer = self.frame
+        frame = self.frame = Frame()
+        function_scope = self.enter_scope(frame, [param.name for param in node.parameters], node.body.statements)
+        parameters = [function_scope.variables[param.name] for param in node.parameters]
+        signature = [name if i < plan.min_args else f"{name}=_missing" for i, name in enumerate(parameters)]
+        self.line(f"def {python_name}({', '.join(signature)}):")
+        self.indent += 1
+        prologue = self.placeholder()
+        for name, default in zip(parameters[plan.min_args:], fallbacks):
+            self.line(f"if {name} is _missing:")
+            self.line(f"    {name} = {default}")
+        self.line("_r = None")
+        self.emit_statements(node.body.statements, "_r")
+        self.line("return _r")
+        self.fill(prologue, self.declarations(frame) + self.resets(function_scope))
+        self.indent -= 1
+        self.leave_scope()
+        self.frame = outer
+
+        if frame.tail_calls:
+            self.line(f"{python_name} = _trampoline({python_name})")
+        if node.pure:
+            # Calls with the same arguments, recursive ones included, go through the cache.
+            self.line(f"{python_name} = _memoize({self.constant(node)}, {python_name})")
+        self.line(f"{python_name}.gill_node = {self.constant(node)}")
+        self.line(f"{result} = None")
+
+    def emit_ReturnNode(self, node: ReturnNode, result):
+        self.line(f"return {self.expr(node.expression)}")
+
+    def emit_ImportNode(self, node: ImportNode, result):
+        # Modules are loaded while translating so their native functions can be bound directly.
+        self.visit(node)
+        self.line(f"{result} = None")
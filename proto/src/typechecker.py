@@ -0,0 +1,532 @@
+from nodes import *
+from rts import CallPlan, NativeFunction, ParameterSpec
+from typing import Callable, Dict, List, Optional
+
+### Static types
+# The checker describes values by the declared type names ("int", "float", "string", "char",
+# "bool", "void"), with "[]" appended for arrays. A "char" is a string of length 1, so it is also
+# a "string", and an "int" variable may hold true or false, since check_type accepts those for int.
+# None is a type the checker could not work out; values of that type are checked at runtime.
+
+# Static types whose values always pass Interpreter.check_type for a declared type, and those
+# whose values only pass for some values.
+ALWAYS_ACCEPTED = {
+    "int": ("int", "bool"),
+    "float": ("float",),
+    "string": ("string", "char"),
+    "char": ("char",),
+    "bool": ("bool",),
+    "void": ("void",),
+}
+SOMETIMES_ACCEPTED = {
+    "char": ("string",),
+    "bool": ("int",),
+}
+
+# Native functions are plain Python functions, so their ParameterSpec types are read the way Python
+# reads annotations: an int is also a valid float (PEP 484's numeric tower). Other spec types, such
+# as "var", accept anything.
+NATIVE_ACCEPTED = {
+    "int": ("int", "bool"),
+    "float": ("int", "float", "bool"),
+    "string": ("string", "char"),
+    "char": ("char",),
+    "bool": ("bool",),
+}
+
+NUMBER_TYPES = ("int", "float", "bool")
+STRING_TYPES = ("string", "char")
+BOOLEAN_OPERATORS = ("EQ", "NEQ", "LT", "LTE", "GT", "GTE", "AND", "OR")
+ARITHMETIC_OPERATORS = ("ADD", "SUB", "MUL", "FDIV", "MOD")
+CAST_TYPES = {"int": "int", "float": "float", "string": "string", "char": "char", "bool": "bool", "void": "void"}
+
+# Nodes that can contain statements of the same scope. Definitions are statements, so the other
+# nodes (expressions) are not searched for them.
+STATEMENT_NODES = (BlockNode, IfBlockNode, SwitchCaseBlockNode, CaseBlockNode, DefaultBlockNode, TryCatchNode, WhileLoopNode, NamespaceDefinitionNode)
+
+AMBIGUOUS = object() # A function name defined more than once in the same scope.
+
+def accepts(declared: str, actual: Optional[str]) -> Optional[bool]:
+    """Return True if values of static type `actual` always have the `declared` type, False if they never do,
+    and None if it depends on the value.
+    """
+    if actual is None:
+        return None
+    if declared.endswith("[]") or actual.endswith("[]"):
+        if declared.endswith("[]") and actual.endswith("[]"):
+            return accepts(declared[:-2], actual[:-2])
+        return False
+    if declared not in ALWAYS_ACCEPTED:
+        return None
+    if actual in ALWAYS_ACCEPTED[declared]:
+        return True
+    if actual in SOMETIMES_ACCEPTED.get(declared, ()):
+        return None
+    return False
+
+def native_accepts(spec_type: str, actual: Optional[str]) -> Optional[bool]:
+    """Like accepts(), for an argument passed to a NativeFunction parameter declared as `spec_type`."""
+    if actual is None:
+        return None
+    accepted = NATIVE_ACCEPTED.get(spec_type)
+    if accepted is None or actual in accepted:
+        return True
+    return None if actual in SOMETIMES_ACCEPTED.get(spec_type, ()) else False
+
+def binop_type(op: str, left: Optional[str], right: Optional[str]) -> Optional[str]:
+    """Static type of `left op right` (see rts.BINARY_OPERATORS)."""
+    if op in BOOLEAN_OPERATORS:
+        return "bool"
+    if op == "ADD" and (left in STRING_TYPES or right in STRING_TYPES):
+        return "string" # `+` turns both sides into strings if either is one.
+    if left in NUMBER_TYPES and right in NUMBER_TYPES:
+        if op == "DIV":
+            return "float"
+        if op in ARITHMETIC_OPERATORS:
+            return "float" if "float" in (left, right) else "int"
+    elif op == "ADD" and left == right and left is not None and left.endswith("[]"):
+        return left
+    elif op == "MUL" and {left, right} in ({"string", "int"}, {"char", "int"}):
+        return "string"
+    return None
+
+def element_type(iterable: Optional[str]) -> Optional[str]:
+    """Static type of the items a foreach loop gets from an iterable of static type `iterable`."""
+    if iterable in STRING_TYPES:
+        return "char"
+    if iterable is not None and iterable.endswith("[]"):
+        return iterable[:-2]
+    return None
+
+def always_returns(node) -> bool:
+    """Return True if every run of the statement `node` ends in a `return` (so it never falls off the end)."""
+    if isinstance(node, ReturnNode):
+        return True
+    if isinstance(node, BlockNode):
+        return any(always_returns(statement) for statement in node.statements)
+    if isinstance(node, IfBlockNode):
+        return node.false_block is not None and always_returns(node.true_block) and always_returns(node.false_block)
+    return False
+
+class TypeChecker:
+    """Static pass that infers the types of expressions and checks them against declared types before a program runs.
+
+    Variables have the type they are declared with (by `define`, a parameter or a for loop), and a
+    function call has the declared return type of the function. Those are assumptions at first:
+    a variable keeps its type only while every value written to it is proven to have that type,
+    and a function only while every `return` in it is proven to return its type and it cannot
+    finish without one. Whatever is not proven is forgotten (its type becomes None) and the
+    program is checked again, until no assumption changes. What is left holds on every run.
+
+    Values that can never have the type they are given (a string defined as an int, an argument
+    of the wrong type, ...) are reported together as a TypeError before anything runs. DefineNodes
+    whose value is proven to have the declared type are marked `type_checked`, and the engines
+    skip their runtime check_type.
+
+    Like the resolver, scopes follow the environments the engines create, and the program scope
+    persists between calls to check(). A name refers to the variable or function of an inner scope
+    only once its definition has certainly run there; until then the engines may find an outer one,
+    so the name can refer to either. If a later call forgets something an earlier one relied
+    on, everything learned before is forgotten and the marks made before are removed.
+    """
+
+    # Same shape as Interpreter.handlers, mapping node classes to check_<NodeName> methods.
+    checkers: Dict[type, Callable] = {}
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        cls.checkers = {}
+
+    def __init__(self, load_module: Callable = None):
+        # Returns a ModuleEnv for the native function signatures of an imported module. It must not import
+        # the module into the program, which only happens when the import runs.
+        self.load_module = load_module
+        self.modules: Dict[str, object] = {} # Only used for signatures.
+        self.types: Dict[tuple, Optional[str]] = {} # (scope, name) -> static type of the variable.
+        self.functions: Dict[object, Dict[str, object]] = {"program": {}} # scope -> name -> FunctionDefinitionNode or AMBIGUOUS.
+        self.returns: Dict[FunctionDefinitionNode, Optional[str]] = {} # Static type of the value a call to the function returns.
+        self.collected = set() # Function and loop nodes whose scope has been collected.
+        self.scopes: List[object] = ["program"] # Innermost last: "program", or the function or loop node.
+        # For each scope in self.scopes, the names of the variables and functions it has certainly
+        # defined at the node being checked (None for the program scope, which has no outer scope).
+        self.defined_variables: List[Optional[set]] = [None]
+        self.defined_functions: List[Optional[set]] = [None]
+        self.function: FunctionDefinitionNode = None # Function whose body is being checked.
+        self.fresh = set() # Variables and functions first seen by the current call to check().
+        self.marked = set() # Marked nodes in function bodies, which can run again after the program that defines them.
+        self.changed = False # Set when an assumption is forgotten, so the program is checked again.
+        self.errors: List[str] = []
+
+    def check(self, program: BlockNode):
+        """Check `program`, raising a TypeError that lists every type error found, and mark the nodes proven to be well typed."""
+        self.fresh = set()
+        self.collect("program", program.statements)
+        # Every round marks and reports what holds under the current assumptions, so the last one,
+        # which changes none of them, leaves the final marks and errors.
+        self.changed = True
+        while self.changed:
+            self.changed = False
+            self.errors = []
+            self.visit(program)
+        if self.errors:
+            raise TypeError("\n".join(self.errors))
+
+    def visit(self, node) -> Optional[str]:
+        if node is None:
+            return None
+        checker = self.checkers.get(node.__class__)
+        if checker is None:
+            checker = self.resolve_checker(node.__class__)
+        return checker(self, node)
+
+    @classmethod
+    def resolve_checker(cls, node_type: type) -> Callable:
+        """Find the checker for `node_type` by walking its MRO and cache it in the checker table."""
+        checker = cls.generic_check
+        for klass in node_type.__mro__:
+            method = getattr(cls, f"check_{klass.__name__}", None)
+            if method is not None:
+                checker = method
+                break
+        cls.checkers[node_type] = checker
+        return checker
+
+    def generic_check(self, node) -> Optional[str]:
+        for child in iter_child_nodes(node):
+            self.visit(child)
+        return None
+
+    ###
+    ### # Assumptions
+    ###
+
+    def collect(self, scope, statements):
+        """Assume the declared types of the variables and functions defined directly in `scope`."""
+        functions = self.functions.setdefault(scope, {})
+        pending = list(reversed(statements))
+        while pending:
+            node = pending.pop()
+            if isinstance(node, DefineNode):
+                self.assume((scope, node.name), f"{node.type_}[]" if isinstance(node.value, ArrayNode) else node.type_)
+            elif isinstance(node, FunctionDefinitionNode):
+                defined = functions.get(node.name)
+                if defined is None:
+                    functions[node.name] = node
+                    if node not in self.returns:
+                        self.returns[node] = node.return_type
+                        self.fresh.add(node)
+                elif defined is not node:
+                    # Calls to an ambiguous name are not checked, so neither definition knows its arguments.
+                    self.forget_parameters(node)
+                    if defined is not AMBIGUOUS:
+                        functions[node.name] = AMBIGUOUS
+                        self.forget_parameters(defined)
+                        if defined not in self.fresh:
+                            self.forget_all()
+            elif isinstance(node, STATEMENT_NODES):
+                pending.extend(reversed(list(iter_child_nodes(node))))
+
+    def assume(self, key: tuple, type_: Optional[str]):
+        """Assume variable `key` has `type_`, or forget its type if it was assumed to have another."""
+        if key not in self.types:
+            self.types[key] = type_
+            self.fresh.add(key)
+        elif self.types[key] != type_:
+            self.forget(key)
+
+    def forget(self, key):
+        """Forget the type of variable `key`, or the return type of a function."""
+        known = self.returns if isinstance(key, FunctionDefinitionNode) else self.types
+        if key not in known: # A parameter may be forgotten before its function is collected.
+            self.fresh.add(key)
+        elif known[key] is None:
+            return
+        elif key not in self.fresh:
+            self.forget_all()
+        known[key] = None
+        self.changed = True
+
+    def forget_parameters(self, function: FunctionDefinitionNode):
+        for param in function.parameters:
+            self.forget((function, param.name))
+
+    def forget_all(self):
+        """Forget every type learned by earlier calls to check() and remove the marks they made."""
+        for known in (self.types, self.returns):
+            for key in known:
+                if key not in self.fresh:
+                    known[key] = None
+        for node in self.marked:
+            node.type_checked = False
+        self.marked.clear()
+        self.changed = True
+
+    def variables(self, name: str) -> List[tuple]:
+        """Return the keys of the variables `name` can refer to here, innermost first.
+
+        That is the innermost scope that defines `name`, and if its define may not have run yet,
+        the scopes around it up to one where it has (an empty list if no scope defines `name`).
+        """
+        keys = []
+        for scope, defined in zip(reversed(self.scopes), reversed(self.defined_variables)):
+            if (scope, name) in self.types:
+                keys.append((scope, name))
+                if defined is None or name in defined:
+                    break
+        return keys
+
+    def variable_type(self, name: str) -> Optional[str]:
+        """Return the static type of a read of the variable `name`, or None if it is not known."""
+        types = {self.types[key] for key in self.variables(name)}
+        return types.pop() if len(types) == 1 else None
+
+    def lookup_functions(self, name: str) -> list:
+        """Return the FunctionDefinitionNodes (or AMBIGUOUS) a call to `name` can run, innermost first,
+        following the same rule as variables()."""
+        functions = []
+        for scope, defined in zip(reversed(self.scopes), reversed(self.defined_functions)):
+            function = self.functions.get(scope, {}).get(name)
+            if function is not None:
+                functions.append(function)
+                if defined is None or name in defined:
+                    break
+        return functions
+
+    def enter_scope(self, scope, variables: Dict[str, str], statements):
+        """Make `scope` the innermost scope, collecting its variables the first time it is entered."""
+        if scope not in self.collected:
+            self.collected.add(scope)
+            for name, type_ in variables.items():
+                self.assume((scope, name), type_)
+            self.collect(scope, statements)
+        self.scopes.append(scope)
+        self.defined_variables.append(set(variables))
+        self.defined_functions.append(set())
+
+    def leave_scope(self):
+        self.scopes.pop()
+        self.defined_variables.pop()
+        self.defined_functions.pop()
+
+    ###
+    ### # Expressions
+    ###
+
+    def check_NumberNode(self, node: NumberNode):
+        return "int" if isinstance(node.value, int) else "float"
+
+    def check_StringNode(self, node: StringNode):
+        return "char" if len(node.value) == 1 else "string"
+
+    def check_CharNode(self, node: CharNode):
+        return "char"
+
+    def check_BooleanNode(self, node: BooleanNode):
+        return "bool"
+
+    def check_IdentifierNode(self, node: IdentifierNode):
+        return self.variable_type(node.name)
+
+    def check_CastNode(self, node: CastNode):
+        self.visit(node.expression)
+        return CAST_TYPES.get(node.target_type.lower())
+
+    def check_BinOpNode(self, node: BinOpNode):
+        left = self.visit(node.left)
+        right = self.visit(node.right)
+        return binop_type(node.op, left, right)
+
+    def check_UnaryOpNode(self, node: UnaryOpNode):
+        self.visit(node.operand)
+        return "bool" if node.op == "NOT" else None
+
+    def check_ArrayAccessNode(self, node: ArrayAccessNode):
+        self.visit(node.index)
+        array = self.variable_type(node.array_name)
+        return array[:-2] if array is not None and array.endswith("[]") else None
+
+    def check_OutputNode(self, node: OutputNode):
+        return self.visit(node.expression)
+
+    ###
+    ### # Variables
+    ###
+
+    def check_DefineNode(self, node: DefineNode):
+        declared = node.type_
+        if isinstance(node.value, ArrayNode):
+            proven = True
+            for i, element in enumerate(node.value.elements):
+                actual = self.visit(element)
+                accepted = accepts(declared, actual)
+                if accepted is False:
+                    self.errors.append(f"Type mismatch in array '{node.name}' at index {i}: Expected {declared}, got {actual}")
+                if accepted is not True:
+                    proven = False
+            variable_type = f"{declared}[]"
+        else:
+            actual = self.visit(node.value)
+            if actual is not None and actual.endswith("[]"):
+                # An array defined through a variable: its elements must have the declared type.
+                proven = accepts(declared, actual[:-2])
+                variable_type = f"{declared}[]"
+            else:
+                proven = accepts(declared, actual)
+                # Unless the value is known not to be an array, it may be one and define an array.
+                variable_type = None if actual is None else declared
+            if proven is False:
+                self.errors.append(f"Type mismatch in definition of '{node.name}': Expected {declared}, got {actual}")
+        self.assume((self.scopes[-1], node.name), variable_type)
+        if self.defined_variables[-1] is not None:
+            self.defined_variables[-1].add(node.name)
+        node.type_checked = proven is True
+        if node.type_checked and self.function is not None:
+            self.marked.add(node)
+        return variable_type
+
+    def check_AssignNode(self, node: AssignNode):
+        actual = self.visit(node.value)
+        keys = self.variables(node.name)
+        for key in keys:
+            declared = self.types[key]
+            if declared is None:
+                continue
+            accepted = accepts(declared, actual)
+            if accepted is False and len(keys) == 1:
+                self.errors.append(f"Type mismatch in assignment to '{node.name}': Expected {declared}, got {actual}")
+            elif accepted is not True:
+                self.forget(key) # Either variable may be the one assigned.
+        return actual
+
+    def check_IncNode(self, node: IncNode):
+        return self.check_step(node.identifier)
+
+    def check_DecNode(self, node: DecNode):
+        return self.check_step(node.identifier)
+
+    def check_step(self, name: str) -> Optional[str]:
+        for key in self.variables(name):
+            if self.types[key] not in ("int", "float"):
+                self.forget(key) # true++ is 2.
+        return self.variable_type(name)
+
+    ###
+    ### # Scopes
+    ###
+
+    def check_BlockNode(self, node: BlockNode):
+        # A block may not run (an if or while body, a case, a try block cut short), so what it
+        # defines is only certain until its end.
+        variables, functions = self.defined_variables[-1], self.defined_functions[-1]
+        if variables is not None:
+            variables, functions = set(variables), set(functions)
+        for statement in node.statements:
+            self.visit(statement)
+        if variables is not None:
+            self.defined_variables[-1], self.defined_functions[-1] = variables, functions
+        return None
+
+    def check_ForLoopNode(self, node: ForLoopNode):
+        counter = "int" if isinstance(node.initializer_value, int) else "float"
+        self.enter_scope(node, {node.initializer: counter}, [node.condition, node.body, node.increment])
+        try:
+            self.visit(node.condition)
+            self.visit(node.body)
+            self.visit(node.increment)
+        finally:
+            self.leave_scope()
+        return None
+
+    def check_ForEachLoopNode(self, node: ForEachLoopNode):
+        self.enter_scope(node, {}, [node.iterable, node.body])
+        try:
+            self.assume((node, node.iterator), element_type(self.visit(node.iterable)))
+            self.defined_variables[-1].add(node.iterator)
+            self.visit(node.body)
+        finally:
+            self.leave_scope()
+        return None
+
+    def check_FunctionDefinitionNode(self, node: FunctionDefinitionNode):
+        if self.defined_functions[-1] is not None:
+            self.defined_functions[-1].add(node.name)
+        self.enter_scope(node, {param.name: param.type_ for param in node.parameters}, [node.body])
+        outer = self.function
+        self.function = node
+        try:
+            self.visit(node.body)
+            if not always_returns(node.body):
+                self.forget(node) # Falling off the end returns the value of the last statement.
+        finally:
+            self.function = outer
+            self.leave_scope()
+        return None
+
+    def check_ReturnNode(self, node: ReturnNode):
+        actual = self.visit(node.expression)
+        function = self.function
+        if function is not None and function.return_type is not None:
+            accepted = accepts(function.return_type, actual)
+            if accepted is False:
+                self.errors.append(f"Type mismatch in return from '{function.name}': Expected {function.return_type}, got {actual}")
+            elif accepted is None:
+                self.forget(function)
+        return actual
+
+    ###
+    ### # Calls
+    ###
+
+    def check_FunctionCallNode(self, node: FunctionCallNode):
+        arguments = [self.visit(arg) for arg in node.arguments]
+        if node.module_name:
+            module = self.modules.get(node.module_name)
+            function = None if module is None else module.functions.get(node.name)
+            if isinstance(function, NativeFunction):
+                self.check_native_call(node, function, arguments)
+            return None
+
+        functions = self.lookup_functions(node.name)
+        if len(functions) == 1 and functions[0] is not AMBIGUOUS:
+            return self.check_arguments(node, functions[0], arguments, report=True)
+        # Any of these may run, so errors are not certain, but each one only keeps what holds for this call.
+        returns = {self.check_arguments(node, function, arguments, report=False)
+                   for function in functions if function is not AMBIGUOUS}
+        return returns.pop() if len(returns) == 1 and AMBIGUOUS not in functions else None
+
+    def check_arguments(self, node: FunctionCallNode, function: FunctionDefinitionNode, arguments: list, report: bool) -> Optional[str]:
+        """Check a call to `function` with arguments of the static types `arguments`, and return the call's type.
+
+        Errors are only reported if `report`; otherwise parameters that may get a value of another type are forgotten.
+        """
+        parameters = function.parameters
+        try:
+            CallPlan(function).missing_defaults(len(arguments)) # Same bounds as the call will check.
+        except TypeError as error:
+            if report:
+                self.errors.append(str(error))
+            return self.returns[function]
+        # Defaults are evaluated in the caller's environment, like the arguments.
+        arguments = arguments + [self.visit(param.default_value) for param in parameters[len(arguments):]]
+        for param, actual in zip(parameters, arguments):
+            accepted = accepts(param.type_, actual)
+            if accepted is False and report:
+                self.errors.append(f"Type mismatch in argument '{param.name}' of call to '{node.name}': Expected {param.type_}, got {actual}")
+            elif accepted is not True:
+                self.forget((function, param.name))
+        return self.returns[function]
+
+    def check_native_call(self, node: FunctionCallNode, function: NativeFunction, arguments: list):
+        for spec, actual in zip(function.parameters, arguments):
+            if spec.kind != ParameterSpec.POSITIONAL:
+                break
+            if native_accepts(spec.type_, actual) is False:
+                self.errors.append(f"Type mismatch in argument '{spec.name}' of call to '{node.module_name}::{node.name}': Expected {spec.type_}, got {actual}")
+
+    def check_ImportNode(self, node: ImportNode):
+        if self.load_module is not None and node.module_name not in self.modules:
+            try:
+                self.modules[node.module_name] = self.load_module(node.module_name)
+            except ImportError:
+                pass # Reported when the import runs.
+        return None
@@ -0,0 +1,385 @@
+from nodes import *
+from rts import *
+from environment import Env
+from interpreter import Interpreter
+from compiler import *
+from typing import Callable, Dict
+
+# Frame stacks start with this many unused entries. Almost every statement pops the stack back to
+# the bottom, and a list that empties frees its buffer and allocates a new one on the next push.
+STACK_BASE = 4
+
+class Frame:
+    """Execution state of one CodeObject: the VM keeps a list of these instead of recursing in Python."""
+    __slots__ = ("code", "ip", "stack", "env", "handlers", "memo")
+
+    def __init__(self, code: CodeObject, env: Env):
+        self.code = code
+        self.ip = 0
+        self.stack = [None] * STACK_BASE
+        self.env = env
+        self.handlers = [] # Active SETUP_TRY entries: (handler ip, exception class, stack depth, env).
+        self.memo = None # (rts.MemoCache, key) that the return value is stored in, for calls to pure functions.
+
+class VirtualMachine(Interpreter):
+    """Runs programs lowered by compiler.Compiler in a single dispatch loop.
+
+    Gill function calls push a Frame instead of recursing, so call depth is only limited by
+    max_depth. Loops and branches are jumps. Nodes the compiler emits as INTERPRET are run by the
+    tree-walking Interpreter this class extends, which also provides the shared runtime helpers.
+    """
+
+    def __init__(self, global_env: Env, max_depth: int = 100000):
+        super().__init__(global_env)
+        self.compiler = Compiler()
+        self.function_code: Dict[FunctionDefinitionNode, CodeObject] = {}
+        self.max_depth = max_depth
+        # Handler table for the opcodes that run_frames does not test for itself: opcode -> bound
+        # op_<OPNAME> method. run_frames tests the frequent opcodes first, in the order they are run
+        # most often in the benchmarks, and dispatches the rest (loop setup, printing, casts, arrays,
+        # function definitions) through this table, so they do not lengthen the chain the hot ones
+        # go through.
+        self.op_handlers: Dict[int, Callable] = {
+            op: getattr(self, f"op_{name}") for op, name in OPNAMES.items() if hasattr(self, f"op_{name}")
+        }
+
+    def run(self, program):
+        self.resolve(program)
+        return self.execute(self.compiler.compile_program(program), self.global_env)
+
+    def interpret(self, node, env):
+        prev_env = self.global_env
+        self.global_env = env
+        try:
+            return self.escape_return(self.visit(node))
+        finally:
+            self.global_env = prev_env
+
+    def function_code_for(self, function_def: FunctionDefinitionNode) -> CodeObject:
+        code = self.function_code.get(function_def)
+        if code is None:
+            code = self.function_code[function_def] = self.compiler.compile_function(function_def)
+        return code
+
+    def execute(self, code: CodeObject, env: Env):
+        frames = [Frame(code, env)]
+        while True:
+            try:
+                return self.run_frames(frames)
+            except Exception as e:
+                if not self.unwind(frames, e):
+                    raise
+
+    def unwind(self, frames, exception) -> bool:
+        """Transfer control to the innermost matching handler. Returns False if there is none."""
+        while frames:
+            frame = frames[-1]
+            while frame.handlers:
+                target, exception_class, depth, env = frame.handlers.pop()
+                if isinstance(exception, exception_class):
+                    del frame.stack[depth:]
+                    frame.stack.append(exception)
+                    frame.env = env
+                    frame.ip = target
+                    return True
+            frames.pop()
+        return False
+
+    def run_frames(self, frames):
+        frame = frames[-1]
+        code = frame.code.code
+        constants = frame.code.constants
+        stack = frame.stack
+        env = frame.env
+        ip = frame.ip
+        op_handlers = self.op_handlers
+
+        try:
+            while True:
+                op = code[ip]
+                arg = code[ip + 1]
+                ip += 2
+
+                # Ordered by how often each opcode runs; the rest go through op_handlers.
+                if op == LOAD_CONST:
+                    stack.append(constants[arg])
+                elif op == LOAD_LOCAL:
+                    slot, name = constants[arg]
+                    entry = env.slots[slot]
+                    if entry is None:
+                        entry = env.get(name) # Not defined yet; the name may refer to an outer variable.
+                    stack.append(entry.value)
+                elif op == POP_TOP:
+                    stack.pop()
+                elif op == BINARY_ADD:
+                    right = stack.pop()
+                    left = stack[-1]
+                    if isinstance(left, str) or isinstance(right, str):
+                        stack[-1] = str(left) + str(right)
+                    else:
+                        stack[-1] = left + right
+                elif op == JUMP:
+                    ip = arg
+                elif op == COMPARE_LT:
+                    right = stack.pop()
+                    stack[-1] = stack[-1] < right
+                elif op == POP_JUMP_IF_FALSE:
+                    if not stack.pop():
+                        ip = arg
+                elif op == INC:
+                    address, name = constants[arg]
+                    current = env.lookup(address, name)
+                    current.value += 1
+                    stack.append(current.value)
+                elif op == DEFINE:
+                    name, declared_type, slot, type_id, array_type_id, checked = constants[arg]
+                    value = stack[-1]
+                    if isinstance(value, ARRAY_TYPES):
+                        if not checked:
+                            value = stack[-1] = self.define_array(value, declared_type)
+                        env.declare(name, Cell(array_type_id, value), slot)
+                    elif checked or self.check_type(value, declared_type):
+                        env.declare(name, Cell(type_id, value), slot)
+                    else:
+                        raise TypeError(f"Type mismatch: Expected {declared_type}, got {type(value).__name__}")
+                elif op == ASSIGN:
+                    address, name = constants[arg]
+                    env.lookup(address, name).value = stack[-1]
+                elif op == LOAD_NAME:
+                    address, name = constants[arg]
+                    stack.append(env.lookup(address, name).value)
+                elif op == JUMP_IF_CASE:
+                    right = stack.pop()
+                    if stack[-1] == right:
+                        ip = arg
+                elif op == RETURN_VALUE:
+                    value = stack.pop()
+                    if frame.memo is not None:
+                        memo, key = frame.memo
+                        memo.store(key, value)
+                    frames.pop()
+                    if not frames:
+                        return value
+                    frame = frames[-1]
+                    code = frame.code.code
+                    constants = frame.code.constants
+                    stack = frame.stack
+                    env = frame.env
+                    ip = frame.ip
+                    stack.append(value)
+                elif op == CALL_FUNCTION or op == TAIL_CALL:
+                    name, module_name, argc, call_node = constants[arg]
+                    if argc:
+                        args = stack[-argc:]
+                        del stack[-argc:]
+                    else:
+                        args = []
+
+                    # The call site's cached target is reused while its environment's version is unchanged.
+                    cache = call_node.call_cache
+                    if module_name:
+                        if cache is None or cache[1] is not env.modules or cache[2].version != cache[3]:
+                            cache = call_node.call_cache = env.module_function_cache(module_name, name)
+                        function_obj = cache[0]
+                        parent_env = cache[2]
+                    else:
+                        function_obj = None if cache is None else env.cached_function(cache)
+                        if function_obj is None:
+                            cache = call_node.call_cache = env.function_cache(name)
+                            function_obj = cache[0]
+                        parent_env = env
+
+                    if isinstance(function_obj, NativeFunction):
+                        memo = function_obj.memo
+                        if memo is None:
+                            stack.append(function_obj.py_impl(*args))
+                        else:
+                            key = memo.key(args)
+                            value = memo.lookup(key)
+                            if value is MemoCache.MISSING:
+                                value = function_obj.py_impl(*args)
+                                memo.store(key, value)
+                            stack.append(value)
+                    elif isinstance(function_obj, FunctionDefinitionNode):
+                        if op == CALL_FUNCTION and len(frames) >= self.max_depth:
+                            raise RecursionError(f"Maximum call depth of {self.max_depth} exceeded in call to '{name}'.")
+                        plan = function_obj.call_plan
+                        if argc != plan.max_args:
+                            # Defaults left out are evaluated by the tree-walker in the caller's environment.
+                            args.extend([self.interpret(default, env) for default in plan.missing_defaults(argc)])
+                        memo = function_obj.memo
+                        if memo is not None:
+                            key = memo.key(args)
+                            value = memo.lookup(key)
+                            if value is not MemoCache.MISSING:
+                                stack.append(value)
+                                continue
+                        # Functions see the variables of the environment they were defined in (lexical scoping).
+                        call_env = plan.bind(function_obj.global_environment or parent_env, args)
+                        if op == TAIL_CALL and frame.memo is None:
+                            frames.pop() # The callee replaces this frame and returns straight to our caller.
+
+                        # Save the caller and switch to the callee's frame.
+                        frame.ip = ip
+                        frame.env = env
+                        frame = Frame(self.function_code_for(function_obj), call_env)
+                        if memo is not None:
+                            frame.memo = (memo, key)
+                        frames.append(frame)
+                        code = frame.code.code
+                        constants = frame.code.constants
+                        stack = frame.stack
+                        env = call_env
+                        ip = 0
+                    else:
+                        raise TypeError(f"Object '{name}' is not callable.")
+                elif op == BINARY_MUL:
+                    right = stack.pop()
+                    stack[-1] = stack[-1] * right
+                elif op == FOR_ITER:
+                    try:
+                        env.slots[0].value = next(stack[-1])
+                    except StopIteration:
+                        stack.pop()
+                        ip = arg
+                elif op == STORE_ITERATOR:
+                    env.slots[0].value = stack.pop()
+                elif op == JUMP_TABLE:
+                    try:
+                        ip = constants[arg].get(stack[-1], ip)
+                    except TypeError: # Unhashable values (arrays) are not equal to any literal.
+                        pass
+                elif op == BINARY_SUB:
+                    right = stack.pop()
+                    stack[-1] = stack[-1] - right
+                elif op == BINARY_DIV:
+                    right = stack.pop()
+                    stack[-1] = stack[-1] / right
+                elif op == COMPARE_GT:
+                    right = stack.pop()
+                    stack[-1] = stack[-1] > right
+                elif op == COMPARE_EQ:
+                    right = stack.pop()
+                    stack[-1] = stack[-1] == right
+                elif op == COMPARE_GTE:
+                    right = stack.pop()
+                    stack[-1] = stack[-1] >= right
+                elif op == COMPARE_LTE:
+                    right = stack.pop()
+                    stack[-1] = stack[-1] <= right
+                elif op == COMPARE_NEQ:
+                    right = stack.pop()
+                    stack[-1] = stack[-1] != right
+                elif op == BINARY_MOD:
+                    right = stack.pop()
+                    stack[-1] = stack[-1] % right
+                elif op == BINARY_FDIV:
+                    right = stack.pop()
+                    stack[-1] = stack[-1] // right
+                elif op == LOGICAL_AND:
+                    right = stack.pop()
+                    stack[-1] = bool(stack[-1]) and bool(right)
+                elif op == LOGICAL_OR:
+                    right = stack.pop()
+                    stack[-1] = bool(stack[-1]) or bool(right)
+                elif op == UNARY_NOT:
+                    stack[-1] = not stack[-1]
+                elif op == ENTER_SCOPE:
+                    env = Env(parent=env, size=arg)
+                elif op == EXIT_SCOPE:
+                    env = env.parent
+                elif op == SETUP_TRY:
+                    target, exception_class = constants[arg]
+                    frame.handlers.append((target, exception_class, len(stack), env))
+                elif op == POP_TRY:
+                    frame.handlers.pop()
+                elif op == POP_JUMP_IF_TRUE:
+                    if stack.pop():
+                        ip = arg
+                else:
+                    handler = op_handlers.get(op)
+                    if handler is None:
+                        raise RuntimeError(f"Unknown opcode {op} at {ip - 2} in {frame.code.name}")
+                    handler(stack, env, arg, constants)
+        finally:
+            # Publish the registers so unwind() and the next run_frames() call see the current state.
+            frame.ip = ip
+            frame.env = env
+
+    # Handlers for the opcodes run_frames dispatches through op_handlers. Each one gets the current
+    # frame's stack, environment, argument and constant pool.
+
+    def op_DUP_TOP(self, stack, env, arg, constants):
+        stack.append(stack[-1])
+
+    def op_OUTPUT(self, stack, env, arg, constants):
+        print(stack[-1])
+
+    def op_BINARY_OP(self, stack, env, arg, constants):
+        right = stack.pop()
+        stack[-1] = self.eval_binop(stack[-1], constants[arg], right)
+
+    def op_CAST(self, stack, env, arg, constants):
+        stack[-1] = self.cast_value(stack[-1], constants[arg])
+
+    def op_DEC(self, stack, env, arg, constants):
+        address, name = constants[arg]
+        current = env.lookup(address, name)
+        current.value -= 1
+        stack.append(current.value)
+
+    def op_ARRAY_ACCESS(self, stack, env, arg, constants):
+        address, array_name = constants[arg]
+        array = env.lookup(address, array_name).value
+        index = stack.pop()
+        if not isinstance(array, ARRAY_TYPES):
+            raise TypeError(f"Variable '{array_name}' is not an array.")
+        elif not isinstance(index, int):
+            raise TypeError(f"Array index must be an integer, got {type(index).__name__}.")
+        elif index < 0 or index >= len(array):
+            raise IndexError(f"Array index {index} out of bounds for array '{array_name}' of size {len(array)}.")
+        stack.append(array[index])
+
+    def op_BUILD_ARRAY(self, stack, env, arg, constants):
+        count, size, element_type = constants[arg]
+        elements = stack[len(stack) - count:]
+        del stack[len(stack) - count:]
+        if count != size: # This should not execute... as this error is caught during parsing.
+            raise ValueError(f"Array size mismatch: expected {size}, got {count}")
+        if element_type in ARRAY_TYPECODES:
+            typed = typed_array(elements, element_type)
+            if typed is not None:
+                elements = typed
+        stack.append(elements)
+
+    def op_GET_ITER(self, stack, env, arg, constants):
+        stack[-1] = iter(stack[-1])
+
+    def op_COUNTED_RANGE(self, stack, env, arg, constants):
+        start, inclusive = constants[arg]
+        steps = counted_range(start, stack[-1], inclusive)
+        stack[-1] = max(steps.start, steps.stop)
+        stack.append(iter(steps))
+
+    def op_DECLARE(self, stack, env, arg, constants):
+        name, type_id = constants[arg]
+        env.slots[0] = env.variables[name] = Cell(type_id, stack.pop()) # Loop variables are slot 0.
+
+    def op_RERAISE(self, stack, env, arg, constants):
+        raise stack.pop()
+
+    def op_WRAP_FOREACH_ERROR(self, stack, env, arg, constants):
+        e = stack.pop()
+        raise RuntimeError(f"Error during foreach loop: {e}\n{constants[arg]}")
+
+    def op_MAKE_FUNCTION(self, stack, env, arg, constants):
+        function_def = constants[arg]
+        env.define_function(function_def.name, function_def)
+        function_def.global_environment = env
+        if function_def.call_plan is None:
+            function_def.call_plan = CallPlan(function_def)
+        function_def.memo = MemoCache(function_def.name) if function_def.pure else None
+        stack.append(None)
+
+    def op_INTERPRET(self, stack, env, arg, constants):
+        stack.append(self.interpret(constants[arg], env))
@@ -0,0 +1,46 @@
+"""Regression tests for the unboxed arrays of rts.typed_array.
+
+Run from the repository root with `python -m pytest proto/tests` or `python -m unittest discover proto/tests`.
+"""
+import contextlib
+import io
+import os
+import sys
+import unittest
+
+SRC_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "src"))
+if SRC_DIR not in sys.path:
+    sys.path.insert(0, SRC_DIR)
+
+from lexer import Lexer
+from parser import Parser
+from environment import Env
+from engines import ENGINES, create_engine
+from rts import TypedArray, typed_array
+
+def run_program(engine: str, source: str) -> str:
+    output = io.StringIO()
+    with contextlib.redirect_stdout(output):
+        create_engine(engine, Env()).run(Parser(Lexer().tokenize(source)).parse())
+    return output.getvalue()
+
+class TypedArrayTests(unittest.TestCase):
+    def test_values_of_another_type_stay_boxed(self):
+        # Each buffer would silently convert these values.
+        self.assertIsNone(typed_array([1, True, 3], "int"))
+        self.assertIsNone(typed_array([1.5, 2], "float"))
+        self.assertIsNone(typed_array([True, 1], "bool"))
+
+    def test_values_of_the_element_type_are_unboxed(self):
+        self.assertIsInstance(typed_array([1, 2, 3], "int"), TypedArray)
+        self.assertIsInstance(typed_array([1.5, 2.5], "float"), TypedArray)
+        self.assertIsInstance(typed_array([True, False], "bool"), TypedArray)
+        self.assertIsInstance(typed_array(["x", "y"], "char"), TypedArray)
+
+    def test_bool_in_int_array_keeps_its_value(self):
+        for engine in ENGINES:
+            with self.subTest(engine=engine):
+                self.assertEqual(run_program(engine, "define a[3] int [1, true, 3]\nout a\n").split("\n")[0], "[1, True, 3]")
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,48 @@
+"""Tests that calls behave the same on every engine.
+
+Run from the repository root with `python -m pytest proto/tests` or `python -m unittest discover proto/tests`.
+"""
+import contextlib
+import io
+import os
+import sys
+import unittest
+
+SRC_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "src"))
+if SRC_DIR not in sys.path:
+    sys.path.insert(0, SRC_DIR)
+
+from lexer import Lexer
+from parser import Parser
+from environment import Env
+from engines import ENGINES, create_engine
+
+# The f that g calls depends on the branch taken, so the count is only checked when the call runs.
+ARGUMENT_COUNT = """
+function int f(int a, int b) {
+    return a + b
+}
+function int g(bool c) {
+    if (c) {
+        function int f(int a) {
+            return a
+        }
+    }
+    return exec f(4)
+}
+out exec g(true)
+out exec g(false)
+"""
+
+class CallTests(unittest.TestCase):
+    def test_argument_count_mismatch_at_run_time(self):
+        for engine in ENGINES:
+            with self.subTest(engine=engine):
+                output = io.StringIO()
+                with self.assertRaisesRegex(TypeError, "^Argument count mismatch in call to 'f': expected 2, got 1$"):
+                    with contextlib.redirect_stdout(output):
+                        create_engine(engine, Env()).run(Parser(Lexer().tokenize(ARGUMENT_COUNT)).parse())
+                self.assertEqual(output.getvalue().split(), ["4"])
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,116 @@
+"""Regression tests for incremental.IncrementalParser.
+
+Run from the repository root with `python -m pytest proto/tests` or `python -m unittest discover proto/tests`.
+"""
+import os
+import random
+import sys
+import unittest
+
+SRC_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "src"))
+if SRC_DIR not in sys.path:
+    sys.path.insert(0, SRC_DIR)
+
+from incremental import IncrementalParser
+from lexer import Lexer
+from parser import Parser
+from nodes import ASTNode, OutputNode
+
+SOURCE = """define total int 3 * 2 + 1
+define label string "item " + total
+function int clamp(int value, int limit default 10) {
+    if (value >= limit) { return limit } else { return value }
+}
+for (define i int 0, i < 3, i++) {
+    out exec clamp((int)2.5 + i)
+}
+switch (total) { case (7) { out 'c' } default { out label } }
+"""
+
+# Text inserted by the random edits: whole tokens, pieces of tokens and characters that change how
+# the text around them lexes (quotes, comment markers, newlines).
+INSERTIONS = ["out 1\n", "define x int 2\n", "(", ")", "{", "}", '"', "'", "//", "/*", "*/", "\n", " ",
+              "int", "i", "+", "1.5", "(string)", "function int g() { return 1 }\n", ";", "x"]
+
+def tokens(stream) -> list:
+    return [(token.kind, token.value, token.line, token.column, token.offset) for token in stream]
+
+def dump(value):
+    """The parsed syntax of `value`, comparable with ==."""
+    if isinstance(value, list):
+        return [dump(item) for item in value]
+    if isinstance(value, ASTNode):
+        return (value.__class__.__name__, *(dump(getattr(value, field, None)) for field in value._syntax))
+    return value
+
+def parse(text: str):
+    """Return the dumped statements of `text`, or the class of the error parsing it raises."""
+    try:
+        return dump(Parser(Lexer().tokenize(text)).parse().statements)
+    except Exception as error:
+        return error.__class__
+
+def type_lines(lines) -> IncrementalParser:
+    """Append `lines` one by one like repl.py does, asserting that every line but the last leaves the
+    statement incomplete (a SyntaxError at the end of the input)."""
+    pending = IncrementalParser()
+    for line in lines[:-1]:
+        try:
+            pending.edit(len(pending.text), 0, line + "\n")
+        except SyntaxError:
+            assert pending.tokens.kind is None, f"{line!r} is not incomplete"
+        else:
+            raise AssertionError(f"{line!r} completed the statement")
+    pending.edit(len(pending.text), 0, lines[-1] + "\n")
+    return pending
+
+class ContinuationTests(unittest.TestCase):
+    """repl.py reads another line when edit() raises SyntaxError with no token left."""
+
+    def test_statement_split_inside_parentheses(self):
+        pending = type_lines(["out (1", "+ 2)"])
+        [statement] = pending.program.statements
+        self.assertIsInstance(statement, OutputNode)
+
+    def test_function_split_after_keyword(self):
+        pending = type_lines(["function", "int f() {", "return 1", "}"])
+        self.assertEqual(len(pending.program.statements), 1)
+
+class RandomEditTests(unittest.TestCase):
+    """After any edit, the tokens and statements match lexing and parsing the new text from scratch."""
+
+    def check_edit(self, incremental: IncrementalParser, offset: int, removed: int, inserted: str) -> bool:
+        """Apply the edit and compare with a full parse; return whether the new text parses."""
+        try:
+            incremental.edit(offset, removed, inserted)
+            result = dump(incremental.program.statements)
+        except Exception as error:
+            result = error.__class__
+        edit = (offset, removed, inserted)
+        self.assertEqual(tokens(incremental.tokens), tokens(Lexer().tokenize(incremental.text)), edit)
+        self.assertEqual(result, parse(incremental.text), edit)
+        return not isinstance(result, type)
+
+    def test_random_edits(self):
+        rng = random.Random(2024)
+        incremental = IncrementalParser(SOURCE)
+        broken = 0 # Edits in a row that left a text that does not parse.
+        for _ in range(1500):
+            text = incremental.text
+            offset = rng.randint(0, len(text))
+            removed = rng.randint(0, min(6, len(text) - offset))
+            inserted = rng.choice(INSERTIONS) if rng.random() < 0.7 else ""
+            if self.check_edit(incremental, offset, removed, inserted):
+                broken = 0
+            elif not broken and rng.random() < 0.8:
+                # Mostly undo edits that break the program, so most edits start from one that parses
+                # and reuse its statements. The undo is an edit like any other.
+                self.check_edit(incremental, offset, len(inserted), text[offset:offset + removed])
+            else:
+                broken += 1
+                if broken == 5:
+                    broken = 0
+                    self.check_edit(incremental, 0, len(incremental.text), SOURCE)
+
+if __name__ == "__main__":
+    unittest.main()
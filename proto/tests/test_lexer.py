@@ -0,0 +1,34 @@
+"""Regression tests for lexer.Lexer.
+
+Run from the repository root with `python -m pytest proto/tests` or `python -m unittest discover proto/tests`.
+"""
+import io
+import os
+import sys
+import unittest
+
+SRC_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "src"))
+if SRC_DIR not in sys.path:
+    sys.path.insert(0, SRC_DIR)
+
+from lexer import STREAM_MARGIN, Lexer
+
+SOURCE = """'c'@// comment
+define c char 'x'
+define s string "two
+lines" + (string) 4.5
+/* block */ out c;
+"""
+
+def tokens(stream) -> list:
+    return [(token.kind, token.value, token.line, token.column) for token in stream]
+
+class StreamTests(unittest.TestCase):
+    def test_stream_matches_tokenize_for_any_chunk_size(self):
+        expected = tokens(Lexer().tokenize(SOURCE))
+        for chunk_size in range(1, 2 * STREAM_MARGIN + 2):
+            with self.subTest(chunk_size=chunk_size):
+                self.assertEqual(tokens(Lexer().stream(io.StringIO(SOURCE), chunk_size)), expected)
+
+if __name__ == "__main__":
+    unittest.main()
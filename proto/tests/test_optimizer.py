@@ -0,0 +1,89 @@
+"""Tests for optimizer.Optimizer's constant folding and dead branch elimination.
+
+Run from the repository root with `python -m pytest proto/tests` or `python -m unittest discover proto/tests`.
+"""
+import contextlib
+import io
+import os
+import sys
+import unittest
+
+SRC_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "src"))
+if SRC_DIR not in sys.path:
+    sys.path.insert(0, SRC_DIR)
+
+from lexer import Lexer
+from parser import Parser
+from environment import Env
+from engines import ENGINES, create_engine
+from optimizer import MAX_FOLDED_STRING, Optimizer
+from nodes import BinOpNode, NumberNode, OutputNode, StringNode, SwitchCaseBlockNode, TryCatchNode
+
+def optimize(source: str):
+    """Return (optimizer, optimized program) for `source`."""
+    optimizer = Optimizer()
+    return optimizer, optimizer.optimize(Parser(Lexer().tokenize(source)).parse())
+
+def output(program) -> dict:
+    """Run `program` on every engine and return what each one printed, by engine."""
+    printed = {}
+    for engine in ENGINES:
+        buffer = io.StringIO()
+        with contextlib.redirect_stdout(buffer):
+            create_engine(engine, Env()).run(program)
+        printed[engine] = buffer.getvalue().split()
+    return printed
+
+class FoldingTests(unittest.TestCase):
+    def test_literal_operands_fold(self):
+        optimizer, program = optimize("out 1 + 2 * 3")
+        folded = program.statements[0].expression
+        self.assertIsInstance(folded, NumberNode)
+        self.assertEqual(folded.value, 7)
+
+    def test_faulting_fold_is_left_to_fail_at_run_time(self):
+        # Folding 1 / 0 raises, so it must stay in the try block and reach the catch when it runs.
+        optimizer, program = optimize('try { out 1 / 0 } catch { out "caught" }')
+        self.assertIsInstance(program.statements[0], TryCatchNode)
+        for engine, printed in output(program).items():
+            with self.subTest(engine=engine):
+                self.assertEqual(printed, ["caught"])
+
+    def test_max_folded_string(self):
+        at_limit = "b" * (MAX_FOLDED_STRING - 1)
+        over_limit = "b" * MAX_FOLDED_STRING
+        optimizer, program = optimize(f'define s string "a" + "{at_limit}"\ndefine t string "a" + "{over_limit}"')
+        self.assertIsInstance(program.statements[0].value, StringNode)
+        self.assertEqual(program.statements[0].value.value, "a" + at_limit)
+        self.assertIsInstance(program.statements[1].value, BinOpNode) # Built when the program runs.
+
+class PruningTests(unittest.TestCase):
+    def test_constant_if_and_while_are_pruned(self):
+        optimizer, program = optimize("if (false) { out 1 } else { out 2 }\nwhile (1 > 2) { out 3 }\nout 4")
+        self.assertEqual([type(statement) for statement in program.statements], [OutputNode, OutputNode])
+        for engine, printed in output(program).items():
+            with self.subTest(engine=engine):
+                self.assertEqual(printed, ["2", "4"])
+
+    def test_constant_switch_keeps_the_matching_case(self):
+        optimizer, program = optimize('switch (1 + 1) { case (1) { out "one" } case (2) { out "two" } default { out "other" } }\nout 0')
+        self.assertEqual([type(statement) for statement in program.statements], [OutputNode, OutputNode])
+        self.assertEqual(program.statements[0].expression.value, "two")
+
+    def test_constant_switch_without_a_match_keeps_the_default(self):
+        optimizer, program = optimize('switch (5) { case (1) { out "one" } default { out "other" } }\nout 0')
+        self.assertEqual(program.statements[0].expression.value, "other")
+
+    def test_switch_with_a_non_literal_case_is_kept(self):
+        optimizer, program = optimize('define k int 2\nswitch (2) { case (k) { out "k" } case (2) { out "two" } }')
+        self.assertIsInstance(program.statements[1], SwitchCaseBlockNode)
+
+class RemovedCountTests(unittest.TestCase):
+    def test_removed_counts_the_nodes_of_the_last_call(self):
+        optimizer, program = optimize("out 1 + 2 * 3") # Block, output and 5 expression nodes become 3 nodes.
+        self.assertEqual(optimizer.removed, 4)
+        optimizer.optimize(Parser(Lexer().tokenize("out 1")).parse())
+        self.assertEqual(optimizer.removed, 0)
+
+if __name__ == "__main__":
+    unittest.main()
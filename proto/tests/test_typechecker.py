@@ -0,0 +1,140 @@
+"""Regression tests for typechecker.TypeChecker.
+
+Run from the repository root with `python -m pytest proto/tests` or `python -m unittest discover proto/tests`.
+"""
+import contextlib
+import io
+import os
+import sys
+import unittest
+
+SRC_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "src"))
+if SRC_DIR not in sys.path:
+    sys.path.insert(0, SRC_DIR)
+
+from lexer import Lexer
+from parser import Parser
+from environment import Env
+from engines import ENGINES, create_engine
+from nodes import DefineNode, iter_child_nodes
+
+# The read of x runs before f's own define of x, so it still sees the global string.
+READ_BEFORE_LOCAL_DEFINE = """
+define x string "hi"
+function int f() {
+    define y int x
+    define x int 5
+    return y
+}
+define r int exec f()
+out r
+out r + 1
+"""
+
+# Likewise the call of g runs before f's own g is defined.
+CALL_BEFORE_LOCAL_FUNCTION = """
+function string g() {
+    return "s"
+}
+function int f() {
+    define y int exec g()
+    function int g() {
+        return 1
+    }
+    return y
+}
+define r int exec f()
+out r
+"""
+
+READ_AFTER_LOCAL_DEFINE = """
+define x int 3
+function int f() {
+    define y int x
+    define x int 5
+    define z int x
+    return y + z
+}
+out exec f()
+"""
+
+CALL_BEFORE_IMPORT = """
+out exec stdlib::pow(2, 3)
+import stdlib
+"""
+
+# b has no default, so it must be passed even though a, before it, has one.
+MISSING_ARGUMENT = """
+function int f(int a default 1, int b) {
+    return a + b
+}
+out "started"
+out exec f(5)
+"""
+
+def parse(source: str):
+    return Parser(Lexer().tokenize(source)).parse()
+
+def run_program(engine: str, source: str) -> str:
+    program = parse(source)
+    output = io.StringIO()
+    with contextlib.redirect_stdout(output):
+        create_engine(engine, Env()).run(program)
+    return output.getvalue()
+
+def defines(node):
+    """Return the DefineNodes under `node` by name."""
+    found = {}
+    pending = [node]
+    while pending:
+        node = pending.pop()
+        if isinstance(node, DefineNode):
+            found[node.name] = node
+        pending.extend(iter_child_nodes(node))
+    return found
+
+class LaterDefinitionTests(unittest.TestCase):
+    """A name must not resolve to a definition of the same scope that comes after it."""
+
+    def assert_type_mismatch(self, source: str):
+        for engine in ENGINES:
+            with self.subTest(engine=engine):
+                with self.assertRaisesRegex(TypeError, "Type mismatch: Expected int, got str"):
+                    run_program(engine, source)
+
+    def test_read_before_local_define(self):
+        self.assert_type_mismatch(READ_BEFORE_LOCAL_DEFINE)
+
+    def test_call_before_local_function(self):
+        self.assert_type_mismatch(CALL_BEFORE_LOCAL_FUNCTION)
+
+    def test_read_after_local_define(self):
+        for engine in ENGINES:
+            with self.subTest(engine=engine):
+                program = parse(READ_AFTER_LOCAL_DEFINE)
+                output = io.StringIO()
+                with contextlib.redirect_stdout(output):
+                    create_engine(engine, Env()).run(program)
+                self.assertEqual(output.getvalue().split(), ["8"])
+                marks = {name: node.type_checked for name, node in defines(program).items()}
+                self.assertEqual(marks, {"x": True, "y": True, "z": True})
+
+class ModuleTests(unittest.TestCase):
+    def test_module_is_only_imported_by_the_import(self):
+        for engine in ENGINES:
+            with self.subTest(engine=engine):
+                with self.assertRaisesRegex(NameError, "Module 'stdlib' not found"):
+                    run_program(engine, CALL_BEFORE_IMPORT)
+
+class ArgumentCountTests(unittest.TestCase):
+    def test_missing_argument_before_a_later_required_one_is_reported_before_running(self):
+        for engine in ENGINES:
+            with self.subTest(engine=engine):
+                output = io.StringIO()
+                with self.assertRaisesRegex(TypeError, "Argument count mismatch in call to 'f': expected 2, got 1"):
+                    with contextlib.redirect_stdout(output):
+                        create_engine(engine, Env()).run(parse(MISSING_ARGUMENT))
+                self.assertEqual(output.getvalue(), "") # Reported before anything ran.
+
+if __name__ == "__main__":
+    unittest.main()